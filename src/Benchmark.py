@@ -0,0 +1,469 @@
+﻿"""
+Copyright 2018 Andreas Wundlechner
+
+GNU Lesser General Public License Usage
+This file has to be used under the terms of the GNU Lesser
+General Public License version 3 or later as published by the Free Software
+Foundation and appearing in the file LICENSE included in the
+packaging of this file. Please review the following information to
+ensure the GNU Lesser General Public License version 3 requirements
+will be met: https://www.gnu.org/licenses/lgpl-3.0.html.
+"""
+
+"""
+This file contains the benchmark suite.
+It generates synthetic multi-material grids, which look roughly like the tooth data (shells of materials with a stress field),
+and measures the time of the expensive operations of Simulation_Data for different grid sizes.
+The results are saved as JSON, so the timings of different versions can be compared.
+
+Usage (inside the Vizard runtime, because Simulation_Data needs it):
+	Benchmark.py --sizes 10000 100000 1000000 10000000 --output results.json --compare old_results.json
+Without Vizard (measures the processing of Processing.py):
+	Benchmark.py --headless --sizes 10000 100000 1000000
+Only generate a grid:
+	Benchmark.py --generate-only --sizes 100000 --cell-type hexahedron --materials 4 --directory C:\\Testdaten
+"""
+
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+import itertools
+import numpy
+
+
+# VTK cell type ids of the supported cells
+VTK_TETRA = 10
+VTK_HEXAHEDRON = 12
+VTK_WEDGE = 13
+
+# Number of cells, which are created from one hexahedron of the lattice
+_CELLS_PER_HEXAHEDRON = {'tetra': 6, 'hexahedron': 1, 'wedge': 2}
+CELL_TYPES = ['tetra', 'hexahedron', 'wedge', 'mixed']
+STRESS_FIELDS = ['bending', 'hotspots', 'random']
+DEFAULT_SIZES = [10000, 100000, 1000000, 10000000]
+
+# Splitting of the lattice hexahedron (point order like VTK_HEXAHEDRON) into the other cell types.
+# The 6 tetrahedra share the diagonal 0-6, so neighbouring hexahedra fit together.
+_TETRA_SPLIT = numpy.array([
+	[0, 1, 2, 6],
+	[0, 2, 3, 6],
+	[0, 3, 7, 6],
+	[0, 7, 4, 6],
+	[0, 4, 5, 6],
+	[0, 5, 1, 6]])
+_WEDGE_SPLIT = numpy.array([
+	[0, 1, 2, 4, 5, 6],
+	[0, 2, 3, 4, 6, 7]])
+
+
+class Synthetic_Grid:
+	"""
+	Plain representation of an unstructured grid with the arrays, which are needed to write a vtk file.
+	Cells are stored in blocks of the same type: cell_blocks is a list of (vtk cell type, cells as 2D point index array).
+	"""
+	def __init__(self, points, cell_blocks, cell_data):
+		self.points = points
+		self.cell_blocks = cell_blocks
+		self.cell_data = cell_data
+
+
+	def get_number_of_cells(self):
+		"""
+		Returns the number of cells of all blocks.
+		"""
+		return sum(len(cells) for cell_type, cells in self.cell_blocks)
+
+
+def generate_grid(number_of_cells, cell_type='tetra', number_of_materials=3, stress_field='bending', seed=0):
+	"""
+	Generate a synthetic grid with exactly number_of_cells cells.
+	cell_type: 'tetra', 'hexahedron', 'wedge' or 'mixed' (lower half hexahedra, upper half tetrahedra)
+	number_of_materials: number of material shells around the center (1 is the innermost shell)
+	stress_field: 'bending', 'hotspots' or 'random'
+	The cell data contains the arrays "material" and "equivalent_stress" like the real data.
+	"""
+	if cell_type not in CELL_TYPES:
+		raise ValueError("Unknown cell type '{0}'. Use one of {1}.".format(cell_type, CELL_TYPES))
+	if stress_field not in STRESS_FIELDS:
+		raise ValueError("Unknown stress field '{0}'. Use one of {1}.".format(stress_field, STRESS_FIELDS))
+	random = numpy.random.RandomState(seed)
+
+	# Find the size of the lattice. Mixed grids contain half hexahedra and half tetrahedra.
+	if cell_type == 'mixed':
+		cells_per_hexahedron = (_CELLS_PER_HEXAHEDRON['tetra'] + _CELLS_PER_HEXAHEDRON['hexahedron']) / 2.0
+	else:
+		cells_per_hexahedron = _CELLS_PER_HEXAHEDRON[cell_type]
+	number_of_hexahedra = int(numpy.ceil(number_of_cells / float(cells_per_hexahedron)))
+	n = max(1, int(round(number_of_hexahedra ** (1.0/3))))
+	nz = int(numpy.ceil(number_of_hexahedra / float(n*n))) + (1 if cell_type == 'mixed' else 0)
+
+	# Create the points of the lattice. The grid is about as big as the test data (10 units)
+	x, y, z = numpy.meshgrid(
+		numpy.linspace(-5, 5, n+1),
+		numpy.linspace(-5, 5, n+1),
+		numpy.linspace(-5, 5 * nz / float(n), nz+1),
+		indexing='ij')
+	points = numpy.column_stack([x.ravel(), y.ravel(), z.ravel()]).astype(numpy.float32)
+
+	# Create the hexahedra of the lattice with the point order of VTK_HEXAHEDRON
+	i, j, k = numpy.meshgrid(numpy.arange(n), numpy.arange(n), numpy.arange(nz), indexing='ij')
+	i = i.ravel(); j = j.ravel(); k = k.ravel()
+	def point_id(di, dj, dk):
+		return ((i+di) * (n+1) + (j+dj)) * (nz+1) + (k+dk)
+	hexahedra = numpy.column_stack([
+		point_id(0,0,0), point_id(1,0,0), point_id(1,1,0), point_id(0,1,0),
+		point_id(0,0,1), point_id(1,0,1), point_id(1,1,1), point_id(0,1,1)])
+	# Sort hexahedra by layer, so truncating the cell list removes the top of the grid
+	hexahedra = hexahedra[numpy.argsort(k, kind='mergesort')]
+
+	# Split the hexahedra into the requested cell types
+	if cell_type == 'tetra':
+		cell_blocks = [(VTK_TETRA, hexahedra[:, _TETRA_SPLIT].reshape(-1, 4))]
+	elif cell_type == 'wedge':
+		cell_blocks = [(VTK_WEDGE, hexahedra[:, _WEDGE_SPLIT].reshape(-1, 6))]
+	elif cell_type == 'hexahedron':
+		cell_blocks = [(VTK_HEXAHEDRON, hexahedra)]
+	else:
+		half = len(hexahedra) // 2
+		cell_blocks = [
+			(VTK_HEXAHEDRON, hexahedra[:half]),
+			(VTK_TETRA, hexahedra[half:, _TETRA_SPLIT].reshape(-1, 4))]
+
+	# Remove the cells, which are too much
+	remaining = number_of_cells
+	truncated_blocks = []
+	for block_type, cells in cell_blocks:
+		truncated_blocks.append((block_type, cells[:remaining]))
+		remaining -= len(truncated_blocks[-1][1])
+	cell_blocks = [block for block in truncated_blocks if len(block[1]) > 0]
+
+	# Calculate the cell centers for the cell data
+	centers = numpy.concatenate([points[cells].mean(axis=1) for block_type, cells in cell_blocks])
+
+	# Materials are shells around the center of the grid
+	radius = numpy.linalg.norm(centers - centers.mean(axis=0), axis=1)
+	radius /= max(radius.max(), 1e-12)
+	material = numpy.minimum((radius * number_of_materials).astype(numpy.int32), number_of_materials-1) + 1
+
+	# Calculate the stress field
+	if stress_field == 'bending':
+		# Load on the top like a chewing force. Stress grows with the distance to the neutral axis and to the top.
+		height = (centers[:, 2] - centers[:, 2].min()) / max(numpy.ptp(centers[:, 2]), 1e-12)
+		stress = 100 * numpy.abs(centers[:, 0]) * (1 - height) + random.normal(0, 2, len(centers))
+	elif stress_field == 'hotspots':
+		# Sum of a few gaussian peaks
+		stress = numpy.zeros(len(centers))
+		for peak in range(8):
+			center = random.uniform(centers.min(axis=0), centers.max(axis=0))
+			width = random.uniform(0.5, 2)
+			height = random.uniform(100, 1000)
+			stress += height * numpy.exp(-numpy.sum((centers - center)**2, axis=1) / (2 * width**2))
+	else:
+		stress = random.uniform(0, 1000, len(centers))
+	stress = numpy.abs(stress).astype(numpy.float32)
+
+	return Synthetic_Grid(points, cell_blocks, {'material': material, 'equivalent_stress': stress})
+
+
+def write_vtk(filename, grid):
+	"""
+	Write the grid as binary legacy vtk file (unstructured grid), like the files of the FE analysis.
+	"""
+	number_of_cells = grid.get_number_of_cells()
+	with open(filename, 'wb') as f:
+		def write_line(text):
+			f.write((text + '\n').encode('ascii'))
+		write_line('# vtk DataFile Version 3.0')
+		write_line('ToothVR synthetic benchmark grid')
+		write_line('BINARY')
+		write_line('DATASET UNSTRUCTURED_GRID')
+		# Binary legacy files are big endian
+		write_line('POINTS {0} float'.format(len(grid.points)))
+		grid.points.astype('>f4').tofile(f)
+		write_line('')
+		# Every cell is written as number of points followed by the point ids
+		size = sum(cells.size + len(cells) for cell_type, cells in grid.cell_blocks)
+		write_line('CELLS {0} {1}'.format(number_of_cells, size))
+		for cell_type, cells in grid.cell_blocks:
+			block = numpy.empty((len(cells), cells.shape[1]+1), dtype='>i4')
+			block[:, 0] = cells.shape[1]
+			block[:, 1:] = cells
+			block.tofile(f)
+		write_line('')
+		write_line('CELL_TYPES {0}'.format(number_of_cells))
+		for cell_type, cells in grid.cell_blocks:
+			numpy.full(len(cells), cell_type, dtype='>i4').tofile(f)
+		write_line('')
+		write_line('CELL_DATA {0}'.format(number_of_cells))
+		for name in sorted(grid.cell_data.keys()):
+			values = grid.cell_data[name]
+			if numpy.issubdtype(values.dtype, numpy.integer):
+				write_line('SCALARS {0} int 1'.format(name))
+				write_line('LOOKUP_TABLE default')
+				values.astype('>i4').tofile(f)
+			else:
+				write_line('SCALARS {0} float 1'.format(name))
+				write_line('LOOKUP_TABLE default')
+				values.astype('>f4').tofile(f)
+			write_line('')
+
+
+def _measure(timings, name, function, repeat=1):
+	"""
+	Call the function repeat times and save the best time in timings[name].
+	Returns the result of the last call.
+	"""
+	best = None
+	result = None
+	for i in range(repeat):
+		start = time.time()
+		result = function()
+		duration = time.time() - start
+		if best is None or duration < best:
+			best = duration
+	timings[name] = best
+	print("  {0:<22} {1:10.4f} s".format(name, best))
+	return result
+
+
+def _get_clip_set(center, size):
+	"""
+	Returns a clip set with two planes through the center and a box around it.
+	"""
+	import Clipping
+	box = (center, ((1, 0, 0), (0, 1, 0), (0, 0, 1)), (size / 4, size / 4, size / 4))
+	return Clipping.Clip_Set([(center, (1, 0, 0)), (center, (0, 1, 1))], box, "or")
+
+
+def run_case(filename, repeat=1):
+	"""
+	Measure the operations of Simulation_Data on one file and return the timings in seconds.
+	Needs the Vizard runtime.
+	"""
+	import config as cfg
+	import Processing
+	import Clipping
+	import Renderer
+	import Simulation_Data
+	timings = {}
+
+	# Opening the file includes the first reload_models()
+	data = _measure(timings, 'open', lambda: Simulation_Data.Simulation_Data(filename))
+	# Measure complete rebuilds. Otherwise reload_models() only rebuilds materials, which changed.
+	rebuild = lambda: (data.invalidate_models(), data.reload_models())
+	_measure(timings, 'reload_models', rebuild, repeat)
+
+	# Upload the geometry of the displayed models to Vizard: PLY file vs. on-the-fly API (see Renderer.py)
+	buffers = list(data._cloud_pool.buffers.values()) + list(data._surface_pool.buffers.values())
+	for name, bulk_upload in (('build_bulk', True), ('build_immediate', False)):
+		renderer = Renderer.Vizard_Renderer(bulk_upload)
+		def build():
+			for model in [renderer.build(material_buffers) for material_buffers in buffers]:
+				renderer.forget(model)
+				model.remove()
+		_measure(timings, name, build, repeat)
+
+	# Generate the models of the complete data set (without material separation)
+	# In server mode the data isn't available on the client.
+	if data.mesh is not None:
+		color_range = data.get_color_range()
+		group = _measure(timings, 'generate_cloud', lambda: data.generate_cloud(
+			Processing.generate_cloud_buffers(data.mesh, cfg.coloring_name, color_range[0], color_range[1])), repeat)
+		group.remove()
+		group = _measure(timings, 'generate_surface', lambda: data.generate_surface(
+			Processing.generate_surface_buffers(data.mesh, cfg.coloring_name, color_range[0], color_range[1])), repeat)
+		group.remove()
+
+	# Clip through the center of the data
+	data.clip_set = Clipping.Clip_Set().with_plane(data._original_center, (1, 0, 0))
+	_measure(timings, 'clip', rebuild, repeat)
+	# Move the clip plane a bit. Only the intersected materials are rebuilt.
+	offsets = itertools.cycle([1e-3, 0])
+	def move_clip():
+		data.clip_set = Clipping.Clip_Set().with_plane(
+			(data._original_center[0] + next(offsets), data._original_center[1], data._original_center[2]), (1, 0, 0))
+		data.reload_models()
+	_measure(timings, 'clip_move', move_clip, repeat)
+	# Two planes and a box in one pass
+	data.clip_set = _get_clip_set(data._original_center, data._diagonal)
+	_measure(timings, 'clip_set', rebuild, repeat)
+	data.clip_set = Clipping.Clip_Set()
+	data.reload_models()
+
+	# Probe the center of the data
+	_measure(timings, 'probe', lambda: data.get_probe_value(data._original_center), repeat)
+
+	# Change the point size
+	_measure(timings, 'point_size', lambda: data.set_cloud_point_size(data.get_cloud_point_size()+1), repeat)
+
+	# Recolor with another array. Only the colors of the existing models are updated (see Simulation_Data.recolor_models()).
+	# The models are rebuilt with the other array, too, to compare both ways.
+	# In server mode the cell data isn't available on the client, so the models have to be rebuilt.
+	coloring_name = cfg.coloring_name
+	cfg.coloring_name = cfg.material_name
+	try:
+		if data.mesh is not None:
+			_measure(timings, 'recolor', data.recolor_models, repeat)
+		_measure(timings, 'recolor_reload', rebuild, repeat)
+	finally:
+		cfg.coloring_name = coloring_name
+	if data.mesh is not None:
+		data.recolor_models()
+
+	# Traffic between ParaView and the client
+	statistics = data.get_fetch_statistics()
+	timings['fetch'] = statistics['seconds']
+	timings['fetched_megabytes'] = statistics['bytes'] / 1024.0**2
+	data.remove()
+	return timings
+
+
+def run_headless_case(filename, repeat=1):
+	"""
+	Measure the operations of Processing_Data (without Vizard) on one file and return the timings in seconds.
+	"""
+	import config as cfg
+	import Processing
+	import Clipping
+	timings = {}
+
+	data = _measure(timings, 'open', lambda: Processing.Processing_Data(filename))
+	_measure(timings, 'reload_models', data.reload_models, repeat)
+
+	color_range = data.get_color_range()
+	_measure(timings, 'generate_cloud', lambda: Processing.generate_cloud_buffers(
+		data.mesh, data.coloring_name, color_range[0], color_range[1]), repeat)
+	_measure(timings, 'generate_surface', lambda: Processing.generate_surface_buffers(
+		data.mesh, data.coloring_name, color_range[0], color_range[1]), repeat)
+
+	data.clip_set = Clipping.Clip_Set().with_plane(data._original_center, (1, 0, 0))
+	_measure(timings, 'clip', data.reload_models, repeat)
+	bounds = data.vtk_data.GetBounds()
+	data.clip_set = _get_clip_set(data._original_center, numpy.linalg.norm([bounds[1]-bounds[0], bounds[3]-bounds[2], bounds[5]-bounds[4]]))
+	_measure(timings, 'clip_set', data.reload_models, repeat)
+	data.clip_set = Clipping.Clip_Set()
+	data.reload_models()
+
+	_measure(timings, 'probe', lambda: data.get_probe_value(data._original_center), repeat)
+
+	data.coloring_name = cfg.material_name
+	_measure(timings, 'recolor', data.recolor_models, repeat)
+	_measure(timings, 'recolor_reload', data.reload_models, repeat)
+
+	data.remove()
+	return timings
+
+
+def _case_key(case):
+	"""
+	Returns the properties, which identify comparable cases.
+	"""
+	return (case['cells'], case['cell_type'], case['materials'], case['stress_field'], case.get('headless', False))
+
+
+def compare(results, baseline):
+	"""
+	Print the relative timings of results compared to baseline (both loaded result dicts).
+	"""
+	old_cases = {}
+	for case in baseline['cases']:
+		old_cases[_case_key(case)] = case
+	print("Comparison with {0} ({1}):".format(baseline.get('version'), baseline.get('date')))
+	for case in results['cases']:
+		key = _case_key(case)
+		if key not in old_cases:
+			continue
+		print("{0} cells, {1}:".format(case['cells'], case['cell_type']))
+		for name, duration in sorted(case['timings'].items()):
+			old_duration = old_cases[key]['timings'].get(name)
+			if old_duration:
+				print("  {0:<22} {1:10.4f} s -> {2:10.4f} s ({3:+.1f} %)".format(
+					name, old_duration, duration, (duration - old_duration) / old_duration * 100))
+
+
+def _get_version():
+	"""
+	Returns the current git commit, if available.
+	"""
+	try:
+		import subprocess
+		directory = os.path.dirname(os.path.abspath(__file__))
+		output = subprocess.check_output(['git', 'describe', '--always', '--dirty'], cwd=directory)
+		return output.decode('ascii').strip()
+	except Exception:
+		return 'unknown'
+
+
+def main(argv=None):
+	parser = argparse.ArgumentParser(description="Benchmark the ToothVR data processing with synthetic grids.")
+	parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES, help="Numbers of cells of the generated grids")
+	parser.add_argument('--cell-type', choices=CELL_TYPES, default='tetra')
+	parser.add_argument('--materials', type=int, default=3, help="Number of materials")
+	parser.add_argument('--stress-field', choices=STRESS_FIELDS, default='bending')
+	parser.add_argument('--seed', type=int, default=0)
+	parser.add_argument('--repeat', type=int, default=1, help="Repetitions of every measurement (the best time is saved)")
+	parser.add_argument('--directory', default='.', help="Directory for the generated grids")
+	parser.add_argument('--keep-files', action='store_true', help="Don't delete the generated grids")
+	parser.add_argument('--generate-only', action='store_true', help="Only write the grids, don't measure")
+	parser.add_argument('--headless', action='store_true', help="Measure the processing without Vizard (see Processing.py)")
+	parser.add_argument('--output', default='benchmark_results.json', help="JSON file for the results")
+	parser.add_argument('--compare', help="JSON file of an older run to compare with")
+	args = parser.parse_args(argv)
+
+	results = {
+		'version': _get_version(),
+		'date': time.strftime('%Y-%m-%d %H:%M:%S'),
+		'platform': platform.platform(),
+		'python': platform.python_version(),
+		'cases': []}
+
+	for size in args.sizes:
+		filename = os.path.join(args.directory, 'benchmark_{0}_{1}_{2}.vtk'.format(args.cell_type, args.materials, size))
+		print("Generating {0} cells ({1}, {2} materials)".format(size, args.cell_type, args.materials))
+		grid = generate_grid(size, args.cell_type, args.materials, args.stress_field, args.seed)
+		write_vtk(filename, grid)
+		if args.generate_only:
+			print("  written to " + filename)
+			continue
+
+		if args.headless:
+			timings = run_headless_case(filename, args.repeat)
+		else:
+			timings = run_case(filename, args.repeat)
+		results['cases'].append({
+			'headless': args.headless,
+			'cells': size,
+			'points': len(grid.points),
+			'cell_type': args.cell_type,
+			'materials': args.materials,
+			'stress_field': args.stress_field,
+			'file_size': os.path.getsize(filename),
+			'timings': timings})
+		if not args.keep_files:
+			os.remove(filename)
+
+	if args.generate_only:
+		return results
+
+	with open(args.output, 'w') as f:
+		json.dump(results, f, indent=2, sort_keys=True)
+	print("Results saved to " + args.output)
+
+	if args.compare:
+		with open(args.compare) as f:
+			compare(results, json.load(f))
+	return results
+
+
+if __name__ == "__main__":
+	# Simulation_Data needs a running Vizard instance
+	with_vizard = '--generate-only' not in sys.argv and '--headless' not in sys.argv
+	if with_vizard:
+		import viz
+		viz.go()
+	main()
+	if with_vizard:
+		viz.quit()
@@ -0,0 +1,431 @@
+﻿"""
+Copyright 2018 Andreas Wundlechner
+
+GNU Lesser General Public License Usage
+This file has to be used under the terms of the GNU Lesser
+General Public License version 3 or later as published by the Free Software
+Foundation and appearing in the file LICENSE included in the
+packaging of this file. Please review the following information to
+ensure the GNU Lesser General Public License version 3 requirements
+will be met: https://www.gnu.org/licenses/lgpl-3.0.html.
+"""
+
+"""
+This file contains the catalog of the data directory.
+It reads only the headers (and for binary files the point and material blocks) of the vtk files
+and keeps the results in an index file in the directory, so the information is available instantly in the next session.
+Only new or changed files are read again. This file doesn't depend on Vizard.
+
+Usage:
+	Catalog.py C:\\Programmierzeug\\Testdaten\\
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+import numpy
+import psutil
+import config as cfg
+import MemoryGovernor
+
+
+# Name of the index file in the data directory
+INDEX_FILENAME = '.toothvr_catalog.json'
+# Increase, if the information in the index changes
+INDEX_VERSION = 2
+# File types, which are listed
+EXTENSIONS = ('.vtk', '.vtu')
+
+# Sizes of the data types in legacy vtk files
+_TYPE_SIZES = {
+	'bit': 1, 'char': 1, 'unsigned_char': 1, 'short': 2, 'unsigned_short': 2,
+	'int': 4, 'unsigned_int': 4, 'long': 8, 'unsigned_long': 8, 'vtkidtype': 4,
+	'float': 4, 'double': 8, 'vtktypeint32': 4, 'vtktypeint64': 8}
+# NumPy types of the data types in binary legacy vtk files (big endian)
+_NUMPY_TYPES = {
+	'char': '>i1', 'unsigned_char': '>u1', 'short': '>i2', 'unsigned_short': '>u2',
+	'int': '>i4', 'unsigned_int': '>u4', 'long': '>i8', 'unsigned_long': '>u8', 'vtkidtype': '>i4',
+	'float': '>f4', 'double': '>f8', 'vtktypeint32': '>i4', 'vtktypeint64': '>i8'}
+
+
+class Catalog:
+	"""
+	Index of the vtk files in a directory with their header information.
+	entries: dict filename -> information (see read_header())
+	"""
+	def __init__(self, directory=None):
+		self.directory = directory if directory is not None else cfg.standard_directory
+		self.entries = {}
+		self._load_index()
+
+
+	def _index_path(self):
+		return os.path.join(self.directory, INDEX_FILENAME)
+
+
+	def _load_index(self):
+		"""
+		Load the index of the last session.
+		"""
+		try:
+			with open(self._index_path()) as f:
+				index = json.load(f)
+			if index.get('version') == INDEX_VERSION:
+				self.entries = index['entries']
+		except (IOError, OSError, ValueError):
+			self.entries = {}
+
+
+	def _save_index(self):
+		"""
+		Save the index for the next session. A not writable directory only disables the cache.
+		"""
+		try:
+			with open(self._index_path(), 'w') as f:
+				json.dump({'version': INDEX_VERSION, 'entries': self.entries}, f, indent=1, sort_keys=True)
+		except (IOError, OSError):
+			pass
+
+
+	def update(self, workers=8):
+		"""
+		Scan the directory and read the headers of new and changed files in parallel.
+		Returns the entries sorted by filename.
+		"""
+		try:
+			filenames = sorted(name for name in os.listdir(self.directory) if name.lower().endswith(EXTENSIONS))
+		except OSError:
+			filenames = []
+		changed = False
+		# Remove deleted files
+		for name in list(self.entries.keys()):
+			if name not in filenames:
+				del self.entries[name]
+				changed = True
+		# Find new and changed files
+		outdated = []
+		for name in filenames:
+			stat = os.stat(os.path.join(self.directory, name))
+			entry = self.entries.get(name)
+			if entry is None or entry['mtime'] != stat.st_mtime or entry['file_size'] != stat.st_size:
+				outdated.append(name)
+		if outdated:
+			with ThreadPoolExecutor(max_workers=workers) as executor:
+				results = executor.map(lambda name: read_header(os.path.join(self.directory, name)), outdated)
+				for name, entry in zip(outdated, results):
+					self.entries[name] = entry
+			changed = True
+		if changed:
+			self._save_index()
+		return self.get_entries()
+
+
+	def get_entries(self):
+		"""
+		Returns a list of the entries sorted by filename. Every entry has an additional key "filename" with the full path.
+		"""
+		result = []
+		for name in sorted(self.entries.keys()):
+			entry = dict(self.entries[name])
+			entry['filename'] = os.path.join(self.directory, name)
+			result.append(entry)
+		return result
+
+
+	def get_entry(self, filename):
+		"""
+		Returns the entry of a file. Files outside of the directory are read directly.
+		"""
+		if os.path.dirname(os.path.abspath(filename)) == os.path.abspath(self.directory):
+			self.update()
+			entry = self.entries.get(os.path.basename(filename))
+			if entry is not None:
+				return entry
+		return read_header(filename)
+
+
+
+def read_header(filename):
+	"""
+	Read the information of a vtk file without loading the complete file.
+	Returns a dict with: format, cells, points, cell_arrays, point_arrays, materials (list or None),
+	bounds (or None), estimated_memory (bytes), mtime, file_size and error (None if the file could be read).
+	"""
+	stat = os.stat(filename)
+	info = {
+		'format': None,
+		'cells': None,
+		'points': None,
+		'connectivity': None,
+		'cell_arrays': [],
+		'point_arrays': [],
+		'materials': None,
+		'bounds': None,
+		'estimated_memory': None,
+		'mtime': stat.st_mtime,
+		'file_size': stat.st_size,
+		'error': None}
+	try:
+		if filename.lower().endswith('.vtu'):
+			_read_xml_header(filename, info)
+		else:
+			_read_legacy_header(filename, info)
+		info['estimated_memory'] = estimate_memory(info)
+	except Exception as e:
+		info['error'] = str(e)
+	return info
+
+
+def _read_legacy_header(filename, info):
+	"""
+	Read the keywords of a legacy vtk file. Binary blocks are skipped with seek,
+	only the points (bounds) and the material array are read.
+	"""
+	with open(filename, 'rb') as f:
+		version = f.readline().decode('ascii', 'replace')
+		match = re.search(r'Version\s+(\d+)', version)
+		major_version = int(match.group(1)) if match else 3
+		f.readline()
+		binary = f.readline().decode('ascii', 'replace').strip().upper() == 'BINARY'
+		info['format'] = 'legacy binary' if binary else 'legacy ascii'
+		dataset = f.readline().decode('ascii', 'replace').split()
+		if len(dataset) < 2 or dataset[1].upper() != 'UNSTRUCTURED_GRID':
+			raise ValueError("Only unstructured grids are supported.")
+		reader = _Legacy_Block_Reader(f, binary)
+
+		attribute = None
+		while True:
+			line = reader.next_line()
+			if line is None:
+				break
+			words = line.split()
+			keyword = words[0].upper()
+			if keyword == 'POINTS':
+				info['points'] = int(words[1])
+				points = reader.read(info['points'] * 3, words[2]).reshape(-1, 3)
+				if len(points):
+					minimum = points.min(axis=0)
+					maximum = points.max(axis=0)
+					info['bounds'] = [float(minimum[0]), float(maximum[0]), float(minimum[1]), float(maximum[1]), float(minimum[2]), float(maximum[2])]
+			elif keyword == 'CELLS':
+				info['cells'] = int(words[1])
+				if major_version >= 5:
+					# Offsets and connectivity are stored in separate blocks
+					offsets = reader.next_line().split()
+					reader.skip(int(words[1]), offsets[1])
+					connectivity = reader.next_line().split()
+					reader.skip(int(words[2]), connectivity[1])
+					info['cells'] = int(words[1]) - 1
+					info['connectivity'] = int(words[2])
+				else:
+					reader.skip(int(words[2]), 'int')
+					info['connectivity'] = int(words[2]) - int(words[1])
+			elif keyword == 'CELL_TYPES':
+				reader.skip(int(words[1]), 'int')
+			elif keyword in ('CELL_DATA', 'POINT_DATA'):
+				attribute = (keyword, int(words[1]))
+			elif keyword == 'SCALARS':
+				components = int(words[3]) if len(words) > 3 else 1
+				table = reader.next_line()
+				if not table.upper().startswith('LOOKUP_TABLE'):
+					reader.push_back(table)
+				_read_attribute_array(reader, info, attribute, words[1], attribute[1] * components, words[2])
+			elif keyword in ('VECTORS', 'NORMALS'):
+				_read_attribute_array(reader, info, attribute, words[1], attribute[1] * 3, words[2])
+			elif keyword == 'TENSORS':
+				_read_attribute_array(reader, info, attribute, words[1], attribute[1] * 9, words[2])
+			elif keyword == 'FIELD':
+				for i in range(int(words[2])):
+					array = reader.next_line().split()
+					if array[-1].upper() == 'NULL_ARRAY':
+						continue
+					_read_attribute_array(reader, info, attribute, array[0], int(array[1]) * int(array[2]), array[3])
+			elif keyword in ('METADATA', 'INFORMATION', 'NAME', 'DATA', 'COMPONENT_NAMES'):
+				# Meta data is ended by an empty line or consists of single lines
+				continue
+
+
+def _read_attribute_array(reader, info, attribute, name, count, data_type):
+	"""
+	Register an array of the cell or point data and skip its values. The material array is read.
+	"""
+	if attribute is None:
+		# Field data of the whole data set
+		reader.skip(count, data_type)
+		return
+	if attribute[0] == 'CELL_DATA':
+		info['cell_arrays'].append(name)
+		if name == cfg.material_name:
+			materials = numpy.unique(reader.read(count, data_type))
+			info['materials'] = [int(material) for material in materials]
+			return
+	else:
+		info['point_arrays'].append(name)
+	reader.skip(count, data_type)
+
+
+
+class _Legacy_Block_Reader:
+	"""
+	Helper for reading the lines and data blocks of legacy vtk files.
+	"""
+	def __init__(self, f, binary):
+		self._f = f
+		self._binary = binary
+		self._pushed_back = None
+		# Values of the current ascii line, which aren't used yet
+		self._tokens = []
+
+
+	def next_line(self):
+		"""
+		Returns the next not empty line (None at the end of the file).
+		"""
+		if self._pushed_back is not None:
+			line, self._pushed_back = self._pushed_back, None
+			return line
+		while True:
+			line = self._f.readline()
+			if not line:
+				return None
+			line = line.decode('ascii', 'replace').strip()
+			if line:
+				return line
+
+
+	def push_back(self, line):
+		self._pushed_back = line
+
+
+	def skip(self, count, data_type):
+		"""
+		Skip count values of the data type.
+		"""
+		data_type = data_type.lower()
+		if self._binary:
+			if data_type == 'bit':
+				self._f.seek((count + 7) // 8, os.SEEK_CUR)
+			else:
+				self._f.seek(count * _TYPE_SIZES[data_type], os.SEEK_CUR)
+		else:
+			self._read_tokens(count)
+
+
+	def read(self, count, data_type):
+		"""
+		Read count values of the data type.
+		"""
+		data_type = data_type.lower()
+		if self._binary:
+			return numpy.fromfile(self._f, dtype=_NUMPY_TYPES[data_type], count=count)
+		return numpy.array(self._read_tokens(count, True), dtype=numpy.float64)
+
+
+	def _read_tokens(self, count, keep=False):
+		"""
+		Read count values of an ascii block. Returns them if keep is True.
+		"""
+		values = []
+		while count > 0:
+			if not self._tokens:
+				line = self._f.readline()
+				if not line:
+					raise ValueError("Unexpected end of the file.")
+				self._tokens = line.split()
+				continue
+			used = self._tokens[:count]
+			self._tokens = self._tokens[count:]
+			count -= len(used)
+			if keep:
+				values.extend(float(value) for value in used)
+		return values
+
+
+
+def _read_xml_header(filename, info):
+	"""
+	Read the header of a XML vtk file (.vtu). The header is in front of the (appended) data.
+	"""
+	info['format'] = 'xml'
+	with open(filename, 'rb') as f:
+		header = f.read(1024 * 1024).decode('ascii', 'replace')
+	header = header.split('<AppendedData')[0]
+	piece = re.search(r'<Piece[^>]*NumberOfPoints="(\d+)"[^>]*NumberOfCells="(\d+)"', header)
+	if piece is None:
+		raise ValueError("No unstructured grid piece found.")
+	info['points'] = int(piece.group(1))
+	info['cells'] = int(piece.group(2))
+	for kind, key in (('CellData', 'cell_arrays'), ('PointData', 'point_arrays')):
+		block = re.search(r'<{0}[^>]*>(.*?)</{0}>'.format(kind), header, re.S)
+		if block is None:
+			continue
+		for array in re.finditer(r'<DataArray([^>]*)>', block.group(1)):
+			name = re.search(r'Name="([^"]*)"', array.group(1))
+			if name is None:
+				continue
+			info[key].append(name.group(1))
+			if kind == 'CellData' and name.group(1) == cfg.material_name:
+				minimum = re.search(r'RangeMin="([^"]*)"', array.group(1))
+				maximum = re.search(r'RangeMax="([^"]*)"', array.group(1))
+				if minimum and maximum:
+					info['materials'] = list(range(int(float(minimum.group(1))), int(float(maximum.group(1)))+1))
+
+
+def estimate_memory(info):
+	"""
+	Estimate the memory in bytes, which ToothVR needs to load the file in full detail (see MemoryGovernor.py).
+	"""
+	cells = info['cells'] or 0
+	connectivity = info['connectivity'] if info['connectivity'] is not None else cells * 4
+	components = MemoryGovernor.estimate_components(cells, info['points'] or 0, connectivity,
+		len(info['cell_arrays']), len(info['point_arrays']))
+	return int(sum(components.values()))
+
+
+def get_available_memory():
+	"""
+	Returns the currently available memory in bytes.
+	"""
+	return psutil.virtual_memory().available
+
+
+def fits_in_memory(info):
+	"""
+	Returns True if the estimated memory of the file is smaller than the available memory.
+	"""
+	if info.get('estimated_memory') is None:
+		return True
+	return info['estimated_memory'] < get_available_memory()
+
+
+def format_bytes(size):
+	"""
+	Returns a short, readable version of a number of bytes.
+	"""
+	for unit in ('B', 'KB', 'MB', 'GB'):
+		if abs(size) < 1024 or unit == 'GB':
+			return "{0:.1f} {1}".format(size, unit) if unit != 'B' else "{0} B".format(size)
+		size /= 1024.0
+
+
+
+if __name__ == "__main__":
+	parser = argparse.ArgumentParser(description="Update and print the catalog of a data directory.")
+	parser.add_argument('directory', nargs='?', default=cfg.standard_directory)
+	args = parser.parse_args()
+	start = time.time()
+	catalog = Catalog(args.directory)
+	entries = catalog.update()
+	print("Scanned {0} files in {1:.2f} s".format(len(entries), time.time() - start))
+	for entry in entries:
+		if entry['error']:
+			print("{0}: {1}".format(os.path.basename(entry['filename']), entry['error']))
+			continue
+		print("{0}: {1} cells, {2} points, materials {3}, needs about {4}{5}".format(
+			os.path.basename(entry['filename']), entry['cells'], entry['points'], entry['materials'],
+			format_bytes(entry['estimated_memory']), '' if fits_in_memory(entry) else ' (DOES NOT FIT)'))
+		print("    bounds {0}, cell arrays {1}".format(entry['bounds'], entry['cell_arrays']))
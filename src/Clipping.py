@@ -0,0 +1,214 @@
+﻿"""
+Copyright 2018 Andreas Wundlechner
+
+GNU Lesser General Public License Usage
+This file has to be used under the terms of the GNU Lesser
+General Public License version 3 or later as published by the Free Software
+Foundation and appearing in the file LICENSE included in the
+packaging of this file. Please review the following information to
+ensure the GNU Lesser General Public License version 3 requirements
+will be met: https://www.gnu.org/licenses/lgpl-3.0.html.
+"""
+
+"""
+This file contains the clip set: several planes and an oriented box, which are combined with "and" or "or".
+Every plane keeps the side in the direction of its normal and the box keeps its inside.
+The clip set is evaluated as one function at the points (>= 0 where a point is kept) with a single matrix product
+for all planes and box faces. The cells are cut where the function is 0 (see Processing.clip_mesh_by_values()).
+Clip sets are immutable, so they can be used as keys of caches and kept in a history.
+This file doesn't depend on Vizard.
+"""
+
+import numpy
+
+
+MODES = ("and", "or")
+
+
+class Clip_Set:
+	"""
+	planes: list of (origin, normal)
+	box: (center, axes, half_sizes) or None. axes are the three directions of the edges, half_sizes the half lengths along them.
+	mode: "and" keeps the points kept by every plane and the box, "or" keeps the points kept by any of them
+	"""
+	def __init__(self, planes=(), box=None, mode="and"):
+		if mode not in MODES:
+			raise ValueError("Unknown clip mode {0}".format(mode))
+		self.planes = tuple((_to_tuple(origin), _to_tuple(_normalize(normal))) for origin, normal in planes)
+		if box is not None:
+			center, axes, half_sizes = box
+			box = (_to_tuple(center), tuple(_to_tuple(_normalize(axis)) for axis in axes), _to_tuple(numpy.abs(half_sizes)))
+		self.box = box
+		self.mode = mode
+
+
+	def get_key(self):
+		"""
+		Returns a hashable description of the clip set.
+		"""
+		return (self.mode, self.planes, self.box)
+
+
+	def __eq__(self, other):
+		return isinstance(other, Clip_Set) and self.get_key() == other.get_key()
+
+
+	def __ne__(self, other):
+		return not self == other
+
+
+	def __hash__(self):
+		return hash(self.get_key())
+
+
+	def is_empty(self):
+		"""
+		Returns True if nothing is clipped.
+		"""
+		return not self.planes and self.box is None
+
+
+	def with_plane(self, origin, normal):
+		"""
+		Returns a copy with an additional plane.
+		"""
+		return Clip_Set(self.planes + ((origin, normal),), self.box, self.mode)
+
+
+	def with_box(self, box):
+		"""
+		Returns a copy with the box (None removes the box).
+		"""
+		return Clip_Set(self.planes, box, self.mode)
+
+
+	def with_mode(self, mode):
+		"""
+		Returns a copy with another mode.
+		"""
+		return Clip_Set(self.planes, self.box, mode)
+
+
+	def get_planes(self):
+		"""
+		Returns all planes including the six faces of the box (box faces are the last six) as (normals, offsets):
+		the distance of a point p to plane i is dot(p, normals[i]) - offsets[i].
+		"""
+		normals = [normal for origin, normal in self.planes]
+		offsets = [numpy.dot(origin, normal) for origin, normal in self.planes]
+		if self.box is not None:
+			center, axes, half_sizes = self.box
+			for axis, half_size in zip(axes, half_sizes):
+				position = numpy.dot(center, axis)
+				# Both faces point inwards
+				normals += [axis, tuple(-numpy.asarray(axis))]
+				offsets += [position - half_size, -position - half_size]
+		return numpy.array(normals, dtype=numpy.float64).reshape(-1, 3), numpy.array(offsets, dtype=numpy.float64)
+
+
+	def evaluate(self, points):
+		"""
+		Returns the clip function at the points (>= 0: kept, < 0: removed).
+		Every region (a plane or the box) is the signed distance to it. "and" takes the minimum, "or" the maximum of the regions.
+		"""
+		points = numpy.asarray(points, dtype=numpy.float64)
+		if self.is_empty():
+			return numpy.ones(len(points))
+		normals, offsets = self.get_planes()
+		# One pass over the points for all planes
+		distances = numpy.dot(points, normals.T) - offsets
+		regions = distances[:, :len(self.planes)]
+		if self.box is not None:
+			regions = numpy.concatenate([regions, distances[:, len(self.planes):].min(axis=1, keepdims=True)], axis=1)
+		if self.mode == "and":
+			return regions.min(axis=1)
+		return regions.max(axis=1)
+
+
+	def classify_bounds(self, bounds):
+		"""
+		Find out how the clip set affects the points within a bounding box (xmin, xmax, ymin, ymax, zmin, zmax).
+		Every plane is linear, so its extremes in the box are at the corners. They are combined like in evaluate(),
+		which gives a range, which contains the clip function of every point in the box.
+		Returns "kept" if every point is kept, "removed" if every point is removed, else "intersected" (not sure).
+		"""
+		if self.is_empty():
+			return "kept"
+		corners = numpy.array([[x, y, z] for x in bounds[0:2] for y in bounds[2:4] for z in bounds[4:6]], dtype=numpy.float64)
+		normals, offsets = self.get_planes()
+		distances = numpy.dot(corners, normals.T) - offsets
+		lower = list(distances.min(axis=0)[:len(self.planes)])
+		upper = list(distances.max(axis=0)[:len(self.planes)])
+		if self.box is not None:
+			lower.append(distances[:, len(self.planes):].min())
+			upper.append(distances.max(axis=0)[len(self.planes):].min())
+		combine = min if self.mode == "and" else max
+		if combine(lower) >= 0:
+			return "kept"
+		if combine(upper) < 0:
+			return "removed"
+		return "intersected"
+
+
+	def get_expression(self):
+		"""
+		Returns evaluate() as expression of the ParaView Calculator (coordsX/Y/Z are the coordinates of the points),
+		e.g. to clip with "or" on the server, which the chained Clip filters of the planes can't do.
+		"""
+		normals, offsets = self.get_planes()
+		distances = ["(coordsX*{0!r}+coordsY*{1!r}+coordsZ*{2!r}-{3!r})".format(normal[0], normal[1], normal[2], offset)
+			for normal, offset in zip(normals.tolist(), offsets.tolist())]
+		regions = distances[:len(self.planes)]
+		if self.box is not None:
+			regions.append(_combine("min", distances[len(self.planes):]))
+		return _combine("min" if self.mode == "and" else "max", regions)
+
+
+	def get_regions(self):
+		"""
+		Returns the list of regions as lists of (origin, normal) planes, which are all kept by the region ("and" within a region).
+		"""
+		regions = [[plane] for plane in self.planes]
+		if self.box is not None:
+			normals, offsets = self.get_planes()
+			regions.append([(tuple(normal * offset), tuple(normal)) for normal, offset in zip(normals[-6:], offsets[-6:])])
+		return regions
+
+
+	def describe(self):
+		"""
+		Returns a readable description.
+		"""
+		if self.is_empty():
+			return "No clip"
+		parts = ["{0} plane(s)".format(len(self.planes))] if self.planes else []
+		if self.box is not None:
+			parts.append("box at ({0:.3g}, {1:.3g}, {2:.3g})".format(*self.box[0]))
+		return "Clip with {0} combined with {1}".format(" and ".join(parts), self.mode)
+
+
+	def __repr__(self):
+		return "Clip_Set(planes={0}, box={1}, mode={2!r})".format(self.planes, self.box, self.mode)
+
+
+
+def _combine(function, terms):
+	"""
+	Returns the expression of the minimum or maximum of the terms (the functions of the Calculator take two arguments).
+	"""
+	expression = terms[0]
+	for term in terms[1:]:
+		expression = "{0}({1},{2})".format(function, expression, term)
+	return expression
+
+
+def _normalize(vector):
+	vector = numpy.asarray(vector, dtype=numpy.float64)
+	length = numpy.linalg.norm(vector)
+	if length == 0:
+		raise ValueError("A clip direction mustn't be zero")
+	return vector / length
+
+
+def _to_tuple(vector):
+	return tuple(float(value) for value in vector)
@@ -32,6 +32,29 @@ CONTROL_MATERIAL = viz.getEventID("CONTROL_MATERIAL_INTERNAL")
 CONTROL_TOGGLE_STRESSINDICATOR = viz.getEventID("CONTROL_TOGGLE_STRESSINDICATOR_INTERNAL")
 CONTROL_HAND_GRAB = viz.getEventID("CONTROL_HAND_GRAB_INTERNAL")
 CONTROL_HAND_RELEASE = viz.getEventID("CONTROL_HAND_RELEASE_INTERNAL")
+CONTROL_NEXT_HOTSPOT = viz.getEventID("CONTROL_NEXT_HOTSPOT_INTERNAL")
+# Time series: play/pause and scrubbing (sent with the number of steps, may be a fraction)
+CONTROL_PLAY_PAUSE = viz.getEventID("CONTROL_PLAY_PAUSE_INTERNAL")
+CONTROL_SCRUB = viz.getEventID("CONTROL_SCRUB_INTERNAL")
+# Sent with the change of the stress threshold as a fraction of the color range
+CONTROL_THRESHOLD = viz.getEventID("CONTROL_THRESHOLD_INTERNAL")
+# Sent with the change of the deformation scale as a fraction of the maximum scale
+CONTROL_WARP = viz.getEventID("CONTROL_WARP_INTERNAL")
+# Clip set: add or remove the box, switch between "and" and "or", remove every plane and the box
+CONTROL_CLIP_BOX = viz.getEventID("CONTROL_CLIP_BOX_INTERNAL")
+CONTROL_CLIP_MODE = viz.getEventID("CONTROL_CLIP_MODE_INTERNAL")
+CONTROL_CLIP_CLEAR = viz.getEventID("CONTROL_CLIP_CLEAR_INTERNAL")
+# Go back to the previous clip set or apply the undone clip set again
+CONTROL_CLIP_UNDO = viz.getEventID("CONTROL_CLIP_UNDO_INTERNAL")
+CONTROL_CLIP_REDO = viz.getEventID("CONTROL_CLIP_REDO_INTERNAL")
+# Switch between the models and the cross-section with the clipping plane
+CONTROL_SLICE = viz.getEventID("CONTROL_SLICE_INTERNAL")
+# Show or hide the iso-surfaces and change their iso value (sent with the change as a fraction of the color range)
+CONTROL_ISO_MODE = viz.getEventID("CONTROL_ISO_MODE_INTERNAL")
+CONTROL_ISO = viz.getEventID("CONTROL_ISO_INTERNAL")
+# Clamp the color range to percentiles or not, show or hide the histogram panel
+CONTROL_COLOR_CLAMP = viz.getEventID("CONTROL_COLOR_CLAMP_INTERNAL")
+CONTROL_TOGGLE_HISTOGRAM = viz.getEventID("CONTROL_TOGGLE_HISTOGRAM_INTERNAL")
 
 
 class _Controls(viz.EventClass):
@@ -53,6 +76,7 @@ _c.callback(viz.getEventID("CONTROL_CLOUD_INCREASE"), lambda e: viz.sendEvent(CO
 _c.callback(viz.getEventID("CONTROL_CLOUD_DECREASE"), lambda e: viz.sendEvent(CONTROL_CLOUD_DECREASE))
 _c.callback(viz.getEventID("CONTROL_CYCLE_VIEW_MODE"), lambda e: viz.sendEvent(CONTROL_CYCLE_VIEW_MODE))
 _c.callback(viz.getEventID("CONTROL_TOGGLE_STRESSINDICATOR"), lambda e: viz.sendEvent(CONTROL_TOGGLE_STRESSINDICATOR))
+_c.callback(viz.getEventID("CONTROL_NEXT_HOTSPOT"), lambda e: viz.sendEvent(CONTROL_NEXT_HOTSPOT))
 _c.callback(viz.getEventID("CONTROL_RIGHT_HAND_GRAB"), lambda e: viz.sendEvent(CONTROL_HAND_GRAB, _right_hand_number))
 _c.callback(viz.getEventID("CONTROL_LEFT_HAND_GRAB"), lambda e: viz.sendEvent(CONTROL_HAND_GRAB, _left_hand_number))
 _c.callback(viz.getEventID("CONTROL_RIGHT_HAND_RELEASE"), lambda e: viz.sendEvent(CONTROL_HAND_RELEASE, _right_hand_number))
@@ -60,10 +84,55 @@ _c.callback(viz.getEventID("CONTROL_LEFT_HAND_RELEASE"), lambda e: viz.sendEvent
 
 
 # Keyboard specifics
+# Change of the threshold per key press
+_THRESHOLD_KEY_STEP = 0.05
+# Change of the deformation scale per key press
+_WARP_KEY_STEP = 0.05
+# Change of the iso value per key press
+_ISO_KEY_STEP = 0.02
+# Keys for the clip set
+_CLIP_KEYS = {'x': CONTROL_CLIP_BOX, 'o': CONTROL_CLIP_MODE, 'c': CONTROL_CLIP_CLEAR, 'z': CONTROL_CLIP_UNDO, 'y': CONTROL_CLIP_REDO}
+
 def _on_key_down(key):
 	"""
 	Call the CONTROL_MATERIAL event dependent on the pressed number key.
+	The keys + and - move the stress threshold. Space plays or pauses a time series, the keys , and . go one step back or forward.
+	The keys w and s increase or decrease the deformation scale.
+	The key x adds or removes the clip box, o switches between "and" and "or" of the clip set and c removes the clip.
+	The keys z and y undo and redo the changes of the clip. The key l switches the slice mode on or off.
+	The key u shows or hides the iso-surfaces, the keys [ and ] lower or raise their iso value.
+	The key p clamps the color range to percentiles, g shows or hides the histogram panel.
 	"""
+	if key in ('+', '-'):
+		viz.sendEvent(CONTROL_THRESHOLD, _THRESHOLD_KEY_STEP if key == '+' else -_THRESHOLD_KEY_STEP)
+		return
+	if key in ('w', 's'):
+		viz.sendEvent(CONTROL_WARP, _WARP_KEY_STEP if key == 'w' else -_WARP_KEY_STEP)
+		return
+	if key in _CLIP_KEYS:
+		viz.sendEvent(_CLIP_KEYS[key])
+		return
+	if key == 'l':
+		viz.sendEvent(CONTROL_SLICE)
+		return
+	if key == 'u':
+		viz.sendEvent(CONTROL_ISO_MODE)
+		return
+	if key in ('[', ']'):
+		viz.sendEvent(CONTROL_ISO, _ISO_KEY_STEP if key == ']' else -_ISO_KEY_STEP)
+		return
+	if key == 'p':
+		viz.sendEvent(CONTROL_COLOR_CLAMP)
+		return
+	if key == 'g':
+		viz.sendEvent(CONTROL_TOGGLE_HISTOGRAM)
+		return
+	if key == ' ':
+		viz.sendEvent(CONTROL_PLAY_PAUSE)
+		return
+	if key in (',', '.'):
+		viz.sendEvent(CONTROL_SCRUB, 1 if key == '.' else -1)
+		return
 	try:
 		number = int(key)
 		viz.sendEvent(CONTROL_MATERIAL, number)
@@ -86,12 +155,14 @@ def _on_material_trigger(e):
 	"""
 	Function for the CONTROL_MATERIAL_TRIGGER event.
 	This function triggers the CONTROL_MATERIAL event depending on the touch position on the vive controller.
+	A press in the center plays or pauses a time series.
 	"""
 	trackpad = vizconnect.getRawInput('r_hand_input').getTrackpad()
-	# Calculate distance from the center of the touchpad to disable the event there.
+	# Calculate distance from the center of the touchpad to disable the material selection there.
 	# Controls in that region would be unprecise.
 	magnitude = math.sqrt(trackpad[0]**2+trackpad[1]**2)
 	if magnitude <=.2:
+		viz.sendEvent(CONTROL_PLAY_PAUSE)
 		return
 	# Calculate the angle between the x-axis and the trackpad point. (counter clockwise)
 	# Results reach from 0 to 2 pi radiants.
@@ -106,3 +177,59 @@ def _on_material_trigger(e):
 	# Trigger the event
 	viz.sendEvent(CONTROL_MATERIAL, number + _material_range[0])
 _c.callback(viz.getEventID("CONTROL_MATERIAL_TRIGGER"), _on_material_trigger)
+
+
+# Change of the threshold for sweeping over the whole left trackpad
+_THRESHOLD_SWEEP_RANGE = 0.5
+# Change of the iso value for sweeping vertically over the whole left trackpad
+_ISO_SWEEP_RANGE = 0.5
+# Number of time steps for sweeping over the whole right trackpad
+_SCRUB_SWEEP_STEPS = 10
+# Change of the deformation scale (fraction of the maximum) for sweeping vertically over the whole right trackpad
+_WARP_SWEEP_RANGE = 1.0
+# Last touched position on the trackpads (None while it isn't touched)
+_last_sweep_positions = {'l_hand_input': None, 'r_hand_input': None}
+
+def _get_sweep(name):
+	"""
+	Returns the movement (x, y) of a finger on the trackpad of the input since the last frame ((0, 0) if there is none).
+	Only touching counts. Pressed trackpads are used for other controls.
+	"""
+	try:
+		input = vizconnect.getRawInput(name)
+	except:
+		# The control scheme has no such controller
+		return 0, 0
+	if not hasattr(input, 'getTrackpad'):
+		return 0, 0
+	trackpad = input.getTrackpad()
+	# The trackpad reports (0, 0) while it isn't touched
+	if (trackpad[0] == 0 and trackpad[1] == 0) or input.isButtonDown(3):
+		_last_sweep_positions[name] = None
+		return 0, 0
+	last = _last_sweep_positions[name]
+	_last_sweep_positions[name] = (trackpad[0], trackpad[1])
+	if last is None:
+		return 0, 0
+	return trackpad[0] - last[0], trackpad[1] - last[1]
+
+def _on_update(e):
+	"""
+	Sweep the stress threshold by sliding horizontally over the left trackpad, sliding vertically changes the iso value.
+	Sliding horizontally over the right trackpad scrubs through the steps of a time series,
+	sliding vertically changes the deformation scale.
+	"""
+	sweep_x, sweep_y = _get_sweep('l_hand_input')
+	if abs(sweep_x) >= abs(sweep_y):
+		if sweep_x:
+			viz.sendEvent(CONTROL_THRESHOLD, sweep_x / 2.0 * _THRESHOLD_SWEEP_RANGE)
+	else:
+		viz.sendEvent(CONTROL_ISO, sweep_y / 2.0 * _ISO_SWEEP_RANGE)
+	sweep_x, sweep_y = _get_sweep('r_hand_input')
+	# Only the main direction counts, so a scrub doesn't change the scale
+	if abs(sweep_x) >= abs(sweep_y):
+		if sweep_x:
+			viz.sendEvent(CONTROL_SCRUB, sweep_x / 2.0 * _SCRUB_SWEEP_STEPS)
+	else:
+		viz.sendEvent(CONTROL_WARP, sweep_y / 2.0 * _WARP_SWEEP_RANGE)
+_c.callback(viz.UPDATE_EVENT, _on_update)
@@ -0,0 +1,142 @@
+﻿"""
+Copyright 2018 Andreas Wundlechner
+
+GNU Lesser General Public License Usage
+This file has to be used under the terms of the GNU Lesser
+General Public License version 3 or later as published by the Free Software
+Foundation and appearing in the file LICENSE included in the
+packaging of this file. Please review the following information to
+ensure the GNU Lesser General Public License version 3 requirements
+will be met: https://www.gnu.org/licenses/lgpl-3.0.html.
+"""
+
+"""
+This file contains the file chooser, which is displayed in VR.
+It lists the files of the catalog (see Catalog.py) with their size and warns before a file gets opened, which doesn't fit into the memory.
+While it is displayed, ToothVR forwards the point size buttons (select a file) and the clip button (open it) to the chooser.
+"""
+
+import viz
+import os
+import Catalog
+
+
+# Number of files, which are displayed at once
+_VISIBLE_LINES = 9
+
+
+class File_Chooser:
+	"""
+	Panel in front of the user to select a file of the data directory.
+	on_select gets called with the filename of the selected file.
+	"""
+	def __init__(self, on_select, directory=None):
+		self._on_select = on_select
+		self.catalog = Catalog.Catalog(directory)
+		self._entries = []
+		self._index = 0
+		# True after the first press on a file, which doesn't fit into the memory
+		self._warned = False
+
+		# Create the panel with the list of files and the information about the selected file
+		self._panel = viz.addGroup()
+		self._panel.setPosition([0,1.6,1])
+		self._title = viz.addText3D('', parent=self._panel)
+		self._title.alignment(viz.ALIGN_LEFT_BOTTOM)
+		self._title.setScale([.04,.04,.04])
+		self._title.setPosition([-.6,.05,0])
+		self._list = viz.addText3D('', parent=self._panel)
+		self._list.alignment(viz.ALIGN_LEFT_TOP)
+		self._list.setScale([.03,.03,.03])
+		self._list.setPosition([-.6,0,0])
+		self._info = viz.addText3D('', parent=self._panel)
+		self._info.alignment(viz.ALIGN_LEFT_TOP)
+		self._info.setScale([.025,.025,.025])
+		self._info.setPosition([-.6,-.36,0])
+		self._panel.visible(False)
+
+
+	def show(self):
+		"""
+		Update the catalog and display the panel.
+		"""
+		self._entries = self.catalog.update()
+		self._index = min(self._index, max(len(self._entries) - 1, 0))
+		self._warned = False
+		self._panel.visible(True)
+		self._update_text()
+
+
+	def hide(self):
+		self._panel.visible(False)
+
+
+	def is_visible(self):
+		return self._panel.getVisible()
+
+
+	def move_selection(self, step):
+		"""
+		Select the previous (step < 0) or next (step > 0) file.
+		"""
+		if not self.is_visible() or not self._entries:
+			return
+		self._index = (self._index + step) % len(self._entries)
+		self._warned = False
+		self._update_text()
+
+
+	def confirm(self):
+		"""
+		Open the selected file. Files, which don't fit into the memory, need a second press.
+		"""
+		if not self.is_visible() or not self._entries:
+			return
+		entry = self._entries[self._index]
+		if entry['error']:
+			return
+		if not Catalog.fits_in_memory(entry) and not self._warned:
+			self._warned = True
+			self._update_text()
+			return
+		self.hide()
+		self._on_select(entry['filename'])
+
+
+	def _update_text(self):
+		"""
+		Display the files around the selected one and the information about the selected file.
+		"""
+		self._title.message("Choose a file ({0})".format(self.catalog.directory))
+		if not self._entries:
+			self._list.message("No files found.")
+			self._info.message("Press the new file button to browse.")
+			return
+		first = max(0, min(self._index - _VISIBLE_LINES // 2, len(self._entries) - _VISIBLE_LINES))
+		lines = []
+		for i in range(first, min(first + _VISIBLE_LINES, len(self._entries))):
+			entry = self._entries[i]
+			line = "{0} {1}".format('>' if i == self._index else ' ', os.path.basename(entry['filename']))
+			if entry['error']:
+				line += "  (unreadable)"
+			else:
+				line += "  {0} cells, {1}".format(entry['cells'], Catalog.format_bytes(entry['estimated_memory']))
+				if not Catalog.fits_in_memory(entry):
+					line += "  (too large)"
+			lines.append(line)
+		self._list.message('\n'.join(lines))
+
+		entry = self._entries[self._index]
+		if entry['error']:
+			info = "Can't read the file: {0}".format(entry['error'])
+		else:
+			info = "{0} points, materials {1}\nCell arrays: {2}".format(entry['points'], entry['materials'], ', '.join(entry['cell_arrays']))
+			if entry['bounds'] is not None:
+				info += "\nSize: {0:.3g} x {1:.3g} x {2:.3g}".format(entry['bounds'][1]-entry['bounds'][0], entry['bounds'][3]-entry['bounds'][2], entry['bounds'][5]-entry['bounds'][4])
+			if not Catalog.fits_in_memory(entry):
+				info += "\nWARNING: Needs about {0}, but only {1} are available.".format(
+					Catalog.format_bytes(entry['estimated_memory']), Catalog.format_bytes(Catalog.get_available_memory()))
+				if self._warned:
+					info += "\nPress the clip button again to open it anyway."
+		self._info.message(info)
+		self._info.color(viz.RED if self._warned or (not entry['error'] and not Catalog.fits_in_memory(entry)) else viz.WHITE)
@@ -61,6 +61,9 @@ class GrabAndZoom(viz.EventClass):
 		Trigger the grab.
 		hand_number is the index of the hand in the tracker list.
 		"""
+		# Stop animations of the object (e.g. moving to a hotspot), which would work against the hand
+		if self._obj is not None:
+			self._obj.clearActions()
 		# if you're currently not zooming
 		if self._zooming_object is None:
 			self._grabs[hand_number] = _Grab(self._grabbers[hand_number], self._obj)
@@ -59,6 +59,38 @@ def get_local_normal(semi_parent, semi_child):
 	return normal
 
 
+def get_local_axes(semi_parent, semi_child):
+	"""
+	This function calculates the x, y and z axis of the semi_child in relation to the semi_parent.
+	"""
+	# Save semi_child information
+	parents = semi_child.getParents()
+	child_euler = semi_child.getEuler(viz.ABS_GLOBAL)
+	# Change parent
+	semi_child.setParent(semi_parent)
+	semi_child.setEuler(child_euler, viz.ABS_GLOBAL)
+	# Read the relative axes
+	axes = [semi_child.getNormal(i, viz.ABS_PARENT) for i in range(3)]
+	# Undo the changes
+	semi_child.setParent(viz.WORLD)
+	for parent in parents:
+		semi_child.addParent(parent)
+	semi_child.setEuler(child_euler, viz.ABS_GLOBAL)
+	
+	return axes
+
+
+def get_global_position(semi_parent, position):
+	"""
+	This function calculates the global position of a position in relation to the semi_parent.
+	"""
+	tmp = viz.addGroup(parent=semi_parent)
+	tmp.setPosition(position)
+	global_position = tmp.getPosition(viz.ABS_GLOBAL)
+	tmp.remove()
+	return global_position
+
+
 def get_distance(start, end):
 	"""
 	This function calculates the distance between two points.
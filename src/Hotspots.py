@@ -0,0 +1,130 @@
+﻿"""
+Copyright 2018 Andreas Wundlechner
+
+GNU Lesser General Public License Usage
+This file has to be used under the terms of the GNU Lesser
+General Public License version 3 or later as published by the Free Software
+Foundation and appearing in the file LICENSE included in the
+packaging of this file. Please review the following information to
+ensure the GNU Lesser General Public License version 3 requirements
+will be met: https://www.gnu.org/licenses/lgpl-3.0.html.
+"""
+
+"""
+This file contains the hotspot index.
+It finds the cells with the highest values (e.g. equivalent_stress) with a partial selection (numpy.argpartition)
+instead of sorting every cell, and clusters them spatially, so every peak region is one hotspot.
+This file doesn't depend on Vizard.
+"""
+
+import numpy
+
+
+class Hotspot:
+	"""
+	Cluster of cells with high values.
+	position: center of the cell with the highest value
+	center: mean center of the cells of the cluster
+	extent: biggest distance of a cell of the cluster from center
+	value: highest value of the cluster
+	cell_id: original cell id of the cell with the highest value
+	material: material of the cell with the highest value (None if unknown)
+	count: number of top cells in the cluster
+	radius: radius of the clustering
+	"""
+	def __init__(self, position, center, extent, value, cell_id, material, count, radius):
+		self.position = position
+		self.center = center
+		self.extent = extent
+		self.value = value
+		self.cell_id = cell_id
+		self.material = material
+		self.count = count
+		self.radius = radius
+
+
+	def __repr__(self):
+		return "Hotspot(value={0:.4g}, cell {1}, material {2}, {3} cells, center ({4:.3g}, {5:.3g}, {6:.3g}))".format(
+			self.value, self.cell_id, self.material, self.count, self.center[0], self.center[1], self.center[2])
+
+
+
+def select_top_cells(values, count, accept=None):
+	"""
+	Returns the indices of the count highest values in descending order.
+	accept: function, which gets an array of indices and returns a boolean mask of the usable ones (e.g. cells kept by the clip).
+	Only the candidates are tested, whose number grows until enough are accepted.
+	"""
+	values = numpy.asarray(values)
+	if numpy.isnan(values).any():
+		values = numpy.where(numpy.isnan(values), -numpy.inf, values)
+	count = min(count, len(values))
+	if count <= 0:
+		return numpy.zeros(0, dtype=numpy.int64)
+	candidates = count
+	while True:
+		if candidates >= len(values):
+			top = numpy.arange(len(values))
+		else:
+			top = numpy.argpartition(values, -candidates)[-candidates:]
+		if accept is not None:
+			top = top[accept(top)]
+		if len(top) >= count or candidates >= len(values):
+			break
+		candidates *= 4
+	# Only the selected cells are sorted
+	top = top[numpy.argsort(-values[top], kind='mergesort')]
+	return top[:count]
+
+
+def cluster_cells(positions, values, radius):
+	"""
+	Cluster cells, which are sorted by their value in descending order.
+	A cell joins the nearest cluster, whose peak cell is closer than radius, otherwise it starts a new cluster.
+	Returns the cluster number of every cell. The clusters are numbered in the order of their peak value.
+	"""
+	labels = numpy.zeros(len(positions), dtype=numpy.int64)
+	seeds = numpy.zeros((0, 3), dtype=numpy.float64)
+	for i, position in enumerate(positions):
+		if len(seeds):
+			distances = numpy.einsum('ij,ij->i', seeds - position, seeds - position)
+			nearest = int(numpy.argmin(distances))
+			if distances[nearest] <= radius * radius:
+				labels[i] = nearest
+				continue
+		labels[i] = len(seeds)
+		seeds = numpy.vstack([seeds, position[numpy.newaxis].astype(numpy.float64)])
+	return labels
+
+
+def find_hotspots(values, get_centers, count, radius, cell_ids=None, materials=None, accept=None, max_hotspots=None):
+	"""
+	Find the regions with the highest values.
+	values: value of every cell
+	get_centers: function, which returns the centers of the given cell indices
+	count: number of top cells, which are clustered
+	radius: cells closer than radius to the peak cell of a cluster belong to that cluster
+	cell_ids/materials: original cell id and material of every cell (None: the indices and unknown materials)
+	accept: see select_top_cells()
+	Returns a list of Hotspot objects with the highest one first.
+	"""
+	top = select_top_cells(values, count, accept)
+	if len(top) == 0:
+		return []
+	positions = numpy.asarray(get_centers(top), dtype=numpy.float64)
+	labels = cluster_cells(positions, values[top], radius)
+	hotspots = []
+	for label in range(labels.max() + 1):
+		members = numpy.nonzero(labels == label)[0]
+		# The members are sorted, so the first one is the peak
+		peak = top[members[0]]
+		center = positions[members].mean(axis=0)
+		extent = numpy.sqrt(((positions[members] - center)**2).sum(axis=1).max())
+		hotspots.append(Hotspot(
+			positions[members[0]], center, extent, float(values[peak]),
+			int(cell_ids[peak]) if cell_ids is not None else int(peak),
+			int(materials[peak]) if materials is not None else None,
+			len(members), radius))
+		if max_hotspots is not None and len(hotspots) >= max_hotspots:
+			break
+	return hotspots
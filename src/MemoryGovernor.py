@@ -0,0 +1,169 @@
+﻿"""
+Copyright 2018 Andreas Wundlechner
+
+GNU Lesser General Public License Usage
+This file has to be used under the terms of the GNU Lesser
+General Public License version 3 or later as published by the Free Software
+Foundation and appearing in the file LICENSE included in the
+packaging of this file. Please review the following information to
+ensure the GNU Lesser General Public License version 3 requirements
+will be met: https://www.gnu.org/licenses/lgpl-3.0.html.
+"""
+
+"""
+This file contains the memory governor.
+It estimates the memory of every component of a file from its size information before the data is fetched and copied
+and chooses how the models are built, so the memory budget (cfg.memory_budget) isn't exceeded.
+The fetched copy of the grid is released array by array, while it is copied into the shared memory store
+(see Parallel.Dataset_Store), so only its largest array adds to the peak of the reader output and the store.
+The steps are tried in this order until the estimate fits:
+1. Build only the displayed view (cloud or surface) and release the hidden one
+2. Coarser level of detail: fewer cloud points and coarser surfaces
+This file doesn't depend on Vizard.
+"""
+
+import psutil
+import config as cfg
+import Processing
+
+
+# Bytes per cloud point: position, color and cell id in the buffers, position and color in the model
+CLOUD_POINT_BYTES = (12 + 12 + 8) + (12 + 12)
+# Bytes per surface triangle: 3 vertices with position, normal, color and point id, cell id and indices in the buffers,
+# 3 vertices with position, normal and color in the model
+SURFACE_TRIANGLE_BYTES = 3 * (12 + 12 + 12 + 8) + 8 + 12 + 3 * (12 + 12 + 12)
+# Coarsest level of detail
+MAX_CLOUD_STRIDE = 64
+MAX_SURFACE_LEVEL = 6
+
+
+def estimate_surface_triangles(cells):
+	"""
+	Estimate the number of surface triangles of a compact block of cells (about 12 * cells^(2/3)).
+	"""
+	return min(12 * cells ** (2.0/3), 4 * cells)
+
+
+def estimate_components(cells, points, connectivity, cell_arrays, point_arrays, material_cells=None, server_mode=False, grid=None):
+	"""
+	Estimate the memory in bytes of every component of a loaded file.
+	material_cells: list with the number of cells of every material (None: one material)
+	grid: bytes of the grid, if they are known (e.g. from the data information of ParaView)
+	Returns a dict component name -> bytes.
+	"""
+	if material_cells is None:
+		material_cells = [cells]
+	if grid is None:
+		grid = points * 3 * 4 + connectivity * 8 + cells * (8 + 1) + (cell_arrays * cells + point_arrays * points) * 8
+	components = {}
+	if server_mode:
+		# The grid and the filter outputs stay on the server
+		components['reader'] = 0
+		components['local_grid'] = 0
+		components['store'] = 0
+	else:
+		# Output of the ParaView reader, shared memory store and the largest array of the fetched copy,
+		# which is in memory twice while it is copied into the store
+		components['reader'] = grid
+		components['local_grid'] = max(connectivity * 8, points * 3 * 4, cells * 8)
+		components['store'] = grid + cells * 8
+	components['clouds'] = sum(count * CLOUD_POINT_BYTES for count in material_cells)
+	components['surfaces'] = int(sum(estimate_surface_triangles(count) * SURFACE_TRIANGLE_BYTES for count in material_cells))
+	return components
+
+
+def get_budget():
+	"""
+	Returns the memory budget in bytes (cfg.memory_budget or 80 % of the available memory).
+	Call it before the data is loaded, otherwise the loaded data is counted as used memory.
+	"""
+	if cfg.memory_budget:
+		return int(cfg.memory_budget)
+	return int(psutil.virtual_memory().available * 0.8)
+
+
+
+class Memory_Decision:
+	"""
+	Result of the memory governor.
+	options: Processing.Build_Options for building the models
+	on_demand: True if only the displayed view (cloud or surface) should be built
+	components: estimated bytes of every component
+	estimate: estimated bytes with the chosen strategy
+	"""
+	def __init__(self, budget, components):
+		self.budget = budget
+		self.components = components
+		self.options = Processing.Build_Options()
+		self.on_demand = False
+		self.estimate = self.get_estimate()
+		self.steps = []
+
+
+	def get_estimate(self):
+		"""
+		Returns the estimated peak memory with the current strategy.
+		"""
+		total = self.components['reader'] + self.components['store'] + self.components['local_grid']
+		clouds = self.components['clouds'] / self.options.cloud_stride
+		surfaces = self.components['surfaces'] / 4**self.options.surface_level
+		if self.on_demand:
+			total += max(clouds, surfaces)
+		else:
+			total += clouds + surfaces
+		return int(total)
+
+
+	def fits(self):
+		return self.estimate <= self.budget
+
+
+	def describe(self):
+		"""
+		Returns a readable description of the decision for logging.
+		"""
+		megabytes = lambda size: "{0:.0f} MB".format(size / 1024.0**2)
+		lines = ["Memory budget {0}, estimated {1} ({2})".format(
+			megabytes(self.budget), megabytes(self.estimate), ', '.join(
+				"{0} {1}".format(name, megabytes(size)) for name, size in sorted(self.components.items())))]
+		if self.steps:
+			lines.append("Strategy: " + ', '.join(self.steps))
+		else:
+			lines.append("Strategy: everything in full detail")
+		if not self.fits():
+			lines.append("WARNING: The data doesn't fit into the budget even with the coarsest level of detail.")
+		return '\n'.join(lines)
+
+
+
+def decide(components, budget=None):
+	"""
+	Choose the strategy for building the models (see the description of this file).
+	Returns a Memory_Decision.
+	"""
+	decision = Memory_Decision(get_budget() if budget is None else budget, components)
+	if decision.fits():
+		return decision
+
+	decision.on_demand = True
+	decision.steps.append("build the cloud and the surface on demand")
+	decision.estimate = decision.get_estimate()
+
+	# Coarsen the bigger part first, until everything fits
+	while not decision.fits():
+		options = decision.options
+		clouds = components['clouds'] / options.cloud_stride
+		surfaces = components['surfaces'] / 4**options.surface_level
+		if clouds >= surfaces and options.cloud_stride < MAX_CLOUD_STRIDE:
+			options.cloud_stride *= 2
+		elif options.surface_level < MAX_SURFACE_LEVEL:
+			options.surface_level += 1
+		elif options.cloud_stride < MAX_CLOUD_STRIDE:
+			options.cloud_stride *= 2
+		else:
+			break
+		decision.estimate = decision.get_estimate()
+	if decision.options.cloud_stride > 1 or decision.options.surface_level > 0:
+		decision.steps.append("level of detail: every {0}. cell in the cloud, surface level {1}".format(
+			decision.options.cloud_stride, decision.options.surface_level))
+	return decision
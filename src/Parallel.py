@@ -0,0 +1,296 @@
+﻿"""
+Copyright 2018 Andreas Wundlechner
+
+GNU Lesser General Public License Usage
+This file has to be used under the terms of the GNU Lesser
+General Public License version 3 or later as published by the Free Software
+Foundation and appearing in the file LICENSE included in the
+packaging of this file. Please review the following information to
+ensure the GNU Lesser General Public License version 3 requirements
+will be met: https://www.gnu.org/licenses/lgpl-3.0.html.
+"""
+
+"""
+This file distributes the processing of the materials (see Processing.process_material) over a process pool.
+The loaded data is put into shared memory once per file (Dataset_Store), so the worker processes read it without getting a pickled copy.
+Only the small descriptions of the shared arrays and the resulting geometry buffers are sent between the processes.
+"""
+
+import os
+import sys
+import platform
+import multiprocessing
+try:
+	from multiprocessing import shared_memory
+except ImportError:
+	raise ImportError("ToothVR needs Python 3.8 or newer (Vizard 7 and ParaView for Python 3.8, see README.md). "
+		"This is Python " + platform.python_version() + ".")
+import numpy
+import config as cfg
+import Processing
+
+
+# The pool is started once and used for every file
+_pool = None
+# Shared memory segments, which are attached in a worker process (segment name -> (segment, array))
+_attached = {}
+
+
+def get_pool():
+	"""
+	Returns the process pool. The pool is started with the first call.
+	Returns None if the processing should run in the current process (cfg.worker_processes == 1).
+	"""
+	global _pool
+	processes = cfg.worker_processes or multiprocessing.cpu_count()
+	if processes <= 1:
+		return None
+	if _pool is None:
+		_pool = _start_pool(processes)
+	return _pool
+
+
+def _start_pool(processes):
+	"""
+	Start the worker processes.
+	"""
+	# Vizard runs the scripts with its own executable, which can't be used for the workers
+	if cfg.worker_executable:
+		multiprocessing.set_executable(cfg.worker_executable)
+	elif not os.path.basename(sys.executable).lower().startswith('python'):
+		python = os.path.join(sys.exec_prefix, 'python.exe' if sys.platform == 'win32' else 'python')
+		if os.path.isfile(python):
+			multiprocessing.set_executable(python)
+	# New processes import the main module of this process. The main module of ToothVR starts Vizard,
+	# so this module is used as main module while the workers are started.
+	main_module = sys.modules['__main__']
+	sys.modules['__main__'] = sys.modules[__name__]
+	try:
+		return multiprocessing.get_context('spawn').Pool(processes)
+	finally:
+		sys.modules['__main__'] = main_module
+
+
+def close_pool():
+	"""
+	Stop the worker processes.
+	"""
+	global _pool
+	if _pool is not None:
+		_pool.terminate()
+		_pool.join()
+		_pool = None
+
+
+class Dataset_Store:
+	"""
+	Keeps the arrays of one loaded file (points, connectivity, offsets, cell types, cell and point data)
+	in named shared memory segments. It is created once per file and released with close().
+	Worker processes get the small descriptor and attach to the segments without copying (see attach_mesh()).
+	"""
+	# Counter for unique segment names within this process
+	_number = 0
+
+	def __init__(self, mesh, release=None):
+		"""
+		Copy the mesh into shared memory.
+		release: called with the name of every array after it was copied. The array is removed from the mesh before,
+		so the source of the mesh can free it (e.g. Processing.release_vtk_array()) and the data isn't twice in memory.
+		"""
+		Dataset_Store._number += 1
+		self._prefix = 'toothvr_{0}_{1}_'.format(os.getpid(), Dataset_Store._number)
+		self._segments = []
+		self.descriptor = {}
+		# Arrays in the shared memory of the main process
+		self.arrays = {}
+		# ... for the materials: material -> (start, end) in the array "material_cells"
+		self.material_slices = {}
+
+		names = ['cell/' + name for name in mesh.cell_data] + ['point/' + name for name in mesh.point_data] \
+			+ ['points', 'connectivity', 'offsets', 'cell_types']
+		for name in names:
+			if release is None:
+				self.add_array(name, _get_mesh_array(mesh, name))
+				continue
+			self.add_array(name, _pop_mesh_array(mesh, name))
+			release(name)
+		# Mesh, which uses the shared arrays
+		self.mesh = Dataset_Store._mesh_from_arrays(self.arrays)
+
+
+	def add_array(self, name, values):
+		"""
+		Copy an array into a new named segment and return the shared array.
+		"""
+		values = numpy.ascontiguousarray(values)
+		segment = shared_memory.SharedMemory(name=self._prefix + str(len(self._segments)), create=True, size=max(values.nbytes, 1))
+		shared = numpy.ndarray(values.shape, values.dtype, buffer=segment.buf)
+		shared[...] = values
+		self._segments.append(segment)
+		self.descriptor[name] = (segment.name, values.shape, values.dtype.str)
+		self.arrays[name] = shared
+		return shared
+
+
+	def replace_array(self, name, values):
+		"""
+		Replace the values of an array, e.g. with the values of another load case.
+		Arrays with the same shape and type are overwritten in place, so the workers see the new values.
+		Returns the shared array.
+		"""
+		shared = self.arrays.get(name)
+		values = numpy.asarray(values)
+		if shared is not None and shared.shape == values.shape and shared.dtype == values.dtype:
+			shared[...] = values
+		else:
+			# The old segment is released with close()
+			shared = self.add_array(name, values)
+		self.mesh = Dataset_Store._mesh_from_arrays(self.arrays)
+		return shared
+
+
+	def set_partition(self, partition):
+		"""
+		Save the cell ids of every material (dict material -> cell ids), so the workers can read them.
+		"""
+		materials = sorted(partition.keys())
+		self.add_array('material_cells', numpy.concatenate([partition[material] for material in materials]))
+		start = 0
+		for material in materials:
+			self.material_slices[material] = (start, start + len(partition[material]))
+			start += len(partition[material])
+
+
+	def get_material_cells(self, material):
+		"""
+		Returns the cell ids of the material.
+		"""
+		start, end = self.material_slices[material]
+		return self.arrays['material_cells'][start:end]
+
+
+	def close(self):
+		"""
+		Free the shared memory. The arrays of the store and every view of them mustn't be used anymore,
+		so the caches, which keep views (e.g. of the material cells), have to be dropped before.
+		"""
+		self.mesh = None
+		self.arrays.clear()
+		for segment in self._segments:
+			segment.close()
+			segment.unlink()
+		self._segments = []
+
+
+	@staticmethod
+	def attach_mesh(descriptor):
+		"""
+		Returns the mesh of the descriptor without copying it (used in the worker processes). Read only!
+		"""
+		return Dataset_Store._mesh_from_arrays(attach_arrays(descriptor))
+
+
+	@staticmethod
+	def _mesh_from_arrays(arrays):
+		"""
+		Create a Mesh from the arrays of a store.
+		"""
+		cell_data = {}
+		point_data = {}
+		for name, values in arrays.items():
+			if name.startswith('cell/'):
+				cell_data[name[len('cell/'):]] = values
+			elif name.startswith('point/'):
+				point_data[name[len('point/'):]] = values
+		return Processing.Mesh(arrays['points'], arrays['connectivity'], arrays['offsets'], arrays['cell_types'], cell_data, point_data)
+
+
+
+def _get_mesh_array(mesh, name):
+	"""
+	Returns the array of the mesh with the name of a Dataset_Store.
+	"""
+	if name.startswith('cell/'):
+		return mesh.cell_data[name[len('cell/'):]]
+	if name.startswith('point/'):
+		return mesh.point_data[name[len('point/'):]]
+	return getattr(mesh, name)
+
+
+def _pop_mesh_array(mesh, name):
+	"""
+	Returns the array of the mesh with the name of a Dataset_Store and removes it from the mesh.
+	"""
+	if name.startswith('cell/'):
+		return mesh.cell_data.pop(name[len('cell/'):])
+	if name.startswith('point/'):
+		return mesh.point_data.pop(name[len('point/'):])
+	values = getattr(mesh, name)
+	setattr(mesh, name, None)
+	return values
+
+
+def attach_arrays(descriptor):
+	"""
+	Returns the arrays of the descriptor (see Dataset_Store) without copying them. Read only!
+	Segments of older descriptors are closed, because the main process releases them when the next file is loaded.
+	"""
+	names = set(segment_name for segment_name, shape, dtype in descriptor.values())
+	for segment_name in list(_attached.keys()):
+		if segment_name not in names:
+			_attached.pop(segment_name)[0].close()
+
+	arrays = {}
+	for name, (segment_name, shape, dtype) in descriptor.items():
+		if segment_name not in _attached:
+			segment = _open_segment(segment_name)
+			_attached[segment_name] = (segment, numpy.ndarray(shape, dtype, buffer=segment.buf))
+		arrays[name] = _attached[segment_name][1]
+	return arrays
+
+
+def _open_segment(segment_name):
+	"""
+	Open an existing segment without taking over its ownership.
+	"""
+	try:
+		return shared_memory.SharedMemory(name=segment_name, track=False)
+	except TypeError:
+		# Before Python 3.13 the segment gets registered again, but the workers share the resource tracker
+		# of the main process, so it is still removed only once by Dataset_Store.close()
+		return shared_memory.SharedMemory(name=segment_name)
+
+
+def process_materials(store, color_array_name, color_range, clip=False, options=None, materials=None):
+	"""
+	Process every material of the store (see Dataset_Store.set_partition()) in parallel.
+	clip: True clips with the clip function in the array "clip_values" of the store (see Clipping.Clip_Set.evaluate())
+	options is a Processing.Build_Options object (None builds everything in full detail).
+	materials limits the processing to some materials (None processes every material).
+	Returns a list of (material, cloud buffers, surface buffers) in material order.
+	"""
+	materials = sorted(store.material_slices.keys() if materials is None else materials)
+	pool = get_pool()
+	if pool is None:
+		clip_values = store.arrays['clip_values'] if clip else None
+		return [(material,) + Processing.process_material(store.mesh, store.get_material_cells(material), color_array_name, color_range, clip_values, options)
+			for material in materials]
+
+	# Start the biggest materials first, so the small ones fill the gaps
+	results = {}
+	for material in sorted(materials, key=lambda material: store.material_slices[material][0] - store.material_slices[material][1]):
+		start, end = store.material_slices[material]
+		results[material] = pool.apply_async(_process_material_worker,
+			(store.descriptor, start, end, color_array_name, color_range, clip, options))
+	# Gather the results in material order
+	return [(material,) + results[material].get() for material in materials]
+
+
+def _process_material_worker(descriptor, start, end, color_array_name, color_range, clip, options):
+	"""
+	Runs in the worker process. Attaches to the shared mesh and processes one material.
+	"""
+	mesh = Dataset_Store.attach_mesh(descriptor)
+	arrays = attach_arrays(descriptor)
+	cell_ids = arrays['material_cells'][start:end]
+	return Processing.process_material(mesh, cell_ids, color_array_name, color_range, arrays['clip_values'] if clip else None, options)
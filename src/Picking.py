@@ -0,0 +1,247 @@
+﻿"""
+Copyright 2018 Andreas Wundlechner
+
+GNU Lesser General Public License Usage
+This file has to be used under the terms of the GNU Lesser
+General Public License version 3 or later as published by the Free Software
+Foundation and appearing in the file LICENSE included in the
+packaging of this file. Please review the following information to
+ensure the GNU Lesser General Public License version 3 requirements
+will be met: https://www.gnu.org/licenses/lgpl-3.0.html.
+"""
+
+"""
+This file contains the ray picking.
+A bounding volume hierarchy (BVH) is built once over the triangles or cloud points of a material's geometry buffers.
+The primitives are sorted along a Morton curve and grouped into leaves of a complete tree with 8 children per node,
+so the tree is built with a few NumPy calls. A ray tests one level of the tree per step (all boxes of the level at once)
+and at last the primitives of the hit leaves, so a pick needs only a few vectorized calls.
+This file doesn't depend on Vizard.
+"""
+
+import numpy
+
+
+class Pick_Result:
+	"""
+	First primitive hit by a ray.
+	position: hit point in the coordinates of the buffers
+	distance: distance from the origin of the ray (in lengths of the direction)
+	cell_id: cell of the loaded file (None if unknown)
+	material: material of the hit primitive (set by the caller)
+	value: value of the coloring array
+	"""
+	def __init__(self, position, distance, cell_id, value, material=None):
+		self.position = position
+		self.distance = distance
+		self.cell_id = cell_id
+		self.value = value
+		self.material = material
+
+
+	def __repr__(self):
+		return "Pick_Result(value={0:.4g}, cell {1}, material {2}, position ({3:.3g}, {4:.3g}, {5:.3g}))".format(
+			self.value, self.cell_id, self.material, self.position[0], self.position[1], self.position[2])
+
+
+
+# Number of children of every node of the BVH
+_BRANCHES = 8
+
+
+def _level_start(level):
+	"""
+	Returns the index of the first node of a level in the complete tree.
+	"""
+	return (_BRANCHES**level - 1) // (_BRANCHES - 1)
+
+
+def _cross(a, b):
+	"""
+	Cross product of (n, 3) arrays (or a vector and an array), without the overhead of numpy.cross for small arrays.
+	"""
+	result = numpy.empty(numpy.broadcast(a, b).shape)
+	result[..., 0] = a[..., 1] * b[..., 2] - a[..., 2] * b[..., 1]
+	result[..., 1] = a[..., 2] * b[..., 0] - a[..., 0] * b[..., 2]
+	result[..., 2] = a[..., 0] * b[..., 1] - a[..., 1] * b[..., 0]
+	return result
+
+
+def _morton_order(centers):
+	"""
+	Returns the order of the centers along a Morton (Z-order) curve with 10 bits per axis.
+	"""
+	minimum = centers.min(axis=0)
+	size = numpy.maximum(centers.max(axis=0) - minimum, 1e-30)
+	cells = numpy.minimum((centers - minimum) / size * 1024, 1023).astype(numpy.uint64)
+	codes = numpy.zeros(len(centers), dtype=numpy.uint64)
+	for bit in range(10):
+		for axis in range(3):
+			codes |= ((cells[:, axis] >> numpy.uint64(bit)) & numpy.uint64(1)) << numpy.uint64(3 * bit + axis)
+	return numpy.argsort(codes, kind='mergesort')
+
+
+
+class BVH:
+	"""
+	Bounding volume hierarchy over Geometry_Buffers (see Processing.py).
+	Cloud points are picked as spheres with point_radius.
+	"""
+	def __init__(self, buffers, point_radius=0.0, leaf_size=32):
+		self.buffers = buffers
+		self.point_radius = point_radius
+		self._leaf_size = leaf_size
+		centers, lower, upper = self._get_primitive_boxes(buffers)
+		count = len(centers)
+		# Primitives in the order of the leaves
+		self.order = _morton_order(centers) if count else numpy.zeros(0, dtype=numpy.int64)
+		leaves = max(1, -(-count // leaf_size))
+		# Complete tree with _BRANCHES children per node: the leaves are the last level
+		self._depth = 0
+		while _BRANCHES**self._depth < leaves:
+			self._depth += 1
+		self._first_leaf = _level_start(self._depth)
+		self._count = count
+		self._fit(lower, upper)
+
+
+	def refit(self, buffers):
+		"""
+		Update the boxes for moved primitives (e.g. an animated deformation). The tree and the order of the primitives stay the same.
+		"""
+		self.buffers = buffers
+		centers, lower, upper = self._get_primitive_boxes(buffers)
+		self._fit(lower, upper)
+
+
+	def _get_primitive_boxes(self, buffers):
+		"""
+		Returns the centers and the lower and upper corners of the boxes of the primitives.
+		"""
+		if buffers.primitive == "points":
+			self._triangles = None
+			centers = numpy.asarray(buffers.positions, dtype=numpy.float64)
+			return centers, centers - self.point_radius, centers + self.point_radius
+		self._triangles = numpy.asarray(buffers.positions, dtype=numpy.float64)[buffers.indices]
+		return self._triangles.mean(axis=1), self._triangles.min(axis=1), self._triangles.max(axis=1)
+
+
+	def _fit(self, lower, upper):
+		"""
+		Calculate the boxes of all nodes from the boxes of the primitives.
+		"""
+		node_count = _level_start(self._depth + 1)
+		# Empty nodes get NaN boxes, which fail every comparison of the slab test
+		self._lower = numpy.full((node_count, 3), numpy.nan)
+		self._upper = numpy.full((node_count, 3), numpy.nan)
+		if self._count:
+			starts = numpy.arange(0, self._count, self._leaf_size)
+			leaf_nodes = self._first_leaf + numpy.arange(len(starts))
+			self._lower[leaf_nodes] = numpy.minimum.reduceat(lower[self.order], starts)
+			self._upper[leaf_nodes] = numpy.maximum.reduceat(upper[self.order], starts)
+		# Boxes of the inner nodes from the bottom to the top
+		for level in range(self._depth - 1, -1, -1):
+			first = _level_start(level)
+			children = slice(_level_start(level + 1), _level_start(level + 2))
+			count_level = _BRANCHES**level
+			# fmin/fmax ignore the empty children
+			self._lower[first:first+count_level] = numpy.fmin.reduce(self._lower[children].reshape(count_level, _BRANCHES, 3), axis=1)
+			self._upper[first:first+count_level] = numpy.fmax.reduce(self._upper[children].reshape(count_level, _BRANCHES, 3), axis=1)
+
+
+	def _hit_boxes(self, nodes, origin, inverse, max_distance):
+		"""
+		Returns the mask of the nodes, whose box is hit by the ray (slab test).
+		"""
+		t0 = (self._lower[nodes] - origin) * inverse
+		t1 = (self._upper[nodes] - origin) * inverse
+		near = numpy.minimum(t0, t1).max(axis=1)
+		far = numpy.maximum(t0, t1).min(axis=1)
+		return (near <= far) & (far >= 0) & (near <= max_distance)
+
+
+	def get_entry_distance(self, origin, direction):
+		"""
+		Returns the distance, where the ray enters the bounding box of all primitives (inf if it misses the box).
+		"""
+		if self._count == 0:
+			return numpy.inf
+		inverse = 1.0 / numpy.where(numpy.abs(direction) < 1e-30, 1e-30, direction)
+		t0 = (self._lower[0] - origin) * inverse
+		t1 = (self._upper[0] - origin) * inverse
+		near = max(numpy.minimum(t0, t1).max(), 0.0)
+		return near if near <= numpy.maximum(t0, t1).min() else numpy.inf
+
+
+	def intersect(self, origin, direction, threshold=None, max_distance=numpy.inf):
+		"""
+		Returns the Pick_Result of the first primitive hit by the ray or None.
+		threshold: primitives with a smaller value are ignored (see Simulation_Data.set_threshold())
+		max_distance: primitives further away are ignored (e.g. behind a hit in another BVH)
+		"""
+		if self._count == 0:
+			return None
+		origin = numpy.asarray(origin, dtype=numpy.float64)
+		direction = numpy.asarray(direction, dtype=numpy.float64)
+		# Axis parallel rays get a tiny component instead of 0, so the slab test has no 0 * inf
+		inverse = 1.0 / numpy.where(numpy.abs(direction) < 1e-30, 1e-30, direction)
+		nodes = numpy.zeros(1, dtype=numpy.int64)
+		nodes = nodes[self._hit_boxes(nodes, origin, inverse, max_distance)]
+		for level in range(self._depth):
+			if len(nodes) == 0:
+				return None
+			nodes = (_BRANCHES * nodes[:, numpy.newaxis] + numpy.arange(1, _BRANCHES + 1)).ravel()
+			nodes = nodes[self._hit_boxes(nodes, origin, inverse, max_distance)]
+		if len(nodes) == 0:
+			return None
+		# Primitives of the hit leaves
+		starts = (nodes - self._first_leaf) * self._leaf_size
+		candidates = (starts[:, numpy.newaxis] + numpy.arange(self._leaf_size)).ravel()
+		candidates = self.order[candidates[candidates < self._count]]
+		if threshold is not None and self.buffers.values is not None:
+			candidates = candidates[self.buffers.values[candidates] >= threshold]
+		if self._triangles is None:
+			distances = self._intersect_points(candidates, origin, direction)
+		else:
+			distances = self._intersect_triangles(candidates, origin, direction)
+		distances[distances > max_distance] = numpy.inf
+		if len(distances) == 0 or not numpy.isfinite(distances.min()):
+			return None
+		best = int(numpy.argmin(distances))
+		primitive = candidates[best]
+		return Pick_Result(origin + distances[best] * direction, float(distances[best]),
+			int(self.buffers.cell_ids[primitive]) if self.buffers.cell_ids is not None else None,
+			float(self.buffers.values[primitive]) if self.buffers.values is not None else None)
+
+
+	def _intersect_triangles(self, candidates, origin, direction):
+		"""
+		Returns the distance to every candidate triangle (inf if it isn't hit) with the Moeller-Trumbore algorithm.
+		Both sides of a triangle are hit.
+		"""
+		triangles = self._triangles[candidates]
+		edge1 = triangles[:, 1] - triangles[:, 0]
+		edge2 = triangles[:, 2] - triangles[:, 0]
+		p = _cross(direction, edge2)
+		determinant = numpy.einsum('ij,ij->i', edge1, p)
+		valid = numpy.abs(determinant) > 1e-12
+		inverse = numpy.where(valid, 1.0 / numpy.where(valid, determinant, 1.0), 0.0)
+		s = origin - triangles[:, 0]
+		u = numpy.einsum('ij,ij->i', s, p) * inverse
+		q = _cross(s, edge1)
+		v = numpy.dot(q, direction) * inverse
+		t = numpy.einsum('ij,ij->i', edge2, q) * inverse
+		hit = valid & (u >= 0) & (v >= 0) & (u + v <= 1) & (t >= 0)
+		return numpy.where(hit, t, numpy.inf)
+
+
+	def _intersect_points(self, candidates, origin, direction):
+		"""
+		Returns the distance to every candidate point along the ray (inf if the ray misses its sphere).
+		"""
+		offsets = numpy.asarray(self.buffers.positions[candidates], dtype=numpy.float64) - origin
+		length = numpy.dot(direction, direction)
+		t = numpy.dot(offsets, direction) / length
+		closest = offsets - t[:, numpy.newaxis] * direction
+		hit = (numpy.einsum('ij,ij->i', closest, closest) <= self.point_radius**2) & (t >= 0)
+		return numpy.where(hit, t, numpy.inf)
@@ -0,0 +1,1317 @@
+﻿"""
+Copyright 2018 Andreas Wundlechner
+
+GNU Lesser General Public License Usage
+This file has to be used under the terms of the GNU Lesser
+General Public License version 3 or later as published by the Free Software
+Foundation and appearing in the file LICENSE included in the
+packaging of this file. Please review the following information to
+ensure the GNU Lesser General Public License version 3 requirements
+will be met: https://www.gnu.org/licenses/lgpl-3.0.html.
+"""
+
+"""
+This file contains the data processing, which doesn't depend on Vizard.
+The results are plain NumPy geometry buffers, which can be rendered by Vizard or saved for later use.
+This makes it possible to precompute, test and benchmark without the Vizard runtime (for example on Linux build servers).
+
+Usage for batch runs:
+	Processing.py data.vtk --clip-origin 0 0 0 --clip-normal 1 0 0 --probe 0 0 0 --output data.npz
+"""
+
+import os
+import sys
+import argparse
+import hashlib
+import collections
+import numpy
+import config as cfg
+import Parallel
+import Clipping
+
+try:
+	import vtk
+except ImportError:
+	# Use the VTK, which is shipped with ParaView
+	sys.path.append(cfg.path_to_paraview_libs)
+	import vtk
+from vtk.util import numpy_support
+
+
+# Faces of the supported cell types with point order like in VTK. All faces are oriented outwards.
+# Quadratic cells use the faces of their corner points.
+_TETRA_FACES = [[0,1,3], [1,2,3], [2,0,3], [0,2,1]]
+_HEXAHEDRON_FACES = [[0,4,7,3], [1,2,6,5], [0,1,5,4], [3,7,6,2], [0,3,2,1], [4,5,6,7]]
+_WEDGE_FACES = [[0,1,2], [3,5,4], [0,3,4,1], [1,4,5,2], [2,5,3,0]]
+_PYRAMID_FACES = [[0,3,2,1], [0,1,4], [1,2,4], [2,3,4], [3,0,4]]
+CELL_FACES = {
+	vtk.VTK_TRIANGLE: [[0,1,2]],
+	vtk.VTK_QUAD: [[0,1,2,3]],
+	vtk.VTK_TETRA: _TETRA_FACES,
+	vtk.VTK_HEXAHEDRON: _HEXAHEDRON_FACES,
+	vtk.VTK_WEDGE: _WEDGE_FACES,
+	vtk.VTK_PYRAMID: _PYRAMID_FACES,
+	vtk.VTK_QUADRATIC_TETRA: _TETRA_FACES,
+	vtk.VTK_QUADRATIC_HEXAHEDRON: _HEXAHEDRON_FACES,
+	vtk.VTK_QUADRATIC_WEDGE: _WEDGE_FACES,
+	vtk.VTK_QUADRATIC_PYRAMID: _PYRAMID_FACES}
+# Division of the 3D cell types into tetrahedrons with point order like in VTK (see get_tetrahedra()).
+# Hexahedrons are divided along the diagonal from point 0 to 6, so a planar face is cut into two triangles.
+_TETRA_TETRAHEDRA = [[0,1,2,3]]
+_HEXAHEDRON_TETRAHEDRA = [[0,1,2,6], [0,2,3,6], [0,3,7,6], [0,7,4,6], [0,4,5,6], [0,5,1,6]]
+_WEDGE_TETRAHEDRA = [[0,1,2,3], [1,2,3,4], [2,3,4,5]]
+_PYRAMID_TETRAHEDRA = [[0,1,2,4], [0,2,3,4]]
+CELL_TETRAHEDRA = {
+	vtk.VTK_TETRA: _TETRA_TETRAHEDRA,
+	vtk.VTK_HEXAHEDRON: _HEXAHEDRON_TETRAHEDRA,
+	vtk.VTK_WEDGE: _WEDGE_TETRAHEDRA,
+	vtk.VTK_PYRAMID: _PYRAMID_TETRAHEDRA,
+	vtk.VTK_QUADRATIC_TETRA: _TETRA_TETRAHEDRA,
+	vtk.VTK_QUADRATIC_HEXAHEDRON: _HEXAHEDRON_TETRAHEDRA,
+	vtk.VTK_QUADRATIC_WEDGE: _WEDGE_TETRAHEDRA,
+	vtk.VTK_QUADRATIC_PYRAMID: _PYRAMID_TETRAHEDRA}
+
+# NumPy type matching vtkIdType
+ID_TYPE = numpy.int64 if vtk.vtkIdTypeArray().GetDataTypeSize() == 8 else numpy.int32
+
+# Name of the array, which remembers the original cell ids while VTK filters are applied
+ORIGINAL_CELL_IDS = "vtkOriginalCellIds"
+# Name of the point array with the clip function (see clip_mesh_by_values())
+_CLIP_VALUES = "toothvr_clip_values"
+
+
+class Mesh:
+	"""
+	Plain NumPy representation of an unstructured grid.
+	points: (n, 3) array with the coordinates
+	connectivity: point ids of all cells one after another
+	offsets: start of every cell in connectivity with an additional entry for the end
+	cell_types: VTK cell type of every cell
+	cell_data/point_data: dicts with the name and the array of the data
+	original_cell_ids: ids of the cells in the loaded file (None if the mesh is the loaded file)
+	"""
+	def __init__(self, points, connectivity, offsets, cell_types, cell_data=None, point_data=None, original_cell_ids=None):
+		self.points = points
+		self.connectivity = connectivity
+		self.offsets = offsets
+		self.cell_types = cell_types
+		self.cell_data = cell_data if cell_data is not None else {}
+		self.point_data = point_data if point_data is not None else {}
+		self.original_cell_ids = original_cell_ids
+
+
+	@staticmethod
+	def from_vtk(data):
+		"""
+		Convert a vtkUnstructuredGrid to a Mesh. Arrays are shared with VTK where possible.
+		"""
+		if data.GetPoints() is None:
+			# e.g. the result of a clip, which removed everything
+			points = numpy.zeros((0, 3), dtype=numpy.float32)
+		else:
+			points = numpy_support.vtk_to_numpy(data.GetPoints().GetData())
+		cells = data.GetCells()
+		if hasattr(cells, "GetOffsetsArray"):
+			# VTK 9 stores offsets and connectivity separately
+			offsets = numpy_support.vtk_to_numpy(cells.GetOffsetsArray()).astype(ID_TYPE, copy=False)
+			connectivity = numpy_support.vtk_to_numpy(cells.GetConnectivityArray()).astype(ID_TYPE, copy=False)
+		else:
+			# Older VTK versions store the number of points in front of every cell
+			legacy = numpy_support.vtk_to_numpy(cells.GetData())
+			locations = numpy_support.vtk_to_numpy(data.GetCellLocationsArray())
+			mask = numpy.ones(len(legacy), dtype=bool)
+			mask[locations] = False
+			connectivity = legacy[mask]
+			offsets = numpy.zeros(len(locations)+1, dtype=ID_TYPE)
+			numpy.cumsum(legacy[locations], out=offsets[1:])
+		cell_types = numpy_support.vtk_to_numpy(data.GetCellTypesArray())
+
+		cell_data = {}
+		original_cell_ids = None
+		for i in range(data.GetCellData().GetNumberOfArrays()):
+			array = data.GetCellData().GetArray(i)
+			if array is None:
+				continue
+			if array.GetName() == ORIGINAL_CELL_IDS:
+				original_cell_ids = numpy_support.vtk_to_numpy(array)
+			else:
+				cell_data[array.GetName()] = numpy_support.vtk_to_numpy(array)
+		point_data = {}
+		for i in range(data.GetPointData().GetNumberOfArrays()):
+			array = data.GetPointData().GetArray(i)
+			if array is not None:
+				point_data[array.GetName()] = numpy_support.vtk_to_numpy(array)
+		return Mesh(points, connectivity, offsets, cell_types, cell_data, point_data, original_cell_ids)
+
+
+	def to_vtk(self):
+		"""
+		Convert the Mesh to a vtkUnstructuredGrid. The arrays aren't copied, so the Mesh has to stay alive.
+		The original cell ids are added as cell data array, so they survive VTK filters.
+		"""
+		data = vtk.vtkUnstructuredGrid()
+		points = vtk.vtkPoints()
+		points.SetData(numpy_support.numpy_to_vtk(numpy.ascontiguousarray(self.points), deep=0))
+		data.SetPoints(points)
+
+		connectivity = numpy.ascontiguousarray(self.connectivity, dtype=ID_TYPE)
+		offsets = numpy.ascontiguousarray(self.offsets, dtype=ID_TYPE)
+		cell_types = numpy_support.numpy_to_vtk(numpy.ascontiguousarray(self.cell_types, dtype=numpy.uint8), deep=0, array_type=vtk.VTK_UNSIGNED_CHAR)
+		cells = vtk.vtkCellArray()
+		if hasattr(cells, "GetOffsetsArray"):
+			cells.SetData(numpy_support.numpy_to_vtkIdTypeArray(offsets, deep=0), numpy_support.numpy_to_vtkIdTypeArray(connectivity, deep=0))
+			data.SetCells(cell_types, cells)
+		else:
+			# Older VTK versions need the number of points in front of every cell
+			counts = numpy.diff(offsets)
+			legacy = numpy.insert(connectivity, offsets[:-1], counts)
+			cells.SetCells(len(counts), numpy_support.numpy_to_vtkIdTypeArray(legacy, deep=1))
+			locations = numpy_support.numpy_to_vtkIdTypeArray(offsets[:-1] + numpy.arange(len(counts)), deep=1)
+			data.SetCells(cell_types, locations, cells)
+
+		for name, values in self.cell_data.items():
+			array = numpy_support.numpy_to_vtk(numpy.ascontiguousarray(values), deep=0)
+			array.SetName(name)
+			data.GetCellData().AddArray(array)
+		for name, values in self.point_data.items():
+			array = numpy_support.numpy_to_vtk(numpy.ascontiguousarray(values), deep=0)
+			array.SetName(name)
+			data.GetPointData().AddArray(array)
+		array = numpy_support.numpy_to_vtkIdTypeArray(numpy.ascontiguousarray(self.get_original_cell_ids(), dtype=ID_TYPE), deep=1)
+		array.SetName(ORIGINAL_CELL_IDS)
+		data.GetCellData().AddArray(array)
+		# Keep the arrays alive as long as the vtk object
+		data._numpy_references = (self, connectivity, offsets)
+		return data
+
+
+	def get_number_of_cells(self):
+		"""
+		Returns the number of cells.
+		"""
+		return len(self.cell_types)
+
+
+	def get_original_cell_ids(self):
+		"""
+		Returns the ids of the cells in the loaded file.
+		"""
+		if self.original_cell_ids is None:
+			return numpy.arange(self.get_number_of_cells())
+		return self.original_cell_ids
+
+
+	def get_bounds(self):
+		"""
+		Returns the bounding box like vtkDataSet.GetBounds(): (xmin, xmax, ymin, ymax, zmin, zmax)
+		"""
+		if len(self.connectivity) == 0:
+			return (0.0, 0.0, 0.0, 0.0, 0.0, 0.0)
+		used = self.points[numpy.unique(self.connectivity)]
+		minimum = used.min(axis=0)
+		maximum = used.max(axis=0)
+		return (minimum[0], maximum[0], minimum[1], maximum[1], minimum[2], maximum[2])
+
+
+	def get_cell_centers(self, cell_ids=None):
+		"""
+		Returns the centers (mean of the points) of the cells (or all cells if cell_ids is None).
+		"""
+		if cell_ids is None:
+			cell_ids = numpy.arange(self.get_number_of_cells())
+		if len(cell_ids) == 0:
+			return numpy.zeros((0, 3), dtype=self.points.dtype)
+		starts = self.offsets[cell_ids]
+		counts = self.offsets[numpy.asarray(cell_ids)+1] - starts
+		point_ids = self.connectivity[_ranges(starts, counts)]
+		# Sum the points of every cell with one reduceat
+		sums = numpy.add.reduceat(self.points[point_ids].astype(numpy.float64), numpy.concatenate([[0], numpy.cumsum(counts)[:-1]]))
+		return (sums / counts[:, numpy.newaxis]).astype(self.points.dtype)
+
+
+	def subset(self, cell_ids):
+		"""
+		Returns a new Mesh, which only contains the given cells.
+		The points aren't compacted, so point ids and point data stay valid.
+		"""
+		cell_ids = numpy.asarray(cell_ids)
+		starts = self.offsets[cell_ids]
+		counts = self.offsets[cell_ids+1] - starts
+		offsets = numpy.zeros(len(cell_ids)+1, dtype=self.offsets.dtype)
+		numpy.cumsum(counts, out=offsets[1:])
+		connectivity = self.connectivity[_ranges(starts, counts)]
+		cell_data = dict((name, values[cell_ids]) for name, values in self.cell_data.items())
+		return Mesh(self.points, connectivity, offsets, self.cell_types[cell_ids], cell_data, self.point_data, self.get_original_cell_ids()[cell_ids])
+
+
+
+class Geometry_Buffers:
+	"""
+	Geometry of one model as plain arrays.
+	primitive: "points" or "triangles"
+	positions/colors/normals: (n, 3) float32 arrays per vertex (normals is None for points,
+		buffers for the animation shader keep other data in the colors and normals, see Vertex_Animation.get_render_buffers())
+	indices: (t, 3) vertex indices of the triangles (None for points)
+	cell_ids: cell of the loaded file for every point or triangle
+	point_ids: point of the processed mesh for every vertex of a surface (None for points)
+	values: value of the coloring array for every point or triangle
+	"""
+	def __init__(self, primitive, positions, colors, normals=None, indices=None, cell_ids=None, point_ids=None, values=None):
+		self.primitive = primitive
+		self.positions = positions
+		self.colors = colors
+		self.normals = normals
+		self.indices = indices
+		self.cell_ids = cell_ids
+		self.point_ids = point_ids
+		self.values = values
+
+
+	def get_vertex_count(self):
+		"""
+		Returns the number of vertices.
+		"""
+		return len(self.positions)
+
+
+
+class Build_Options:
+	"""
+	Settings for generating the buffers of a material (see process_material()).
+	cloud/surface: False skips the cloud or the surface (None is returned instead of the buffers)
+	cloud_stride: only every n-th cell is part of the cloud
+	surface_level: level of detail of the surface (0: every triangle, every level doubles the size of the merged regions)
+	"""
+	def __init__(self, cloud=True, surface=True, cloud_stride=1, surface_level=0):
+		self.cloud = cloud
+		self.surface = surface
+		self.cloud_stride = cloud_stride
+		self.surface_level = surface_level
+
+
+	def copy(self):
+		return Build_Options(self.cloud, self.surface, self.cloud_stride, self.surface_level)
+
+
+	def __repr__(self):
+		return "Build_Options(cloud={0}, surface={1}, cloud_stride={2}, surface_level={3})".format(
+			self.cloud, self.surface, self.cloud_stride, self.surface_level)
+
+
+
+class Buffers_Cache:
+	"""
+	Least recently used cache of the buffers of processed materials, e.g. the models of earlier clip states.
+	The least recently used entries are dropped, when the cached arrays need more than max_bytes.
+	"""
+	def __init__(self, max_bytes):
+		self.max_bytes = max_bytes
+		self.bytes = 0
+		# key -> (buffers, size in bytes)
+		self._entries = collections.OrderedDict()
+		self.statistics = {'hits': 0, 'misses': 0, 'dropped': 0}
+
+
+	def get(self, key):
+		"""
+		Returns the cached buffers of the key or None.
+		"""
+		entry = self._entries.get(key)
+		if entry is None:
+			self.statistics['misses'] += 1
+			return None
+		self._entries.move_to_end(key)
+		self.statistics['hits'] += 1
+		return entry[0]
+
+
+	def put(self, key, buffers):
+		"""
+		Cache buffers (a tuple of Geometry_Buffers or None) for the key. Buffers bigger than max_bytes aren't cached.
+		"""
+		size = sum(get_buffers_bytes(part) for part in buffers if part is not None)
+		if key in self._entries:
+			self.bytes -= self._entries.pop(key)[1]
+		if size > self.max_bytes:
+			return
+		self._entries[key] = (buffers, size)
+		self.bytes += size
+		while self.bytes > self.max_bytes:
+			self.bytes -= self._entries.popitem(last=False)[1][1]
+			self.statistics['dropped'] += 1
+
+
+	def clear(self):
+		self._entries.clear()
+		self.bytes = 0
+
+
+	def __len__(self):
+		return len(self._entries)
+
+
+
+def get_buffers_bytes(buffers):
+	"""
+	Returns the size of the arrays of the buffers in bytes.
+	"""
+	return sum(array.nbytes for array in (buffers.positions, buffers.colors, buffers.normals, buffers.indices,
+		buffers.cell_ids, buffers.point_ids, buffers.values) if array is not None)
+
+
+
+class Threshold_Index:
+	"""
+	Order of the points or triangles of Geometry_Buffers sorted by their values.
+	The primitives with a value >= threshold are always the end of the order, so a change of the threshold
+	only concerns the primitives between the old and the new threshold.
+	"""
+	def __init__(self, values, order=None):
+		"""
+		values: value of every primitive
+		order: order, which sorts the values (None sorts them)
+		"""
+		values = numpy.asarray(values)
+		self.order = numpy.argsort(values, kind='mergesort') if order is None else order
+		self.sorted_values = values[self.order]
+
+
+	@staticmethod
+	def from_cell_ranks(cell_ids, cell_values, cell_ranks):
+		"""
+		Returns the Threshold_Index of primitives, which belong to the cells cell_ids.
+		The order is derived from the ranks of the cells, so the values aren't sorted again.
+		cell_ranks: position of every cell in the sorted cells of its material (see rank_cells())
+		"""
+		# The ranks are unique per cell, so an unstable sort of the integers is enough
+		return Threshold_Index(cell_values[cell_ids], numpy.argsort(cell_ranks[cell_ids]))
+
+
+	def get_start(self, threshold):
+		"""
+		Returns the position in the order of the first primitive with a value >= threshold.
+		"""
+		return int(numpy.searchsorted(self.sorted_values, threshold, side='left'))
+
+
+	def get_changed(self, old_threshold, new_threshold):
+		"""
+		Returns the primitives, which are shown or hidden by changing the threshold.
+		"""
+		starts = sorted((self.get_start(old_threshold), self.get_start(new_threshold)))
+		return self.order[starts[0]:starts[1]]
+
+
+
+def rank_cells(values, cells, ranks):
+	"""
+	Sort the cells by their values and write the position of every cell in this order into ranks (one entry per cell of the mesh).
+	"""
+	order = numpy.argsort(values[cells], kind='mergesort')
+	ranks[cells[order]] = numpy.arange(len(cells))
+
+
+def subset_buffers(buffers, primitives):
+	"""
+	Returns new Geometry_Buffers with the given points or triangles (in the given order).
+	"""
+	primitives = numpy.asarray(primitives, dtype=numpy.int64)
+	select = lambda values, ids: values[ids] if values is not None else None
+	if buffers.primitive == "points":
+		return Geometry_Buffers("points", buffers.positions[primitives], buffers.colors[primitives], select(buffers.normals, primitives),
+			cell_ids=select(buffers.cell_ids, primitives), values=select(buffers.values, primitives))
+	vertices = buffers.indices[primitives].ravel()
+	return Geometry_Buffers("triangles", buffers.positions[vertices], buffers.colors[vertices], select(buffers.normals, vertices),
+		numpy.arange(len(vertices)).reshape(-1, 3), select(buffers.cell_ids, primitives), select(buffers.point_ids, vertices),
+		select(buffers.values, primitives))
+
+
+
+def _ranges(starts, counts):
+	"""
+	Returns the concatenation of arange(start, start+count) for every start and count.
+	"""
+	counts = numpy.asarray(counts)
+	total = int(counts.sum())
+	if total == 0:
+		return numpy.zeros(0, dtype=numpy.int64)
+	ends = numpy.cumsum(counts)
+	shifts = numpy.repeat(numpy.asarray(starts) - (ends - counts), counts)
+	return numpy.arange(total) + shifts
+
+
+def hash_topology(mesh, material_name=None):
+	"""
+	Returns a hash of the points, the cells and the materials of the mesh.
+	Load cases of the same model have the same hash, so their geometry can be reused.
+	"""
+	if material_name is None:
+		material_name = cfg.material_name
+	digest = hashlib.sha1()
+	for values in (mesh.points, mesh.connectivity, mesh.offsets, mesh.cell_types, mesh.cell_data.get(material_name)):
+		if values is None:
+			continue
+		values = numpy.ascontiguousarray(values)
+		digest.update(values.dtype.str.encode())
+		digest.update(str(values.shape).encode())
+		digest.update(values.data)
+	return digest.hexdigest()
+
+
+def recolor_buffers(buffers, values, minimum, maximum):
+	"""
+	Returns new Geometry_Buffers with the geometry of buffers and new values (one per point or triangle).
+	The arrays of the geometry are shared.
+	"""
+	colors = get_colors(minimum, maximum, values)
+	if buffers.primitive == "triangles":
+		# The vertices are in the order of the triangles (see _triangle_buffers())
+		colors = numpy.repeat(colors, 3, axis=0)
+	return Geometry_Buffers(buffers.primitive, buffers.positions, colors, buffers.normals, buffers.indices,
+		buffers.cell_ids, buffers.point_ids, values)
+
+
+def get_vertex_interpolation(mesh, buffers):
+	"""
+	Returns the interpolation of point data of the mesh at the vertices of the buffers as (point ids, weights),
+	both (vertices, points per cell) arrays: the value at vertex i is sum(weights[i] * data[point_ids[i]]).
+	The cell_ids of the buffers have to be cells of the mesh. Cloud points (cell centers) get the mean of their cell.
+	Surface vertices get the barycentric coordinates in the tetrahedron of their triangle,
+	which is exact for clipped surfaces, too (inverse distance weights for other cell types).
+	"""
+	if buffers.primitive == "points":
+		cells = numpy.asarray(buffers.cell_ids, dtype=numpy.int64)
+	else:
+		cells = numpy.zeros(len(buffers.positions), dtype=numpy.int64)
+		cells[buffers.indices.ravel()] = numpy.repeat(buffers.cell_ids, 3)
+	starts = mesh.offsets[cells]
+	counts = mesh.offsets[cells+1] - starts
+	width = int(counts.max()) if len(counts) else 1
+	valid = numpy.arange(width) < counts[:, numpy.newaxis]
+	point_ids = numpy.zeros((len(cells), width), dtype=numpy.int64)
+	point_ids[valid] = mesh.connectivity[(starts[:, numpy.newaxis] + numpy.arange(width))[valid]]
+	if buffers.primitive == "points":
+		return point_ids, valid / counts[:, numpy.newaxis].astype(numpy.float64)
+
+	positions = numpy.asarray(buffers.positions, dtype=numpy.float64)
+	corners = mesh.points[point_ids].astype(numpy.float64)
+	# Inverse distance weights (a vertex on a point of the cell gets nearly only its value)
+	distances = numpy.sqrt(((corners - positions[:, numpy.newaxis])**2).sum(axis=2))
+	weights = numpy.where(valid, 1.0 / (distances + 1e-12 * (1 + distances.max(initial=0))), 0.0)
+	# Barycentric coordinates in tetrahedrons
+	tetrahedrons = (counts == 4) & (mesh.cell_types[cells] == vtk.VTK_TETRA)
+	if tetrahedrons.any():
+		corners = corners[tetrahedrons]
+		matrices = (corners[:, 1:4] - corners[:, 0:1]).transpose(0, 2, 1)
+		regular = numpy.abs(numpy.linalg.det(matrices)) > 1e-30
+		coordinates = numpy.zeros((len(corners), 3))
+		coordinates[regular] = numpy.linalg.solve(matrices[regular], (positions[tetrahedrons][regular] - corners[regular, 0])[..., numpy.newaxis])[..., 0]
+		barycentric = numpy.concatenate([1 - coordinates.sum(axis=1, keepdims=True), coordinates], axis=1)
+		# Vertices of coarsened surfaces may lie outside of the cell
+		barycentric = numpy.maximum(barycentric, 0)
+		rows = numpy.nonzero(tetrahedrons)[0][regular]
+		weights[rows, :4] = barycentric[regular]
+	weights /= weights.sum(axis=1, keepdims=True)
+	return point_ids, weights
+
+
+def interpolate_point_data(interpolation, data):
+	"""
+	Returns the point data interpolated at the vertices (see get_vertex_interpolation()).
+	"""
+	point_ids, weights = interpolation
+	values = data[point_ids]
+	if values.ndim == 3:
+		return numpy.einsum('ij,ijk->ik', weights, values)
+	return (weights * values).sum(axis=1)
+
+
+class Cell_To_Point:
+	"""
+	Sparse incidence matrix of a set of cells (e.g. a material) and their points, which averages cell values onto the points.
+	The matrix is kept as two arrays with one entry per pair of cell and point (like the connectivity), so it is built once
+	and averaging new values (recoloring, time steps) is a single weighted bincount.
+	Only the cells of the set contribute, so the values of other materials don't bleed over.
+	"""
+	def __init__(self, mesh, cell_ids):
+		self.cell_ids = numpy.asarray(cell_ids, dtype=numpy.int64)
+		starts = mesh.offsets[self.cell_ids]
+		counts = mesh.offsets[self.cell_ids+1] - starts
+		# Point and cell (index in cell_ids) of every entry
+		self._points = numpy.asarray(mesh.connectivity[_ranges(starts, counts)], dtype=numpy.int64)
+		self._cells = numpy.repeat(numpy.arange(len(self.cell_ids)), counts)
+		self._point_count = len(mesh.points)
+		cells_per_point = numpy.bincount(self._points, minlength=self._point_count)
+		self._weights = numpy.zeros(self._point_count)
+		self._weights[cells_per_point > 0] = 1.0 / cells_per_point[cells_per_point > 0]
+
+
+	def average(self, values):
+		"""
+		Returns one value per point of the mesh: the mean of the values (one per cell of the mesh) of the adjacent cells in the set.
+		Points without a cell of the set get 0.
+		"""
+		cell_values = numpy.asarray(values, dtype=numpy.float64)[self.cell_ids]
+		return numpy.bincount(self._points, weights=cell_values[self._cells], minlength=self._point_count) * self._weights
+
+
+class Vertex_Animation:
+	"""
+	Animates the values and positions at the primitives of base (Geometry_Buffers) without rebuilding the geometry:
+	- blends the values and the moved points of two steps of a time series
+	- warps the geometry by a displacement point array times an exaggeration scale
+	- colors the vertices of surfaces smoothly with point values (see Cell_To_Point) instead of one color per triangle
+	Everything, which doesn't depend on the fraction or the scale, is prepared once per pair of steps (see set_steps()),
+	so animate() only needs a few vectorized operations per frame. The interpolation of the points is prepared once per base.
+	The displayed models don't get the buffers of animate(), but the buffers of get_render_buffers(), which are baked for
+	blending or warping. The renderer moves and colors them on the graphics card, so a frame only changes two uniforms per model.
+	"""
+	def __init__(self, mesh, base):
+		self.mesh = mesh
+		self.base = base
+		# Steps of the prepared arrays (any comparable key)
+		self.steps = None
+		# Buffers of the last animate() to recognize, if the model was rebuilt in the meantime
+		self.last = None
+		self._interpolation = None
+		self._values = None
+		self._value_delta = None
+		self._offsets = None
+		self._offset_delta = None
+		self._displacements = None
+		self._displacement_delta = None
+		self._vertex_values = None
+		self._vertex_value_delta = None
+		# Fraction and color range of the colors of last, which are reused if only the scale changes
+		self._color_state = None
+		# Buffers of get_render_buffers(), the way and the state they were baked for and the state of the last call
+		self._render_buffers = None
+		self._render_state = None
+		self._last_call = None
+
+
+	def _interpolate(self, data):
+		"""
+		Returns the (points, 3) array data at the vertices of base.
+		"""
+		if self._interpolation is None:
+			self._interpolation = get_vertex_interpolation(self.mesh, self.base)
+		return interpolate_point_data(self._interpolation, data)
+
+
+	def _prepare_pair(self, data, next_data, interpolate):
+		"""
+		Returns the array of the first step and the difference to the next step (None if there is no next step).
+		"""
+		if data is None and next_data is None:
+			return None, None
+		first = numpy.zeros((len(self.base.positions),) + next_data.shape[1:]) if data is None else interpolate(data)
+		if next_data is None:
+			return first, None
+		return first, interpolate(next_data) - first
+
+
+	def set_steps(self, steps, values, next_values=None, offsets=None, next_offsets=None, displacements=None, next_displacements=None,
+			point_values=None, next_point_values=None):
+		"""
+		Prepare the animation of one step or the blending of two steps.
+		values/next_values: cell values of the steps (next_values None displays only the first step)
+		offsets/next_offsets: (points, 3) displacement of the points of the steps to the points of the mesh (None: not moved)
+		displacements/next_displacements: (points, 3) displacement arrays of the steps for warping (None: no displacement)
+		point_values/next_point_values: values of the steps at the points for smooth colors (None: one color per primitive)
+		"""
+		self.steps = steps
+		self._values = values[self.base.cell_ids]
+		self._value_delta = None if next_values is None else next_values[self.base.cell_ids] - self._values
+		self._offsets, self._offset_delta = self._prepare_pair(offsets, next_offsets, self._interpolate)
+		self._displacements, self._displacement_delta = self._prepare_pair(displacements, next_displacements, self._interpolate)
+		if self.base.primitive != "triangles":
+			point_values = next_point_values = None
+		self._vertex_values, self._vertex_value_delta = self._prepare_pair(point_values, next_point_values, self._interpolate)
+		self._color_state = None
+
+
+	def animate(self, fraction, minimum, maximum, scale=0.0):
+		"""
+		Returns new Geometry_Buffers with the values and positions at fraction between the steps (0: first step, 1: next step),
+		warped by scale times the displacement. The arrays, which don't change (indices, normals, ...) are shared with base
+		and the colors are shared with the last buffers, if only the scale changed.
+		"""
+		if self.last is not None and self._color_state == (fraction, minimum, maximum):
+			buffers = Geometry_Buffers(self.base.primitive, self.base.positions, self.last.colors, self.base.normals,
+				self.base.indices, self.base.cell_ids, self.base.point_ids, self.last.values)
+		else:
+			values = self._values if self._value_delta is None else self._values + fraction * self._value_delta
+			if self._vertex_values is None:
+				buffers = recolor_buffers(self.base, values, minimum, maximum)
+			else:
+				vertex_values = self._vertex_values if self._vertex_value_delta is None else self._vertex_values + fraction * self._vertex_value_delta
+				buffers = Geometry_Buffers(self.base.primitive, self.base.positions, get_colors(minimum, maximum, vertex_values),
+					self.base.normals, self.base.indices, self.base.cell_ids, self.base.point_ids, values)
+			self._color_state = (fraction, minimum, maximum)
+		offsets = None
+		if self._offsets is not None:
+			offsets = self._offsets if self._offset_delta is None else self._offsets + fraction * self._offset_delta
+		if self._displacements is not None and scale != 0:
+			displacements = self._displacements if self._displacement_delta is None else self._displacements + fraction * self._displacement_delta
+			offsets = scale * displacements if offsets is None else offsets + scale * displacements
+		if offsets is not None:
+			# The normals of the base are kept, the small rotations of the triangles aren't visible
+			buffers.positions = (self.base.positions + offsets).astype(numpy.float32)
+		self.last = buffers
+		return buffers
+
+
+	def get_render_buffers(self, fraction, minimum, maximum, scale=0.0):
+		"""
+		Returns (buffers, weights) for the animation shader of the renderer (see Renderer.py):
+		the shader displays the positions + weights[0] * normals and colors the vertices with the red and green colors
+		(values normalized to the color range) blended by weights[1]. The buffers are baked for one of two ways:
+		- blending two steps: the positions and values of the first step, the movement to the next step, weights (fraction, fraction)
+		- warping (e.g. while the scale is changed or without a next step): the positions and values at the fraction
+		  without warping, the displacement, weights (scale, 0)
+		So a new fraction or a new scale only changes the weights. The buffers are baked again for other steps or another color range.
+		"""
+		blended = self._value_delta is not None or self._offset_delta is not None or self._displacement_delta is not None \
+			or self._vertex_value_delta is not None
+		warp_state = (self.steps, fraction, minimum, maximum)
+		if self._render_state == ('blend', self.steps, scale, minimum, maximum):
+			return self._render_buffers, (fraction, fraction)
+		if self._render_state != ('warp',) + warp_state:
+			# Only the scale changed since the last call: keep the fraction and move the scale into the weights
+			warping = not blended or self._last_call == warp_state
+			if warping:
+				self._render_buffers = self._bake_warp(fraction, minimum, maximum)
+				self._render_state = ('warp',) + warp_state
+			else:
+				self._render_buffers = self._bake_blend(minimum, maximum, scale)
+				self._render_state = ('blend', self.steps, scale, minimum, maximum)
+		self._last_call = warp_state
+		if self._render_state[0] == 'blend':
+			return self._render_buffers, (fraction, fraction)
+		return self._render_buffers, (scale, 0.0)
+
+
+	def _bake_blend(self, minimum, maximum, scale):
+		"""
+		Returns the buffers of get_render_buffers() for blending the steps.
+		"""
+		positions = self.base.positions.astype(numpy.float64)
+		movement = numpy.zeros(positions.shape)
+		if self._offsets is not None:
+			positions += self._offsets
+			if self._offset_delta is not None:
+				movement += self._offset_delta
+		if self._displacements is not None and scale != 0:
+			positions += scale * self._displacements
+			if self._displacement_delta is not None:
+				movement += scale * self._displacement_delta
+		values, delta = self._get_vertex_values()
+		last = None if delta is None else values + delta
+		return self._render(positions, movement, minimum, maximum, values, last)
+
+
+	def _bake_warp(self, fraction, minimum, maximum):
+		"""
+		Returns the buffers of get_render_buffers() for warping at the fraction.
+		"""
+		blend = lambda first, delta: first if delta is None else first + fraction * delta
+		positions = self.base.positions.astype(numpy.float64)
+		if self._offsets is not None:
+			positions += blend(self._offsets, self._offset_delta)
+		movement = numpy.zeros(positions.shape)
+		if self._displacements is not None:
+			movement += blend(self._displacements, self._displacement_delta)
+		values, delta = self._get_vertex_values()
+		return self._render(positions, movement, minimum, maximum, blend(values, delta), None)
+
+
+	def _get_vertex_values(self):
+		"""
+		Returns the values of the first step at the vertices and the difference to the next step (None if there is no next step).
+		"""
+		if self._vertex_values is not None:
+			return self._vertex_values, self._vertex_value_delta
+		if self.base.primitive == "triangles":
+			# The vertices are in the order of the triangles (see _triangle_buffers())
+			return numpy.repeat(self._values, 3), None if self._value_delta is None else numpy.repeat(self._value_delta, 3)
+		return self._values, self._value_delta
+
+
+	def _render(self, positions, movement, minimum, maximum, values, last):
+		"""
+		Returns the render buffers with the values in the red and the last values (None: the same) in the green colors.
+		"""
+		colors = numpy.zeros((len(positions), 3), dtype=numpy.float32)
+		colors[:, 0] = normalize_values(minimum, maximum, values)
+		colors[:, 1] = colors[:, 0] if last is None else normalize_values(minimum, maximum, last)
+		return Geometry_Buffers(self.base.primitive, positions.astype(numpy.float32), colors, movement.astype(numpy.float32),
+			self.base.indices, self.base.cell_ids, self.base.point_ids, self.base.values)
+
+
+	def is_moved(self):
+		"""
+		Returns True if the positions of the last buffers differ from base.
+		"""
+		return self.last is not None and self.last.positions is not self.base.positions
+
+
+
+def read_file(filename):
+	"""
+	Read a vtk file (legacy .vtk or XML .vtu) and return the vtkUnstructuredGrid.
+	"""
+	if not os.path.isfile(filename):
+		raise IOError("File '{0}' doesn't exist.".format(filename))
+	if filename.lower().endswith('.vtu'):
+		reader = vtk.vtkXMLUnstructuredGridReader()
+	else:
+		reader = vtk.vtkUnstructuredGridReader()
+		# Read every array, not only the first of each kind
+		reader.ReadAllScalarsOn()
+		reader.ReadAllVectorsOn()
+		reader.ReadAllFieldsOn()
+	reader.SetFileName(filename)
+	reader.Update()
+	return reader.GetOutput()
+
+
+def release_vtk_array(data, name):
+	"""
+	Free an array of a vtkUnstructuredGrid, after it was copied from the Mesh of Mesh.from_vtk()
+	(name of a Parallel.Dataset_Store, see its release argument). The cells are freed with the last array of them (cell_types).
+	"""
+	if name.startswith('cell/'):
+		data.GetCellData().RemoveArray(name[len('cell/'):])
+	elif name.startswith('point/'):
+		data.GetPointData().RemoveArray(name[len('point/'):])
+	elif name == 'points':
+		data.SetPoints(None)
+	elif name == 'cell_types':
+		data.Initialize()
+
+
+def get_colors(minimum, maximum, values):
+	"""
+	Calculate the colors for the models with the given input.
+	minimum: minimum value
+	maximum: maximum value
+	values: array of values between minimum and maximum (values outside get the color of the nearest end)
+	Returns a (n, 3) float32 array.
+	"""
+	# example:
+	# get_colors(1, 5, [4])
+	#
+	# min		  middle		  max
+	# blue		  white			  red
+	#  |-------------|-------------|
+	#				 |------|		 <-- percentage of red
+	#        		 	    ^
+	#					  value
+	#
+	# Returns: [(1, 0.5, 0.5)]
+	minimum = float(minimum)
+	maximum = float(maximum)
+	middle = (minimum + maximum) / 2
+	values = numpy.asarray(values, dtype=numpy.float64)
+	colors = numpy.ones((len(values), 3), dtype=numpy.float32)
+	if maximum == minimum:
+		return colors
+	# A clamped color range (see Simulation_Data.set_color_clamp()) doesn't contain every value
+	values = numpy.clip(values, minimum, maximum)
+	# Blue to white below the middle, white to red above the middle
+	lower = values <= middle
+	percentage = (values[lower] - minimum) / (middle - minimum)
+	colors[lower, 0] = percentage
+	colors[lower, 1] = percentage
+	upper = ~lower
+	percentage = 1 - (values[upper] - middle) / (maximum - middle)
+	colors[upper, 1] = percentage
+	colors[upper, 2] = percentage
+	return colors
+
+
+def normalize_values(minimum, maximum, values):
+	"""
+	Returns the values as position in the color range (0: minimum, 0.5: middle, 1: maximum) like get_colors(),
+	e.g. for coloring on the graphics card.
+	"""
+	minimum = float(minimum)
+	maximum = float(maximum)
+	values = numpy.asarray(values, dtype=numpy.float64)
+	if maximum == minimum:
+		return numpy.full(len(values), 0.5, dtype=numpy.float32)
+	return ((numpy.clip(values, minimum, maximum) - minimum) / (maximum - minimum)).astype(numpy.float32)
+
+
+def partition_materials(mesh, material_name=None):
+	"""
+	Separate the cells by material with one sort.
+	Returns a dict material -> cell ids. Every material of the range has an entry (maybe empty).
+	"""
+	if material_name is None:
+		material_name = cfg.material_name
+	materials = mesh.cell_data[material_name].astype(numpy.int64)
+	if len(materials) == 0:
+		return {}
+	order = numpy.argsort(materials, kind='mergesort')
+	sorted_materials = materials[order]
+	partition = {}
+	for material in range(int(sorted_materials[0]), int(sorted_materials[-1])+1):
+		start, end = numpy.searchsorted(sorted_materials, [material, material+1])
+		partition[material] = order[start:end]
+	return partition
+
+
+def clip_mesh_by_values(mesh, values):
+	"""
+	Clip the mesh with a function given at its points (e.g. Clipping.Clip_Set.evaluate()) and return the clipped Mesh.
+	Cells which intersect the 0 level are cut like ParaView's Clip filter. The parts with values >= 0 are kept.
+	"""
+	data = mesh.to_vtk()
+	array = numpy_support.numpy_to_vtk(numpy.ascontiguousarray(values, dtype=numpy.float64), deep=1)
+	array.SetName(_CLIP_VALUES)
+	data.GetPointData().AddArray(array)
+	clip = vtk.vtkTableBasedClipDataSet()
+	clip.SetInputData(data)
+	clip.SetInputArrayToProcess(0, 0, 0, vtk.vtkDataObject.FIELD_ASSOCIATION_POINTS, _CLIP_VALUES)
+	clip.SetValue(0.0)
+	clip.Update()
+	if clip.GetOutput().GetNumberOfCells() == 0:
+		# The empty output has no arrays
+		return mesh.subset(numpy.zeros(0, dtype=numpy.int64))
+	clipped = Mesh.from_vtk(clip.GetOutput())
+	clipped.point_data.pop(_CLIP_VALUES, None)
+	return clipped
+
+
+def get_points_of_cells(mesh, cell_ids):
+	"""
+	Returns the sorted ids of the points used by the cells.
+	"""
+	starts = mesh.offsets[cell_ids]
+	return numpy.unique(mesh.connectivity[_ranges(starts, mesh.offsets[numpy.asarray(cell_ids)+1] - starts)])
+
+
+def get_material_bounds(mesh, partition, chunk_size=1000000):
+	"""
+	Calculate the bounding box (xmin, xmax, ymin, ymax, zmin, zmax) of every material (dict material -> cell ids).
+	Returns a dict material -> bounding box. Materials without cells have no entry.
+	"""
+	bounds = {}
+	for material, cell_ids in partition.items():
+		minimum = numpy.full(3, numpy.inf)
+		maximum = numpy.full(3, -numpy.inf)
+		# Work in chunks, so the point coordinates of big materials aren't copied at once
+		for start in range(0, len(cell_ids), chunk_size):
+			cells = cell_ids[start:start + chunk_size]
+			starts = mesh.offsets[cells]
+			points = mesh.points[mesh.connectivity[_ranges(starts, mesh.offsets[cells+1] - starts)]]
+			minimum = numpy.minimum(minimum, points.min(axis=0))
+			maximum = numpy.maximum(maximum, points.max(axis=0))
+		if len(cell_ids):
+			bounds[material] = (float(minimum[0]), float(maximum[0]), float(minimum[1]), float(maximum[1]), float(minimum[2]), float(maximum[2]))
+	return bounds
+
+
+def extract_surface(mesh):
+	"""
+	Find the faces, which belong to only one cell (the outer surface).
+	Returns the triangles as (t, 3) point ids and the index of the cell in mesh for every triangle.
+	Quads are divided into two triangles.
+	"""
+	triangles = []
+	triangle_cells = []
+	quads = []
+	quad_cells = []
+	cell_ids = numpy.arange(mesh.get_number_of_cells())
+	for cell_type in numpy.unique(mesh.cell_types):
+		if not int(cell_type) in CELL_FACES:
+			continue
+		cells = cell_ids[mesh.cell_types == cell_type]
+		starts = mesh.offsets[cells]
+		for face in CELL_FACES[int(cell_type)]:
+			face_points = mesh.connectivity[starts[:, numpy.newaxis] + numpy.array(face)[numpy.newaxis, :]]
+			if len(face) == 3:
+				triangles.append(face_points)
+				triangle_cells.append(cells)
+			else:
+				quads.append(face_points)
+				quad_cells.append(cells)
+
+	result_triangles = [numpy.zeros((0, 3), dtype=mesh.connectivity.dtype)]
+	result_cells = [numpy.zeros(0, dtype=numpy.int64)]
+	if triangles:
+		faces, owners = _boundary_faces(numpy.concatenate(triangles), numpy.concatenate(triangle_cells))
+		result_triangles.append(faces)
+		result_cells.append(owners)
+	if quads:
+		faces, owners = _boundary_faces(numpy.concatenate(quads), numpy.concatenate(quad_cells))
+		result_triangles.append(faces[:, [0,1,2]])
+		result_triangles.append(faces[:, [0,2,3]])
+		result_cells.append(owners)
+		result_cells.append(owners)
+	return numpy.concatenate(result_triangles), numpy.concatenate(result_cells)
+
+
+def _boundary_faces(faces, owners):
+	"""
+	Returns the faces (and their owners), which exist only once.
+	Faces are equal, if they have the same points in any order.
+	"""
+	keys = numpy.sort(faces, axis=1)
+	order = numpy.lexsort(keys.T[::-1])
+	keys = keys[order]
+	different = numpy.any(keys[1:] != keys[:-1], axis=1)
+	starts = numpy.flatnonzero(numpy.concatenate([[True], different]))
+	counts = numpy.diff(numpy.concatenate([starts, [len(keys)]]))
+	single = order[starts[counts == 1]]
+	return faces[single], owners[single]
+
+
+def get_tetrahedra(mesh, cell_ids=None):
+	"""
+	Divide the 3D cells of the mesh (or the given cells) into tetrahedrons (see CELL_TETRAHEDRA).
+	Returns the tetrahedrons as (m, 4) point ids and the cell of the mesh for every tetrahedron.
+	Other cell types are skipped. Quadratic cells use their corner points.
+	"""
+	if cell_ids is None:
+		cell_ids = numpy.arange(mesh.get_number_of_cells())
+	cell_ids = numpy.asarray(cell_ids, dtype=numpy.int64)
+	cell_types = mesh.cell_types[cell_ids]
+	tetrahedra = [numpy.zeros((0, 4), dtype=numpy.int64)]
+	tetrahedra_cells = [numpy.zeros(0, dtype=numpy.int64)]
+	for cell_type in numpy.unique(cell_types):
+		if not int(cell_type) in CELL_TETRAHEDRA:
+			continue
+		cells = cell_ids[cell_types == cell_type]
+		corners = numpy.array(CELL_TETRAHEDRA[int(cell_type)])
+		starts = mesh.offsets[cells]
+		tetrahedra.append(mesh.connectivity[starts[:, numpy.newaxis, numpy.newaxis] + corners].reshape(-1, 4).astype(numpy.int64))
+		tetrahedra_cells.append(numpy.repeat(cells, len(corners)))
+	return numpy.concatenate(tetrahedra), numpy.concatenate(tetrahedra_cells)
+
+
+def get_cell_volumes(mesh):
+	"""
+	Returns the volume of every cell of the mesh as sum of its tetrahedrons (see get_tetrahedra()). Other cells get 0.
+	"""
+	tetrahedra, cells = get_tetrahedra(mesh)
+	corners = mesh.points[tetrahedra].astype(numpy.float64)
+	edges = corners[:, 1:] - corners[:, :1]
+	volumes = numpy.abs(numpy.einsum('ij,ij->i', edges[:, 0], numpy.cross(edges[:, 1], edges[:, 2]))) / 6
+	return numpy.bincount(cells, weights=volumes, minlength=mesh.get_number_of_cells())
+
+
+def generate_cloud_buffers(mesh, color_array_name, minimum, maximum, stride=1):
+	"""
+	Calculate the point cloud of the mesh. Every cell (with stride > 1 every n-th cell) is represented by its center.
+	minimum and maximum are the color range.
+	"""
+	cells = numpy.arange(0, mesh.get_number_of_cells(), max(int(stride), 1))
+	positions = mesh.get_cell_centers(cells).astype(numpy.float32)
+	values = mesh.cell_data[color_array_name][cells]
+	return Geometry_Buffers("points", positions, get_colors(minimum, maximum, values), cell_ids=mesh.get_original_cell_ids()[cells], values=values)
+
+
+def generate_surface_buffers(mesh, color_array_name, minimum, maximum, level=0):
+	"""
+	Calculate the surface of the mesh as triangles.
+	Every triangle gets its own vertices with the color of the cell and the normal of the triangle (flat shading).
+	minimum and maximum are the color range. With level > 0 the surface is coarsened (see cluster_triangles()).
+	"""
+	triangles, cells = extract_surface(mesh)
+	if level > 0:
+		triangles, keep = cluster_triangles(mesh.points, triangles, level)
+		cells = cells[keep]
+	return _triangle_buffers(mesh.points, triangles, mesh.cell_data[color_array_name][cells], minimum, maximum,
+		mesh.get_original_cell_ids()[cells])
+
+
+def _triangle_buffers(points, triangles, values, minimum, maximum, cell_ids=None):
+	"""
+	Create the surface buffers of (t, 3) triangle point ids with one value per triangle.
+	"""
+	point_ids = triangles.ravel()
+	positions = points[point_ids].astype(numpy.float32)
+	normals = numpy.repeat(calculate_normals(positions.reshape(-1, 3, 3)), 3, axis=0)
+	colors = numpy.repeat(get_colors(minimum, maximum, values), 3, axis=0)
+	indices = numpy.arange(len(positions)).reshape(-1, 3)
+	return Geometry_Buffers("triangles", positions, colors, normals, indices, cell_ids, point_ids, values)
+
+
+def generate_cloud_buffers_from_centers(data, color_array_name, minimum, maximum, cell_ids_name=None):
+	"""
+	Create the cloud buffers from a vtkPolyData with the cell centers as points (output of the CellCenters filter).
+	The cell data of the original cells is the point data of data.
+	"""
+	if data.GetNumberOfPoints() == 0:
+		return Geometry_Buffers("points", numpy.zeros((0, 3), dtype=numpy.float32), numpy.zeros((0, 3), dtype=numpy.float32), values=numpy.zeros(0))
+	positions = numpy_support.vtk_to_numpy(data.GetPoints().GetData()).astype(numpy.float32)
+	values = numpy_support.vtk_to_numpy(data.GetPointData().GetArray(color_array_name))
+	return Geometry_Buffers("points", positions, get_colors(minimum, maximum, values),
+		cell_ids=_get_ids(data.GetPointData(), cell_ids_name, len(positions)), values=values)
+
+
+def generate_surface_buffers_from_polydata(data, color_array_name, minimum, maximum, cell_ids_name=None, level=0):
+	"""
+	Create the surface buffers from a triangulated vtkPolyData (output of ExtractSurface and Triangulate).
+	With level > 0 the surface is coarsened (see cluster_triangles()).
+	"""
+	if data.GetNumberOfPolys() == 0:
+		return _triangle_buffers(numpy.zeros((0, 3)), numpy.zeros((0, 3), dtype=ID_TYPE), numpy.zeros(0), minimum, maximum)
+	points = numpy_support.vtk_to_numpy(data.GetPoints().GetData())
+	polys = data.GetPolys()
+	if hasattr(polys, "GetConnectivityArray"):
+		triangles = numpy_support.vtk_to_numpy(polys.GetConnectivityArray()).reshape(-1, 3)
+	else:
+		# Older VTK versions store the number of points (always 3) in front of every triangle
+		triangles = numpy_support.vtk_to_numpy(polys.GetData()).reshape(-1, 4)[:, 1:]
+	# The cell data of vtkPolyData starts with the vertices and lines
+	first = data.GetNumberOfVerts() + data.GetNumberOfLines()
+	cells = numpy.arange(first, first + len(triangles))
+	if level > 0:
+		triangles, keep = cluster_triangles(points, triangles, level)
+		cells = cells[keep]
+	values = numpy_support.vtk_to_numpy(data.GetCellData().GetArray(color_array_name))[cells]
+	cell_ids = _get_ids(data.GetCellData(), cell_ids_name, first + len(triangles))
+	return _triangle_buffers(points, triangles, values, minimum, maximum, cell_ids[cells] if cell_ids is not None else None)
+
+
+def cluster_triangles(points, triangles, level):
+	"""
+	Coarsen a surface by vertex clustering: The points are sorted into a grid with cells of
+	2^level times the mean edge length and every point is replaced by the first point of its grid cell.
+	Triangles, which collapse, are removed. The point ids stay valid, so the colors and cell ids are kept.
+	Returns the new (t, 3) triangles and the mask of the kept input triangles.
+	"""
+	if level <= 0 or len(triangles) == 0:
+		return triangles, numpy.ones(len(triangles), dtype=bool)
+	edges = points[triangles[:, 1]] - points[triangles[:, 0]]
+	size = numpy.linalg.norm(edges, axis=1).mean() * 2**level
+	if size <= 0:
+		return triangles, numpy.ones(len(triangles), dtype=bool)
+	used = numpy.unique(triangles)
+	keys = numpy.floor((points[used] - points[used].min(axis=0)) / size).astype(numpy.int64)
+	# The first point of every grid cell represents the cell (used is sorted)
+	unique_keys, first, inverse = numpy.unique(keys, axis=0, return_index=True, return_inverse=True)
+	representative = numpy.zeros(len(points), dtype=triangles.dtype)
+	representative[used] = used[first][inverse.ravel()]
+	clustered = representative[triangles]
+	keep = ((clustered[:, 0] != clustered[:, 1]) & (clustered[:, 1] != clustered[:, 2]) & (clustered[:, 0] != clustered[:, 2]))
+	return clustered[keep], keep
+
+
+def _get_ids(attributes, name, count):
+	"""
+	Returns the id array with the name from point or cell data (None if it doesn't exist).
+	"""
+	if name is None or attributes.GetArray(name) is None or count == 0:
+		return None
+	return numpy_support.vtk_to_numpy(attributes.GetArray(name)).astype(ID_TYPE)
+
+
+def calculate_normals(triangles):
+	"""
+	Calculate the normals of (t, 3, 3) triangle coordinates with length 1.
+	"""
+	normals = numpy.cross(triangles[:, 1] - triangles[:, 0], triangles[:, 2] - triangles[:, 0])
+	length = numpy.linalg.norm(normals, axis=1)
+	length[length == 0] = 1
+	return (normals / length[:, numpy.newaxis]).astype(numpy.float32)
+
+
+def process_material(mesh, cell_ids, color_array_name, color_range, clip_values=None, options=None):
+	"""
+	Do the complete processing of one material: separate it, clip it and generate the cloud and surface buffers.
+	clip_values: clip function at every point of the mesh (see Clipping.Clip_Set.evaluate(), None: no clip)
+	options is a Build_Options object (None builds everything in full detail).
+	Returns the cloud and the surface buffers (None for skipped ones).
+	"""
+	if options is None:
+		options = Build_Options()
+	material_mesh = mesh.subset(cell_ids)
+	if clip_values is not None:
+		material_mesh = clip_mesh_by_values(material_mesh, clip_values)
+	cloud = None
+	surface = None
+	if options.cloud:
+		cloud = generate_cloud_buffers(material_mesh, color_array_name, color_range[0], color_range[1], options.cloud_stride)
+	if options.surface:
+		surface = generate_surface_buffers(material_mesh, color_array_name, color_range[0], color_range[1], options.surface_level)
+	return cloud, surface
+
+
+def probe(data, position, array_name, locator=None):
+	"""
+	Returns the value of the cell data array at the position (None outside of the data).
+	data is the vtkUnstructuredGrid, locator an optional vtkStaticCellLocator of it.
+	"""
+	if locator is None:
+		locator = build_locator(data)
+	cell_id = locator.FindCell(position)
+	if cell_id < 0:
+		return None
+	return data.GetCellData().GetArray(array_name).GetValue(cell_id)
+
+
+def build_locator(data):
+	"""
+	Build a cell locator to find cells fast.
+	"""
+	locator = vtk.vtkStaticCellLocator()
+	locator.SetDataSet(data)
+	locator.BuildLocator()
+	return locator
+
+
+
+class Processing_Data:
+	"""
+	Headless counterpart of Simulation_Data.
+	Loads a file and generates the cloud and surface buffers of every material without Vizard and ParaView.
+	"""
+	def __init__(self, filename, coloring_name=None, material_name=None, clip_origin=None, clip_normal=None):
+		"""
+		Load the file and generate the buffers.
+		clip_origin/clip_normal: plane for a single clip (see clip_set for more planes and a box)
+		"""
+		self.coloring_name = coloring_name if coloring_name is not None else cfg.coloring_name
+		self.material_name = material_name if material_name is not None else cfg.material_name
+		# Load the file
+		self.vtk_data = read_file(filename)
+		# Put the data into shared memory for the worker processes
+		self._store = Parallel.Dataset_Store(Mesh.from_vtk(self.vtk_data))
+		self.mesh = self._store.mesh
+		self._locator = None
+		# Init variables
+		# ... for clipping function
+		self.clip_set = Clipping.Clip_Set()
+		if clip_origin is not None and clip_normal is not None:
+			self.clip_set = self.clip_set.with_plane(clip_origin, clip_normal)
+		# ... for the generated geometry
+		self.cloud_buffers = {}
+		self.surface_buffers = {}
+		# Separate the data by material only once
+		self.materials = partition_materials(self.mesh, self.material_name)
+		self._store.set_partition(self.materials)
+
+		bounding_box = self.vtk_data.GetBounds()
+		self._original_center = (
+			(bounding_box[0]+bounding_box[1])/2,
+			(bounding_box[2]+bounding_box[3])/2,
+			(bounding_box[4]+bounding_box[5])/2)
+
+		self.reload_models()
+
+
+	def reload_models(self):
+		"""
+		Generate the cloud and surface buffers of every material.
+		"""
+		self.cloud_buffers.clear()
+		self.surface_buffers.clear()
+		# Use the range of the complete data set to ensure consitency
+		color_range = self.get_color_range()
+		clip = None
+		if not self.clip_set.is_empty():
+			clip = self._store.replace_array('clip_values', self.clip_set.evaluate(self.mesh.points))
+		results = Parallel.process_materials(self._store, self.coloring_name, color_range, clip is not None)
+		for material, cloud, surface in results:
+			self.cloud_buffers[material] = cloud
+			self.surface_buffers[material] = surface
+
+
+	def recolor_models(self):
+		"""
+		Color the existing buffers with the values of the coloring array without generating the geometry again.
+		"""
+		color_range = self.get_color_range()
+		values = self.mesh.cell_data[self.coloring_name]
+		for buffers in (self.cloud_buffers, self.surface_buffers):
+			for material in list(buffers.keys()):
+				buffers[material] = recolor_buffers(buffers[material], values[buffers[material].cell_ids], color_range[0], color_range[1])
+
+
+	def get_color_range(self):
+		"""
+		Returns the range of the coloring array of the complete data set.
+		"""
+		values = self.mesh.cell_data[self.coloring_name]
+		return (float(values.min()), float(values.max()))
+
+
+	def get_material_range(self):
+		"""
+		Returns the range of different materials.
+		"""
+		materials = sorted(self.materials.keys())
+		return (materials[0], materials[-1])
+
+
+	def get_probe_value(self, position):
+		"""
+		Returns the value on the probe location.
+		"""
+		if self._locator is None:
+			self._locator = build_locator(self.vtk_data)
+		return probe(self.vtk_data, position, self.coloring_name, self._locator)
+
+
+	def remove(self):
+		"""
+		Release the shared memory of the data.
+		"""
+		self.mesh = None
+		self._store.close()
+
+
+	def save(self, filename):
+		"""
+		Save all buffers in a compressed npz file. The keys are "<cloud|surface>_<material>_<attribute>".
+		"""
+		arrays = {'original_center': numpy.array(self._original_center)}
+		for kind, buffers in (('cloud', self.cloud_buffers), ('surface', self.surface_buffers)):
+			for material, geometry in buffers.items():
+				for attribute in ('positions', 'colors', 'normals', 'indices', 'cell_ids', 'point_ids', 'values'):
+					values = getattr(geometry, attribute)
+					if values is not None:
+						arrays['{0}_{1}_{2}'.format(kind, material, attribute)] = values
+		numpy.savez_compressed(filename, **arrays)
+
+
+
+def main(argv=None):
+	"""
+	Command-line entry point for batch runs.
+	"""
+	parser = argparse.ArgumentParser(description="Process a vtk file without Vizard and save the geometry buffers.")
+	parser.add_argument('filename')
+	parser.add_argument('--coloring', default=cfg.coloring_name, help="Name of the cell data array used for coloring")
+	parser.add_argument('--material', default=cfg.material_name, help="Name of the cell data array with the materials")
+	parser.add_argument('--clip-origin', type=float, nargs=3)
+	parser.add_argument('--clip-normal', type=float, nargs=3)
+	parser.add_argument('--probe', type=float, nargs=3, action='append', default=[], help="Position to probe (can be repeated)")
+	parser.add_argument('--output', help="npz file for the geometry buffers")
+	parser.add_argument('--processes', type=int, default=cfg.worker_processes, help="Number of worker processes (0: every core, 1: no pool)")
+	args = parser.parse_args(argv)
+	cfg.worker_processes = args.processes
+
+	data = Processing_Data(args.filename, args.coloring, args.material, args.clip_origin, args.clip_normal)
+
+	for material in sorted(data.cloud_buffers.keys()):
+		print("Material {0}: {1} cloud points, {2} surface triangles".format(
+			material, data.cloud_buffers[material].get_vertex_count(), len(data.surface_buffers[material].indices)))
+	for position in args.probe:
+		print("Probe {0}: {1}".format(position, data.get_probe_value(position)))
+	if args.output:
+		data.save(args.output)
+		print("Buffers saved to " + args.output)
+	data.remove()
+	Parallel.close_pool()
+	return data
+
+
+if __name__ == "__main__":
+	main()
+
@@ -0,0 +1,157 @@
+﻿"""
+Copyright 2018 Andreas Wundlechner
+
+GNU Lesser General Public License Usage
+This file has to be used under the terms of the GNU Lesser
+General Public License version 3 or later as published by the Free Software
+Foundation and appearing in the file LICENSE included in the
+packaging of this file. Please review the following information to
+ensure the GNU Lesser General Public License version 3 requirements
+will be met: https://www.gnu.org/licenses/lgpl-3.0.html.
+"""
+
+"""
+This file contains the quality governor.
+It watches the frame time and steps the render quality down or up to hold the frame rate of the headset.
+The quality levels are ordered from the best to the worst. Every step down first lowers the number of cloud points
+(every n-th cell) and then the level of detail of the surfaces.
+The multisample level isn't part of the levels, because Vizard applies it only when the window is created.
+The frame time is smoothed and a change needs a stable measurement over some frames (hysteresis),
+so the quality doesn't oscillate. This file doesn't depend on Vizard.
+"""
+
+import time
+import config as cfg
+
+
+def build_levels():
+	"""
+	Returns the list of quality levels from the best to the worst.
+	Every level is a dict with "cloud_stride" and "surface_level".
+	"""
+	levels = [{'cloud_stride': 1, 'surface_level': 0}]
+	stride = 1
+	while stride < cfg.quality_max_cloud_stride:
+		stride *= 2
+		levels.append({'cloud_stride': stride, 'surface_level': 0})
+	for surface_level in range(1, cfg.quality_max_surface_level + 1):
+		levels.append({'cloud_stride': stride, 'surface_level': surface_level})
+	return levels
+
+
+
+class Quality_Governor:
+	"""
+	Smoothed controller with hysteresis, which chooses the quality level from the measured frame times.
+	Call update() every frame. The decisions are kept in the list decisions for logging.
+	"""
+	def __init__(self, target_rate=None, levels=None, smoothing=0.05, upper=1.05, lower=0.75, hold_time=1.0, settle_time=2.0):
+		"""
+		target_rate: frame rate of the headset in Hz
+		smoothing: weight of a new frame time in the moving average
+		upper/lower: the quality is lowered above upper * target frame time and raised below lower * target frame time
+		hold_time: seconds, which the frame time has to stay above upper before lowering (raising waits 3 times as long)
+		settle_time: seconds after a change, which aren't measured (rebuilding the models takes some frames)
+		"""
+		self.target_rate = cfg.target_frame_rate if target_rate is None else target_rate
+		self.target_frame_time = 1.0 / self.target_rate
+		self.levels = build_levels() if levels is None else levels
+		self.level = 0
+		self.smoothing = smoothing
+		self.upper = upper
+		self.lower = lower
+		# The waiting times are counted in frames, so a single long frame (e.g. loading a file) doesn't count more
+		self._hold_frames = int(hold_time * self.target_rate)
+		self._settle_frames = int(settle_time * self.target_rate)
+		self.frame_time = None
+		self._frames_over = 0
+		self._frames_under = 0
+		self._frames_to_settle = self._settle_frames
+		# List of dicts with the time, the smoothed frame time, the direction and the new level
+		self.decisions = []
+
+
+	def get_settings(self):
+		"""
+		Returns the settings of the current quality level.
+		"""
+		return self.levels[self.level]
+
+
+	def get_state(self):
+		"""
+		Returns the current state for logging.
+		"""
+		state = dict(self.get_settings())
+		state['level'] = self.level
+		state['frame_time'] = self.frame_time
+		state['target_frame_time'] = self.target_frame_time
+		return state
+
+
+	def reset(self):
+		"""
+		Restart the measurement, e.g. after a new file was loaded.
+		"""
+		self.frame_time = None
+		self._frames_over = 0
+		self._frames_under = 0
+		self._frames_to_settle = self._settle_frames
+
+
+	def update(self, frame_time):
+		"""
+		Add the duration of the last frame in seconds.
+		Returns the settings of the new quality level if the level changed, otherwise None.
+		"""
+		if self._frames_to_settle > 0:
+			self._frames_to_settle -= 1
+			return None
+		# Limit single long frames, so they don't dominate the average
+		frame_time = min(frame_time, 4 * self.target_frame_time)
+		if self.frame_time is None:
+			self.frame_time = frame_time
+		else:
+			self.frame_time += self.smoothing * (frame_time - self.frame_time)
+
+		if self.frame_time > self.upper * self.target_frame_time:
+			self._frames_over += 1
+			self._frames_under = 0
+		elif self.frame_time < self.lower * self.target_frame_time:
+			self._frames_under += 1
+			self._frames_over = 0
+		else:
+			self._frames_over = 0
+			self._frames_under = 0
+
+		if self._frames_over >= self._hold_frames and self.level < len(self.levels) - 1:
+			return self._change(1)
+		if self._frames_under >= 3 * self._hold_frames and self.level > 0:
+			return self._change(-1)
+		return None
+
+
+	def _change(self, step):
+		"""
+		Go to the next worse (step 1) or better (step -1) level.
+		"""
+		self.level += step
+		self.decisions.append({
+			'time': time.time(),
+			'frame_time': self.frame_time,
+			'direction': 'lower' if step > 0 else 'raise',
+			'level': self.level,
+			'settings': dict(self.get_settings())})
+		self.reset()
+		return self.get_settings()
+
+
+	def describe_decision(self, decision=None):
+		"""
+		Returns a readable description of a decision (default: the last one).
+		"""
+		if decision is None:
+			decision = self.decisions[-1]
+		return "Quality {0}: level {1} (every {2}. cell in the cloud, surface level {3}), frame time {4:.1f} ms, target {5:.1f} ms".format(
+			decision['direction'], decision['level'], decision['settings']['cloud_stride'],
+			decision['settings']['surface_level'], decision['frame_time'] * 1000, self.target_frame_time * 1000)
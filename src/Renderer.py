@@ -0,0 +1,467 @@
+﻿"""
+Copyright 2018 Andreas Wundlechner
+
+GNU Lesser General Public License Usage
+This file has to be used under the terms of the GNU Lesser
+General Public License version 3 or later as published by the Free Software
+Foundation and appearing in the file LICENSE included in the
+packaging of this file. Please review the following information to
+ensure the GNU Lesser General Public License version 3 requirements
+will be met: https://www.gnu.org/licenses/lgpl-3.0.html.
+"""
+
+"""
+This file contains the adapter, which turns Geometry_Buffers (see Processing.py) into Vizard models.
+The on-the-fly API of Vizard (startLayer/vertex/endLayer) needs one Python call per attribute and vertex.
+Instead the complete arrays are written at once as binary PLY file and loaded by the model reader of Vizard,
+so building a model only needs a few calls independent of the number of vertices.
+The Python API of Vizard has no call, which takes whole vertex arrays or OSG arrays (neither for new nor for existing models),
+so there is no in-memory path and the file is the only bulk path. It is used for every build, also for the rebuilds after
+a clip or a threshold change. Writing it is a few numpy.tofile() calls, which are much cheaper than the Python calls
+of the on-the-fly API. The file can be put on a RAM disk (cfg.geometry_directory) to avoid the disk I/O.
+The on-the-fly API is only used without the PLY reader (cfg.bulk_geometry_upload), nothing else calls it per vertex.
+Benchmark.py measures both ways (build_bulk and build_immediate).
+Animated models (see Processing.Vertex_Animation) aren't changed per vertex: they get the animation shader
+and are only rebuilt, when their baked buffers change. A frame only sets two uniforms per model (see set_weights()).
+The Model_Pool keeps one group per material, whose geometry gets replaced on a rebuild.
+The Threshold_Model displays only the primitives above a threshold and changes only the chunks between two thresholds.
+"""
+
+import viz
+import os
+import tempfile
+import itertools
+import numpy
+import config as cfg
+import Processing
+
+
+# Animation shader for the buffers of Processing.Vertex_Animation.get_render_buffers():
+# the normal is the movement of the vertex and the red and green colors are the normalized values of both steps
+_VERTEX_SHADER = """
+uniform float position_weight;
+uniform float color_weight;
+varying vec3 eye_position;
+varying float value;
+void main()
+{
+	vec4 eye = gl_ModelViewMatrix * vec4(gl_Vertex.xyz + position_weight * gl_Normal, 1.0);
+	eye_position = eye.xyz;
+	value = mix(gl_Color.r, gl_Color.g, color_weight);
+	gl_Position = gl_ProjectionMatrix * eye;
+}
+"""
+
+_FRAGMENT_SHADER = """
+varying vec3 eye_position;
+varying float value;
+void main()
+{
+	// Blue to white below the middle, white to red above the middle (see Processing.get_colors())
+	vec3 color = value <= 0.5 ? vec3(2.0 * value, 2.0 * value, 1.0) : vec3(1.0, 2.0 - 2.0 * value, 2.0 - 2.0 * value);
+#ifdef TRIANGLES
+	// The normal attribute is the movement, so the triangles are shaded with their own normal and a head light
+	vec3 normal = normalize(cross(dFdx(eye_position), dFdy(eye_position)));
+	color *= 0.3 + 0.7 * abs(normal.z);
+#endif
+	gl_FragColor = vec4(color, 1.0);
+}
+"""
+
+
+class Vizard_Renderer:
+	"""
+	Builds Vizard models from Geometry_Buffers.
+	With bulk_upload=False the on-the-fly API of Vizard is used (slow, but works without the PLY reader).
+	"""
+	def __init__(self, bulk_upload=None, directory=None):
+		self.bulk_upload = cfg.bulk_geometry_upload if bulk_upload is None else bulk_upload
+		if directory is None:
+			directory = cfg.geometry_directory if cfg.geometry_directory is not None else tempfile.gettempdir()
+		self._directory = directory
+		# Unique file names, because Vizard could otherwise reuse an already loaded file
+		self._file_counter = itertools.count()
+		# Animation shaders by primitive (created with the first animated model)
+		self._shaders = {}
+		# model -> uniforms of the animation shader (position weight, color weight)
+		self._uniforms = {}
+
+
+	def build(self, buffers, weights=None):
+		"""
+		Create a model from the buffers and return it.
+		weights: the buffers are from Processing.Vertex_Animation.get_render_buffers() and displayed
+		with the animation shader and these weights (see set_weights())
+		"""
+		if self.bulk_upload:
+			model = self._build_bulk(buffers)
+		else:
+			model = self._build_immediate(buffers)
+		if weights is not None:
+			model.apply(self._get_shader(buffers.primitive))
+			uniforms = (viz.addUniformFloat('position_weight', weights[0]), viz.addUniformFloat('color_weight', weights[1]))
+			for uniform in uniforms:
+				model.apply(uniform)
+			self._uniforms[model] = uniforms
+		return model
+
+
+	def set_weights(self, model, weights):
+		"""
+		Change the weights of an animated model (see build()). Only the uniforms change, not the vertices.
+		"""
+		for uniform, weight in zip(self._uniforms[model], weights):
+			uniform.set(weight)
+
+
+	def _get_shader(self, primitive):
+		if primitive not in self._shaders:
+			fragment = _FRAGMENT_SHADER if primitive == "points" else '#define TRIANGLES\n' + _FRAGMENT_SHADER
+			self._shaders[primitive] = viz.addShader(vert=_VERTEX_SHADER, frag=fragment)
+		return self._shaders[primitive]
+
+
+	def _build_bulk(self, buffers):
+		"""
+		Write all arrays into a PLY file and load it with a single call.
+		"""
+		filename = os.path.join(self._directory, 'toothvr_{0}_{1}.ply'.format(os.getpid(), next(self._file_counter)))
+		write_ply(filename, buffers)
+		try:
+			model = viz.addChild(filename, cache=viz.CACHE_NONE)
+		finally:
+			os.remove(filename)
+		return model
+
+
+	def forget(self, model):
+		"""
+		Called before a model gets removed.
+		"""
+		self._uniforms.pop(model, None)
+
+
+	def _build_immediate(self, buffers):
+		"""
+		Create the model with the on-the-fly API of Vizard.
+		"""
+		positions = buffers.positions.tolist()
+		colors = buffers.colors.tolist()
+		normals = buffers.normals.tolist() if buffers.normals is not None else None
+		if buffers.primitive == "points":
+			viz.startLayer(viz.POINTS)
+			for index, (position, color) in enumerate(zip(positions, colors)):
+				viz.vertexColor(color[0], color[1], color[2])
+				if normals is not None:
+					viz.normal(*normals[index])
+				viz.vertex(position[0], position[1], position[2])
+		else:
+			viz.startLayer(viz.TRIANGLES)
+			for triangle in buffers.indices.tolist():
+				for index in triangle:
+					color = colors[index]
+					normal = normals[index]
+					position = positions[index]
+					viz.vertexColor(color[0], color[1], color[2])
+					viz.normal(normal[0], normal[1], normal[2])
+					viz.vertex(position[0], position[1], position[2])
+		return viz.endLayer()
+
+
+
+class Model_Pool:
+	"""
+	One group per key (material) below parent. The groups are kept when the geometry changes,
+	so their visibility and transforms survive a rebuild. Animated models are only rebuilt, when their baked buffers change.
+	Every new model gets the same setup (see prepare()).
+	"""
+	def __init__(self, renderer, parent, position=(0, 0, 0), enable=(), disable=(), point_size=None):
+		"""
+		position: position of the models (e.g. minus the center of the data, so the models are centered)
+		enable/disable: render states of the models (e.g. viz.LIGHTING)
+		point_size: point size of the models (None: default)
+		"""
+		self._renderer = renderer
+		self._parent = parent
+		self.position = position
+		self.enable = enable
+		self.disable = disable
+		self.point_size = point_size
+		# key -> group
+		self.groups = {}
+		# key -> model below the group
+		self.models = {}
+		# key -> buffers of the model
+		self.buffers = {}
+		# key -> animation of the model (see fill())
+		self.animations = {}
+		# key -> buffers, which the model was built from (differ from buffers for animated models)
+		self._rendered = {}
+		# Keys, whose model doesn't display its buffers yet (see fill(defer=True))
+		self._deferred = set()
+
+
+	def prepare(self, model):
+		"""
+		Set the render states, the point size and the position of a new model.
+		"""
+		for state in self.enable:
+			model.enable(state)
+		for state in self.disable:
+			model.disable(state)
+		if self.point_size is not None:
+			model.pointSize(self.point_size)
+		model.setPosition(*self.position)
+
+
+	def set_point_size(self, point_size):
+		"""
+		Change the point size of the existing and the new models. The point size is a render state, so no rebuild is needed.
+		"""
+		self.point_size = point_size
+		for model in self.models.values():
+			model.pointSize(point_size)
+
+
+	def get_group(self, key):
+		"""
+		Returns the group of the key. It is created with the first call.
+		"""
+		if key not in self.groups:
+			self.groups[key] = viz.addGroup(parent=self._parent)
+		return self.groups[key]
+
+
+	def fill(self, key, buffers, animation=None, defer=False):
+		"""
+		Display the buffers in the group of the key and return the group.
+		animation: (render buffers, weights) of Processing.Vertex_Animation.get_render_buffers(), which are displayed
+		instead of the buffers (see Vizard_Renderer.build()). If the model already has the render buffers, only the weights are set.
+		defer: only keep the buffers, because the model is hidden. The model is updated with update().
+		"""
+		group = self.get_group(key)
+		self.buffers[key] = buffers
+		self.animations[key] = animation
+		old = self.models.get(key)
+		if defer and old is not None:
+			self._deferred.add(key)
+			return group
+		self._deferred.discard(key)
+		rendered, weights = animation if animation is not None else (buffers, None)
+		if old is not None and self._rendered.get(key) is rendered:
+			if weights is not None:
+				self._renderer.set_weights(old, weights)
+			return group
+		model = self._renderer.build(rendered, weights)
+		self.prepare(model)
+		model.setParent(group)
+		self.models[key] = model
+		self._rendered[key] = rendered
+		if old is not None:
+			self._renderer.forget(old)
+			old.remove()
+		return group
+
+
+	def update(self, key):
+		"""
+		Display the buffers of the key, if the last fill() was deferred.
+		"""
+		if key in self._deferred:
+			self.fill(key, self.buffers[key], self.animations[key])
+
+
+	def release(self, key):
+		"""
+		Remove the model of the key to free its memory. The group is kept.
+		"""
+		self._deferred.discard(key)
+		self.buffers.pop(key, None)
+		self.animations.pop(key, None)
+		self._rendered.pop(key, None)
+		model = self.models.pop(key, None)
+		if model is not None:
+			self._renderer.forget(model)
+			model.remove()
+
+
+
+class Threshold_Model:
+	"""
+	Displays only the points or triangles of buffers with a value >= threshold.
+	The primitives are sorted by their value (index, see Processing.Threshold_Index) and split into chunks of chunk_size.
+	Chunks completely above the threshold are displayed, chunks below are hidden and only the chunk with the threshold
+	gets a partial model. Changing the threshold only changes the chunks between the old and the new threshold.
+	"""
+	def __init__(self, renderer, buffers, parent, prepare, index=None, chunk_size=None):
+		"""
+		index: Processing.Threshold_Index of the primitives (None sorts buffers.values)
+		"""
+		self._renderer = renderer
+		self._prepare = prepare
+		self._chunk_size = chunk_size if chunk_size is not None else cfg.threshold_chunk_size
+		self.index = index if index is not None else Processing.Threshold_Index(buffers.values)
+		# Buffers in the original order and the displayed buffers in the sorted order
+		self._source = buffers
+		self._rendered = buffers
+		self._buffers = Processing.subset_buffers(buffers, self.index.order)
+		self._count = len(self.index.order)
+		# Weights of the animation shader (None: not animated, see set_buffers())
+		self._weights = None
+		self.group = viz.addGroup(parent=parent)
+		# Models of the complete chunks (built when they are displayed the first time)
+		self._chunks = [None] * ((self._count + self._chunk_size - 1) // self._chunk_size)
+		# Partial model of the chunk with the threshold
+		self._partial = None
+		# First displayed primitive in the sorted order
+		self._start = None
+
+
+	def has_primitives(self, buffers):
+		"""
+		Returns True if buffers have the same points or triangles (e.g. recolored buffers), so the order is still valid.
+		"""
+		return buffers.primitive == self._source.primitive and buffers.cell_ids is self._source.cell_ids \
+			and buffers.indices is self._source.indices and len(buffers.positions) == len(self._source.positions)
+
+
+	def set_buffers(self, buffers, animation=None):
+		"""
+		Display buffers with the same primitives (see has_primitives()) in the same order.
+		animation: (render buffers, weights) like in Model_Pool.fill(). If the render buffers are the same as the last ones
+		(e.g. every frame between two steps of a time series), only the weights of the models are set.
+		Otherwise the models are rebuilt with the next set_threshold().
+		"""
+		self._source = buffers
+		rendered, weights = animation if animation is not None else (buffers, None)
+		self._weights = weights
+		if rendered is self._rendered:
+			if weights is not None:
+				for model in self.get_models():
+					self._renderer.set_weights(model, weights)
+			return
+		self._rendered = rendered
+		self._buffers = Processing.subset_buffers(rendered, self.index.order)
+		for model in self.get_models():
+			self._remove_model(model)
+		self._chunks = [None] * len(self._chunks)
+		self._partial = None
+		self._start = None
+
+
+	def set_threshold(self, threshold):
+		"""
+		Display the primitives with a value >= threshold.
+		"""
+		self.group.visible(True)
+		start = self.index.get_start(threshold)
+		if start == self._start:
+			return
+		if self._start is None:
+			changed = range(len(self._chunks))
+		else:
+			first, last = sorted((self._start, start))
+			changed = range(first // self._chunk_size, min(last // self._chunk_size + 1, len(self._chunks)))
+		self._start = start
+		for chunk in changed:
+			self._update_chunk(chunk)
+
+
+	def _update_chunk(self, chunk):
+		"""
+		Display the chunk completely, partially or not at all.
+		"""
+		begin = chunk * self._chunk_size
+		end = min(begin + self._chunk_size, self._count)
+		if self._partial is not None and self._partial[0] == chunk:
+			self._remove_model(self._partial[1])
+			self._partial = None
+		if self._start <= begin:
+			if self._chunks[chunk] is None:
+				self._chunks[chunk] = self._build(begin, end)
+			self._chunks[chunk].visible(True)
+			return
+		if self._chunks[chunk] is not None:
+			self._chunks[chunk].visible(False)
+		if self._start < end:
+			if self._partial is not None:
+				self._remove_model(self._partial[1])
+			self._partial = (chunk, self._build(self._start, end))
+
+
+	def _build(self, begin, end):
+		"""
+		Build a model of the sorted primitives from begin to end.
+		"""
+		buffers = Processing.subset_buffers(self._buffers, numpy.arange(begin, end))
+		model = self._renderer.build(buffers, self._weights)
+		self._prepare(model)
+		model.setParent(self.group)
+		return model
+
+
+	def _remove_model(self, model):
+		self._renderer.forget(model)
+		model.remove()
+
+
+	def get_models(self):
+		"""
+		Returns the existing models, e.g. to change render states.
+		"""
+		models = [model for model in self._chunks if model is not None]
+		if self._partial is not None:
+			models.append(self._partial[1])
+		return models
+
+
+	def hide(self):
+		self.group.visible(False)
+
+
+	def remove(self):
+		for model in self.get_models():
+			self._renderer.forget(model)
+		self.group.remove()
+
+
+
+def write_ply(filename, buffers):
+	"""
+	Write the buffers as binary PLY file.
+	Points are written without faces. The PLY reader creates a point cloud in that case.
+	"""
+	vertex_type = [('x', '<f4'), ('y', '<f4'), ('z', '<f4')]
+	if buffers.normals is not None:
+		vertex_type += [('nx', '<f4'), ('ny', '<f4'), ('nz', '<f4')]
+	vertex_type += [('red', 'u1'), ('green', 'u1'), ('blue', 'u1')]
+	vertices = numpy.empty(len(buffers.positions), dtype=vertex_type)
+	vertices['x'] = buffers.positions[:, 0]
+	vertices['y'] = buffers.positions[:, 1]
+	vertices['z'] = buffers.positions[:, 2]
+	if buffers.normals is not None:
+		vertices['nx'] = buffers.normals[:, 0]
+		vertices['ny'] = buffers.normals[:, 1]
+		vertices['nz'] = buffers.normals[:, 2]
+	colors = numpy.clip(numpy.round(buffers.colors * 255), 0, 255).astype(numpy.uint8)
+	vertices['red'] = colors[:, 0]
+	vertices['green'] = colors[:, 1]
+	vertices['blue'] = colors[:, 2]
+
+	header = ['ply', 'format binary_little_endian 1.0', 'element vertex {0}'.format(len(vertices))]
+	for name, data_type in vertex_type:
+		header.append('property {0} {1}'.format('float' if data_type == '<f4' else 'uchar', name))
+	faces = None
+	if buffers.indices is not None:
+		faces = numpy.empty(len(buffers.indices), dtype=[('count', 'u1'), ('indices', '<i4', (3,))])
+		faces['count'] = 3
+		faces['indices'] = buffers.indices
+		header.append('element face {0}'.format(len(faces)))
+		header.append('property list uchar int vertex_indices')
+	header.append('end_header')
+
+	with open(filename, 'wb') as f:
+		f.write(('\n'.join(header) + '\n').encode('ascii'))
+		vertices.tofile(f)
+		if faces is not None:
+			faces.tofile(f)
@@ -13,6 +13,8 @@ will be met: https://www.gnu.org/licenses/lgpl-3.0.html.
 import viz
 import os
 import re
+import time
+import collections
 import config as cfg
 import random
 import numpy
@@ -23,6 +25,56 @@ import paraview.simple as pv
 from paraview import vtk
 
 import Controls
+import Processing
+import Parallel
+import Renderer
+import MemoryGovernor
+import Hotspots
+import Picking
+import Clipping
+import Slicing
+import Statistics
+
+
+# Point array of the clip function on the server (see Simulation_Data._apply_clip())
+_CLIP_FUNCTION_NAME = "toothvr_clip"
+
+
+def connect():
+	"""
+	Connect ParaView to the configured pvserver (cfg.paraview_server) or to the built-in session.
+	"""
+	if cfg.paraview_server:
+		host, port = cfg.paraview_server.rsplit(':', 1)
+		pv.Connect(host, int(port))
+	else:
+		pv.Connect()
+
+
+def is_server_mode():
+	"""
+	Returns True if the data is processed by a pvserver.
+	"""
+	return bool(cfg.paraview_server)
+
+
+def _get_array_bytes(array, tuples):
+	"""
+	Returns the bytes of an array of the data information of ParaView with the number of tuples.
+	"""
+	return tuples * array.GetNumberOfComponents() * vtk.vtkDataArray.GetDataTypeSize(array.GetDataType())
+
+
+def _get_displacement(point_data):
+	"""
+	Returns the displacement array for warping (see Simulation_Data.set_warp_scale()) or None, if there is none.
+	"""
+	displacement = point_data.get(cfg.displacement_name)
+	if displacement is None or displacement.ndim != 2 or displacement.shape[1] != 3:
+		return None
+	return displacement
+
+
 
 class Simulation_Data:
 	"""
@@ -31,244 +83,1012 @@ class Simulation_Data:
 	- Controlling ParaView with commands
 	- Reading data from ParaView
 	- Convert the data to 3D models for Vizard
+	The processing of the data itself is done in Processing.py, which doesn't depend on Vizard.
 	"""
-	def __init__(self, filename):
+	def __init__(self, filename, quality=None):
 		"""
 		Load the file and display it with default properties.
+		quality: (cloud stride, surface level) of the adaptive quality (see set_quality())
 		"""
+		# Connect to the pvserver if it isn't connected yet
+		if is_server_mode() and not (pv.servermanager.ActiveConnection and pv.servermanager.ActiveConnection.IsRemote()):
+			connect()
+		# ... for measuring the data, which is fetched from ParaView
+		self.fetch_statistics = {'fetches': 0, 'bytes': 0, 'seconds': 0.0}
+		# Measure the budget before the data is loaded, so the loaded data isn't counted as used memory
+		budget = MemoryGovernor.get_budget()
 		# Load the file
 		self.vtk_data = pv.OpenDataFile(filename)
+		# Choose how the models are built, so they fit into the memory budget.
+		# The estimate only needs the data information of ParaView, so it is done before the data is fetched and copied.
+		self.memory_decision = MemoryGovernor.decide(self._estimate_memory(), budget)
+		print(self.memory_decision.describe())
 		# Save applied filters to remove them when not needed anymore to release memory
 		self._filters = [self.vtk_data]
-		# Save a unaltered version of the data
-		self.vtk_data_local = pv.servermanager.Fetch(self.vtk_data)
+		# Filters of the current models, which are replaced with the next reload (only in server mode)
+		self._model_filters = []
+		if is_server_mode():
+			# The data stays on the server. Only the geometry of the models is fetched.
+			self._store = None
+			self.mesh = None
+			self._server_input = self._prepare_server_input(self.vtk_data)
+		else:
+			vtk_data_local = self._fetch(self.vtk_data)
+			# NumPy version of the data in shared memory for the processing without Vizard (see Processing.py and Parallel.py).
+			# Every array of the fetched grid is freed after it was copied, so the grid isn't twice in memory.
+			self._store = Parallel.Dataset_Store(Processing.Mesh.from_vtk(vtk_data_local),
+				lambda name: Processing.release_vtk_array(vtk_data_local, name))
+			self.mesh = self._store.mesh
+			# Separate the data by material only once
+			partition = Processing.partition_materials(self.mesh, cfg.material_name)
+			self._store.set_partition(partition)
+		# Hash of the points, cells and materials to recognize other load cases of the same model (see switch_load_case())
+		self._topology_hash = None
+		# Range of the coloring array over the displayed steps of a time series (None: range of the loaded file)
+		self._color_range = None
+		# Points of the materials to find the materials, which a clip doesn't change (unknown in server mode)
+		self._material_points = {}
+		# ... and their bounding boxes (material -> (xmin, xmax, ymin, ymax, zmin, zmax), see _get_clip_state())
+		self._material_bounds = None
 		# Init variables
-		# ... for clipping function
-		self.clip_origin = None
-		self.clip_normal = None
+		# ... for clipping function: planes and a box (see Clipping.py and set_clip_set())
+		self.clip_set = Clipping.Clip_Set()
+		# Clip key -> (clip function at every point, material -> "kept", "removed" or "intersected") of the last clip sets
+		self._clip_cache = collections.OrderedDict()
+		# Clip key of the clip function in the store, which the workers read
+		self._store_clip_key = None
+		# Applied clip sets for undo and redo (see undo_clip()) and the index of the current one
+		self._clip_history = [self.clip_set]
+		self._clip_history_index = 0
+		# ... for the buffers of earlier states of the materials, so undo and redo don't process them again
+		self._result_cache = Processing.Buffers_Cache(cfg.clip_result_cache_memory)
 		# ... for point cloud model
 		self.cloud_point_size = 2
 		# ... for switching between point cloud and surface model
 		self._cycle_view_mode_buffer = False
+		# ... for the adaptive quality (see QualityGovernor.py)
+		self.quality = (1, 0) if quality is None else tuple(quality)
 		
 		# ... for positioning the models
 		self.origin_node = viz.addGroup()
 		self.surface_node = viz.addGroup(parent=self.origin_node)
 		self.cloud_node = viz.addGroup(parent=self.origin_node)
-		# ... for registering the model parts
-		self.surface_materials = {}
-		self.cloud_materials = {}
-		
-		# Calculate the center of the data to move the model later to origin
-		# bounding_box indices are found out by reading test data and compare it to ParaView standalone
-		bounding_box = self.vtk_data_local.GetBounds()
+		# Cross-section of the materials, which replaces the cloud and the surface in the slice mode (see set_slice_mode())
+		self.slice_node = viz.addGroup(parent=self.origin_node)
+		self.slice_node.visible(False)
+		# Iso-surfaces of the coloring array inside the materials (see set_iso_mode())
+		self.iso_node = viz.addGroup(parent=self.origin_node)
+		self.iso_node.visible(False)
+		# Only one view is displayed (and built), if the models are built on demand
+		if self.memory_decision.on_demand:
+			self.surface_node.visible(False)
+		# ... for hidden materials, which stay hidden, when the models are rebuilt
+		self._hidden_materials = set()
+		# ... for materials, which are completely removed by the clip
+		self._removed_materials = set()
+		# ... for the state of the models of every material (see _get_material_states())
+		self._model_states = {}
+		# ... for building the models from the geometry buffers
+		self._renderer = Renderer.Vizard_Renderer()
+		# ... for centering the models
+		bounding_box = self.vtk_data.GetDataInformation().GetBounds()
 		self._original_center = (
 			(bounding_box[0]+bounding_box[1])/2,
 			(bounding_box[2]+bounding_box[3])/2,
 			(bounding_box[4]+bounding_box[5])/2)
+		self._diagonal = numpy.linalg.norm([bounding_box[1]-bounding_box[0], bounding_box[3]-bounding_box[2], bounding_box[5]-bounding_box[4]])
+		position = tuple(-value for value in self._original_center)
+		# ... for registering the model parts. The group of every material is kept for the whole file,
+		# so visibility and transforms survive a rebuild. Only the geometry below the groups changes.
+		# Lighting for the surfaces (shadows aren't needed). The cross-sections aren't shaded, so they match the color range.
+		# Both sides of the cross-sections and iso-surfaces are displayed, because the surfaces can be closed.
+		no_shadows = (viz.SHADOW_CASTING, viz.SHADOWS)
+		self._cloud_pool = Renderer.Model_Pool(self._renderer, self.cloud_node, position, point_size=self.cloud_point_size)
+		self._surface_pool = Renderer.Model_Pool(self._renderer, self.surface_node, position, (viz.LIGHTING,), no_shadows)
+		self._slice_pool = Renderer.Model_Pool(self._renderer, self.slice_node, position, (), (viz.LIGHTING, viz.CULL_FACE) + no_shadows)
+		self._iso_pool = Renderer.Model_Pool(self._renderer, self.iso_node, position, (viz.LIGHTING,), (viz.CULL_FACE,) + no_shadows)
+		self.cloud_materials = self._cloud_pool.groups
+		self.surface_materials = self._surface_pool.groups
+		# ... for the hotspots of every clip state (see get_hotspots())
+		self._hotspot_cache = {}
+		# ... for picking: (pool, material) -> Picking.BVH, built with the first pick after a rebuild
+		self._bvhs = {}
+		# ... for the stress threshold. Only cells with a value >= threshold are displayed (None displays every cell).
+		self.threshold = None
+		# (pool, material) -> Renderer.Threshold_Model, built when the threshold is used the first time
+		self._threshold_models = {}
+		# Position of every cell in the cells of its material sorted by the coloring array (see _get_threshold_index())
+		# and material -> name of the coloring array, which its cells are sorted by
+		self._cell_ranks = None
+		self._ranked_materials = {}
+		# ... for blending the steps of a time series, warping and smooth coloring of the models (see _animate_models()):
+		# (pool, material) -> Processing.Vertex_Animation
+		self._animations = {}
+		# Exaggeration of the displacement (0: undeformed, see set_warp_scale())
+		self.warp_scale = 0.0
+		# ... for the smooth coloring of the surfaces (see set_smooth_coloring()): material -> Processing.Cell_To_Point
+		self.smooth_coloring = cfg.smooth_coloring
+		self._cell_to_point = {}
+		# File names of the displayed steps, the displacement of their points (None: not moved) and the last arguments of apply_step()
+		self._step_keys = None
+		self._step_offsets = None
+		self._step_frame = None
+		# ... for the slice mode: plane (origin, normal) of the cross-section and visibility of the cloud and the surface before the slice mode
+		self.slice_plane = None
+		self._views_before_slice = None
+		# ... for the iso-surface mode: iso value as fraction of the color range, Slicing.Iso_Surfaces of the current values
+		# and the displayed level
+		self.iso_fraction = 0.5
+		self._iso_surfaces = None
+		self._iso_level = None
+		# material -> Slicing.Tetrahedra for the cross-sections and iso-surfaces, built when they are needed the first time
+		self._tetrahedra = {}
+		# Statistics of the coloring array per material (see get_statistics()) and the clamping of the color range to percentiles
+		self._statistics = None
+		self.clamp_colors = cfg.clamp_color_range
+		# ... for the statistics of the displayed cells (see get_region_statistics()): Statistics.Region_Statistics,
+		# key of the displayed region and volumes of the cells
+		self._region_statistics = None
+		self._region_key = None
+		self._cell_volumes = None
+		# Cells, whose center the clip keeps, and the clip key and state of the part of every material (see _update_cell_clip())
+		self._cell_clip = None
+		self._cell_clip_states = {}
+		
+		# Calculate the center of the data to move the model later to origin
+		# bounding_box indices are found out by reading test data and compare it to ParaView standalone
+		# Node in the coordinate system of the data (like the models), e.g. for converting positions of the controllers
+		self.data_node = viz.addGroup(parent=self.origin_node)
+		self.data_node.setPosition(
+			-(self._original_center[0]),
+			-(self._original_center[1]),
+			-(self._original_center[2]))
 		
+		# Calculate the statistics once with the loaded values
+		self.get_statistics()
 		# Generate the models form the vtk data
 		self.reload_models()
 
 
 	def reload_models(self):
-		self._clean_vizard_models()
+		"""
+		Generate the models with the current clip settings.
+		Only the models of materials, whose state changed, are rebuilt (see _get_material_states()).
+		Materials, which the clip removes completely, are only hidden.
+		"""
+		# Use the range of the complete data set to ensure consitency
+		color_range = self.get_color_range()
+		options = self._get_build_options()
+		states = self._get_material_states(options)
+		outdated = [material for material, state in sorted(states.items()) if state[0] != "removed" and self._model_states.get(material) != state]
+		# Materials, which had the same state before, are taken from the cache
+		get_key = lambda material: (material, states[material], tuple(color_range))
+		cached = [(material, self._result_cache.get(get_key(material))) for material in outdated]
+		outdated = [material for material, buffers in cached if buffers is None]
+		cached = [(material,) + buffers for material, buffers in cached if buffers is not None]
+		if not outdated:
+			results = []
+		elif is_server_mode():
+			# Separate, clip and extract the surface on the server in parallel
+			results = self._process_materials_on_server(color_range, options, outdated)
+		else:
+			# Separate, clip and convert the data of the materials in parallel without Vizard.
+			# Materials completely on the kept side of the clip are processed without clipping.
+			full = [material for material in outdated if states[material][0] == "full"]
+			clipped = [material for material in outdated if states[material][0] == "clip"]
+			results = []
+			if full:
+				results += Parallel.process_materials(
+					self._store, cfg.coloring_name, color_range, False, options, full)
+			if clipped:
+				if self._store_clip_key != self.clip_set.get_key():
+					self._store.replace_array('clip_values', self._get_clip_state(self.clip_set)[0])
+					self._store_clip_key = self.clip_set.get_key()
+				results += Parallel.process_materials(
+					self._store, cfg.coloring_name, color_range, True, options, clipped)
+		for material, cloud, surface in results:
+			self._result_cache.put(get_key(material), (cloud, surface))
+		results += cached
+		for material, cloud, surface in results:
+			self._replace_models(material, cloud, surface)
+			self._model_states[material] = states[material]
+		if results and self._is_animated():
+			# The new models have the points and values of the first step, so animate them again
+			self._animate_models()
+		
+		self._removed_materials = set(material for material, state in states.items() if state[0] == "removed")
+		for material in states.keys():
+			self._update_material_visibility(material)
+
+
+	def invalidate_models(self):
+		"""
+		Let the next reload_models() rebuild the models of every material.
+		"""
+		self._model_states.clear()
+		self._result_cache.clear()
+
+
+	def _get_material_states(self, options):
+		"""
+		Returns the wanted state of the models of every material:
+		("full", settings) without clipping, ("clip", clip key, settings) for materials intersected by the clip
+		or ("removed",) for materials completely on the removed side of the clip.
+		"""
+		settings = (repr(options), cfg.coloring_name)
+		states = {}
+		positions = self._get_clip_state(self.clip_set)[1] if not self.clip_set.is_empty() and self.mesh is not None else {}
+		for material in self._get_materials():
+			if self.clip_set.is_empty():
+				states[material] = ("full", settings)
+				continue
+			# In server mode every material is clipped
+			position = positions.get(material, "intersected")
+			if position == "kept":
+				states[material] = ("full", settings)
+			elif position == "removed":
+				states[material] = ("removed",)
+			else:
+				states[material] = ("clip", self.clip_set.get_key(), settings)
+		return states
+
+
+	def _get_clip_state(self, clip_set):
+		"""
+		Returns the clip function at the points and how the clip affects every material ("kept", "removed" or "intersected").
+		The bounding boxes of the materials are classified first. Only the points of the materials, whose box the clip crosses,
+		are evaluated (in one pass) and classify these materials exactly. The other values are 0 and aren't used,
+		because only the intersected materials are clipped. The results of the last cfg.clip_cache_size clip sets are cached.
+		"""
+		key = clip_set.get_key()
+		if key in self._clip_cache:
+			self._clip_cache.move_to_end(key)
+			return self._clip_cache[key]
+		positions = {}
+		crossed = []
+		for material in self._get_materials():
+			positions[material] = self._classify_material(clip_set, material)
+			if positions[material] == "intersected":
+				if material not in self._material_points:
+					self._material_points[material] = Processing.get_points_of_cells(self.mesh, self._store.get_material_cells(material))
+				crossed.append(material)
+		values = numpy.zeros(len(self.mesh.points))
+		if crossed:
+			points = numpy.unique(numpy.concatenate([self._material_points[material] for material in crossed]))
+			values[points] = clip_set.evaluate(self.mesh.points[points])
+		for material in crossed:
+			material_values = values[self._material_points[material]]
+			if material_values.min() >= 0:
+				positions[material] = "kept"
+			elif material_values.max() < 0:
+				positions[material] = "removed"
+		self._clip_cache[key] = (values, positions)
+		while len(self._clip_cache) > cfg.clip_cache_size:
+			self._clip_cache.popitem(last=False)
+		return values, positions
+
+
+	def _classify_material(self, clip_set, material):
+		"""
+		Returns how the clip set affects the bounding box of the material (see Clipping.Clip_Set.classify_bounds()).
+		The bounding boxes are calculated once.
+		"""
+		if self._material_bounds is None:
+			self._material_bounds = Processing.get_material_bounds(self.mesh,
+				dict((material, self._store.get_material_cells(material)) for material in self._get_materials()))
+		# Materials without cells have no bounds
+		return clip_set.classify_bounds(self._material_bounds[material]) if material in self._material_bounds else "kept"
+
+
+	def set_clip_set(self, clip_set, record=True):
+		"""
+		Clip the models with the clip set (see Clipping.Clip_Set, an empty set removes the clip).
+		record: add the clip set to the history for undo and redo (the undone clip sets are dropped)
+		"""
+		if record:
+			del self._clip_history[self._clip_history_index+1:]
+			self._clip_history.append(clip_set)
+			del self._clip_history[:-cfg.clip_history_size]
+			self._clip_history_index = len(self._clip_history) - 1
+		self.clip_set = clip_set
+		print(clip_set.describe())
+		self.reload_models()
+
+
+	def undo_clip(self):
+		"""
+		Go back to the previous clip set. The models of earlier clip sets are usually cached (see Processing.Buffers_Cache).
+		Returns False if there is nothing to undo.
+		"""
+		if self._clip_history_index == 0:
+			return False
+		self._clip_history_index -= 1
+		self.set_clip_set(self._clip_history[self._clip_history_index], record=False)
+		return True
+
+
+	def redo_clip(self):
+		"""
+		Apply the clip set again, which was undone last. Returns False if there is nothing to redo.
+		"""
+		if self._clip_history_index == len(self._clip_history) - 1:
+			return False
+		self._clip_history_index += 1
+		self.set_clip_set(self._clip_history[self._clip_history_index], record=False)
+		return True
+
+
+	def add_clip_plane(self, origin, normal):
+		"""
+		Add a plane to the clip set. The side in the direction of the normal is kept.
+		"""
+		self.set_clip_set(self.clip_set.with_plane(origin, normal))
+
+
+	def set_clip_box(self, box):
+		"""
+		Set the oriented box (center, axes, half sizes) of the clip set. None removes the box.
+		"""
+		self.set_clip_set(self.clip_set.with_box(box))
+
+
+	def get_clip_box(self, center=None, axes=None):
+		"""
+		Returns a box for set_clip_box() with the edge length 2 * cfg.clip_box_size of the data size.
+		center: default is the center of the data, axes: default are the axes of the data
+		"""
+		if center is None:
+			center = self._original_center
+		if axes is None:
+			axes = ((1, 0, 0), (0, 1, 0), (0, 0, 1))
+		half_size = cfg.clip_box_size * self._diagonal
+		return (center, axes, (half_size, half_size, half_size))
+
+
+	def toggle_clip_mode(self):
+		"""
+		Switch between keeping the intersection ("and") and the union ("or") of the regions of the clip set.
+		"""
+		self.set_clip_set(self.clip_set.with_mode("or" if self.clip_set.mode == "and" else "and"))
+
+
+	def clear_clip(self):
+		"""
+		Remove every plane and the box.
+		"""
+		self.set_clip_set(Clipping.Clip_Set(mode=self.clip_set.mode))
+
+
+	def is_slice_mode(self):
+		"""
+		Returns True if the cross-section is displayed instead of the cloud and the surface.
+		"""
+		return self.slice_node.getVisible()
+
+
+	def set_slice_mode(self, enabled):
+		"""
+		Display the cross-section of the materials with the slice plane (see set_slice_plane()) instead of the cloud and the surface.
+		The cross-section isn't clipped. Without a slice plane, the last clip plane (or a plane through the center) is used.
+		Not supported in server mode.
+		"""
+		if enabled == self.is_slice_mode() or self.mesh is None:
+			return
+		if enabled:
+			self._views_before_slice = (self.cloud_node.getVisible(), self.surface_node.getVisible())
+			self.cloud_node.visible(False)
+			self.surface_node.visible(False)
+			self.slice_node.visible(True)
+			if self.slice_plane is None:
+				self.slice_plane = self.clip_set.planes[-1] if self.clip_set.planes else (self._original_center, (1.0, 0.0, 0.0))
+			self._update_slice()
+			return
+		self.slice_node.visible(False)
+		for material in list(self._slice_pool.buffers.keys()):
+			self._bvhs.pop((self._slice_pool, material), None)
+			self._fill_model(self._slice_pool, material, None)
+		self.cloud_node.visible(self._views_before_slice[0])
+		self.surface_node.visible(self._views_before_slice[1])
+		if self.memory_decision.on_demand:
+			# The hidden views were released
+			self.reload_models()
+
+
+	def set_slice_plane(self, origin, normal):
+		"""
+		Cut the materials with the plane (in the coordinates of the data) in the slice mode.
+		Only the distances of the points to the plane are calculated again, so the plane can be dragged.
+		"""
+		plane = (tuple(float(value) for value in origin), tuple(float(value) for value in normal))
+		if plane == self.slice_plane:
+			return
+		self.slice_plane = plane
+		self._update_slice()
+
+
+	def _update_slice(self):
+		"""
+		Cut the displayed materials with the slice plane and color the cross-sections with the current values.
+		The points aren't moved by a time series or the warping.
+		"""
+		if not self.is_slice_mode():
+			return
+		origin, normal = self.slice_plane
+		color_range = self.get_color_range()
+		values = self.mesh.cell_data[cfg.coloring_name]
+		for material in self._get_materials():
+			if material in self._hidden_materials:
+				continue
+			self._bvhs.pop((self._slice_pool, material), None)
+			self._fill_model(self._slice_pool, material, self._get_tetrahedra(material).slice(origin, normal, values, color_range[0], color_range[1]))
+			self._update_material_visibility(material)
+
+
+	def _get_tetrahedra(self, material):
+		"""
+		Returns the Slicing.Tetrahedra of the material. They are built once per file.
+		"""
+		if material not in self._tetrahedra:
+			self._tetrahedra[material] = Slicing.Tetrahedra(self.mesh, self._store.get_material_cells(material))
+		return self._tetrahedra[material]
+
+
+	def is_iso_mode(self):
+		"""
+		Returns True if the iso-surfaces are displayed.
+		"""
+		return self.iso_node.getVisible()
+
+
+	def set_iso_mode(self, enabled):
+		"""
+		Display the iso-surfaces of the coloring array inside the materials (see set_iso_fraction()).
+		The surface of the materials gets translucent. Not supported in server mode.
+		"""
+		if enabled == self.is_iso_mode() or self.mesh is None:
+			return
+		self.iso_node.visible(enabled)
+		self.surface_node.alpha(cfg.iso_surface_alpha if enabled else 1.0)
+		if enabled:
+			self.update_iso_surfaces()
+			return
+		self._close_iso_surfaces()
+		for material in list(self._iso_pool.buffers.keys()):
+			self._iso_pool.release(material)
+
+
+	def set_iso_fraction(self, fraction):
+		"""
+		Set the iso value as fraction of the color range. It is rounded to one of cfg.iso_surface_levels levels,
+		whose surfaces are extracted in the background and cached (see Slicing.Iso_Surfaces).
+		"""
+		self.iso_fraction = min(max(float(fraction), 0.0), 1.0)
+		self.update_iso_surfaces()
+
+
+	def change_iso_value(self, step):
+		"""
+		Change the iso value by step as a fraction of the color range.
+		"""
+		self.set_iso_fraction(self.iso_fraction + step)
+
+
+	def update_iso_surfaces(self):
+		"""
+		Display the iso-surfaces of the current iso value, as soon as they are extracted. Called every frame in the iso-surface mode.
+		Until then the last extracted iso-surfaces stay.
+		"""
+		if not self.is_iso_mode():
+			return
+		if self._iso_surfaces is None:
+			color_range = self.get_color_range()
+			values = self.mesh.cell_data[cfg.coloring_name]
+			materials = self._get_materials()
+			self._iso_surfaces = Slicing.Iso_Surfaces(dict((material, self._get_tetrahedra(material)) for material in materials),
+				dict((material, self._get_point_values(material, values)) for material in materials), color_range[0], color_range[1])
+			self._iso_level = None
+		level = self._iso_surfaces.get_level(self.iso_fraction)
+		if level == self._iso_level:
+			return
+		self._iso_surfaces.request(level)
+		surfaces = self._iso_surfaces.get(level)
+		if surfaces is None:
+			return
+		for material, buffers in surfaces.items():
+			self._iso_pool.fill(material, buffers)
+			self._update_material_visibility(material)
+		self._iso_level = level
+		print("Iso-surface at {0:.4g}".format(self._iso_surfaces.get_isovalue(level)))
+
+
+	def _close_iso_surfaces(self, wait=False):
+		"""
+		Stop the extraction of the iso-surfaces, e.g. because the values changed.
+		wait: wait for the running extraction (see Slicing.Iso_Surfaces.close())
+		"""
+		if self._iso_surfaces is not None:
+			self._iso_surfaces.close(wait)
+			self._iso_surfaces = None
+
+
+	def _get_materials(self):
+		"""
+		Returns the list of materials.
+		"""
+		if self._store is not None:
+			return sorted(self._store.material_slices.keys())
+		material_range = self.get_material_range()
+		return list(range(int(material_range[0]), int(material_range[1])+1))
+
+
+	def _replace_models(self, material, cloud, surface):
+		"""
+		Replace the geometry of the material with the buffers (None releases the geometry).
+		"""
+		for pool, buffers in ((self._cloud_pool, cloud), (self._surface_pool, surface)):
+			self._bvhs.pop((pool, material), None)
+			self._fill_model(pool, material, buffers)
+
+
+	def _fill_model(self, pool, material, buffers, animation=None):
+		"""
+		Replace the geometry of the material in the pool with the buffers (None releases the geometry).
+		animation: render buffers and weights of the animation shader, which display the buffers (see Renderer.Model_Pool.fill())
+		"""
+		key = (pool, material)
+		threshold_model = self._threshold_models.get(key)
+		if threshold_model is not None and (buffers is None or not threshold_model.has_primitives(buffers)):
+			# The order of the old primitives isn't valid anymore
+			del self._threshold_models[key]
+			threshold_model.remove()
+			threshold_model = None
+		if buffers is None:
+			pool.release(material)
+			return
+		# The complete model is hidden by the threshold model, so it is only updated when it is displayed again
+		pool.fill(material, buffers, animation, self.threshold is not None and threshold_model is not None)
+		if threshold_model is not None:
+			# Same primitives with new colors or positions (e.g. recolored or animated), so the order is kept
+			threshold_model.set_buffers(buffers, animation)
+		self._apply_threshold(pool, material)
+
+
+	def switch_load_case(self, filename, cells=None, points=None):
+		"""
+		Switch to another load case of the same model. If the file has the same points, cells and materials,
+		only its arrays are taken over and the models are recolored. The geometry, the partition of the materials,
+		the clip and the picking indexes are kept.
+		cells/points: number of cells and points of the file, if already known (e.g. from the catalog), to skip reading other models
+		Returns False if the topology is different (or in server mode). Then the file has to be loaded completely.
+		"""
+		if is_server_mode() or self.mesh is None:
+			return False
+		if (cells is not None and cells != self.mesh.get_number_of_cells()) or (points is not None and points != len(self.mesh.points)):
+			return False
+		vtk_data = pv.OpenDataFile(filename)
+		vtk_data_local = self._fetch(vtk_data)
+		mesh = Processing.Mesh.from_vtk(vtk_data_local)
+		if self._topology_hash is None:
+			self._topology_hash = Processing.hash_topology(self.mesh)
+		if cfg.coloring_name not in mesh.cell_data or Processing.hash_topology(mesh) != self._topology_hash:
+			pv.Delete(vtk_data)
+			return False
+		
+		self._reset_animation()
+		self._take_over_arrays(mesh.cell_data, mesh.point_data)
+		# Replace the reader
+		self._filters[self._filters.index(self.vtk_data)] = vtk_data
+		pv.Delete(self.vtk_data)
+		self.vtk_data = vtk_data
+		self._color_range = None
+		self.recolor_models()
+		if self._is_animated():
+			# Warp and color with the arrays of the new load case
+			self._animate_models()
+		return True
+
+
+	def apply_step(self, step, next_step=None, fraction=0.0):
+		"""
+		Display a step of a time series (see TimeSeries.py). The steps have to have the same cells as the loaded file.
+		With next_step the values and the moved points are blended linearly between both steps (fraction 0: step, 1: next_step).
+		Only the colors and positions of the existing models are replaced, the geometry isn't rebuilt (see _animate_models()).
+		The color range grows with the displayed steps, so the colors of different steps are comparable.
+		Returns False if a step doesn't fit to the loaded file.
+		"""
+		steps = [step] if next_step is None else [step, next_step]
+		for current in steps:
+			if self.mesh is None or current.get_number_of_cells() != self.mesh.get_number_of_cells() or len(current.points) != len(self.mesh.points) \
+					or cfg.coloring_name not in current.cell_data:
+				return False
+		self._step_frame = (step, next_step, fraction)
+		key = tuple(current.filename for current in steps)
+		if key != self._step_keys:
+			# The arrays of the store (probe, hotspots, rebuilt models) are the ones of the first step
+			self._take_over_arrays(step.cell_data, step.point_data)
+			color_range = self.get_color_range()
+			for current in steps:
+				values = current.cell_data[cfg.coloring_name]
+				color_range = (min(color_range[0], float(numpy.nanmin(values))), max(color_range[1], float(numpy.nanmax(values))))
+			self._color_range = color_range
+			self._step_keys = key
+			self._step_offsets = [None if numpy.array_equal(current.points, self.mesh.points) else current.points - self.mesh.points
+				for current in steps]
+			self._update_slice()
+		self._animate_models()
+		return True
+
+
+	def has_displacement(self):
+		"""
+		Returns True if the loaded file has the displacement array for warping (see set_warp_scale()).
+		"""
+		return self.mesh is not None and _get_displacement(self.mesh.point_data) is not None
+
+
+	def set_warp_scale(self, scale):
+		"""
+		Warp the models by scale times the displacement point array (cfg.displacement_name), e.g. to exaggerate small deformations.
+		The displacement is interpolated at the vertices once per model and the scale is a uniform of the animation shader,
+		so a new scale doesn't change the existing models (see _animate_models()). Scale 0 displays the undeformed geometry.
+		"""
+		scale = min(max(float(scale), 0.0), cfg.warp_scale_max)
+		if scale == self.warp_scale or not self.has_displacement():
+			return
+		self.warp_scale = scale
+		self._animate_models()
+
+
+	def change_warp_scale(self, step):
+		"""
+		Change the warp scale by step as a fraction of cfg.warp_scale_max.
+		"""
+		self.set_warp_scale(self.warp_scale + step * cfg.warp_scale_max)
+
+
+	def set_smooth_coloring(self, smooth):
+		"""
+		Color the surfaces smoothly with the cell values averaged onto the points (see Processing.Cell_To_Point)
+		instead of one color per triangle. Not supported in server mode.
+		"""
+		if smooth == self.smooth_coloring or self.mesh is None:
+			return
+		self.smooth_coloring = smooth
+		self._animate_models()
+
+
+	def _is_animated(self):
+		"""
+		Returns True if the models are changed by a time series, the warping or the smooth coloring.
+		"""
+		return self._step_frame is not None or self.warp_scale != 0 or (self.smooth_coloring and self.mesh is not None)
+
+
+	def _get_point_values(self, material, values):
+		"""
+		Returns the values (one per cell) averaged onto the points within the material.
+		The incidence matrix of every material is built once per file.
+		"""
+		if material not in self._cell_to_point:
+			self._cell_to_point[material] = Processing.Cell_To_Point(self.mesh, self._store.get_material_cells(material))
+		return self._cell_to_point[material].average(values)
+
+
+	def _animate_models(self):
+		"""
+		Update the colors and positions of the existing models for the displayed steps of the time series and the warp scale.
+		Every model keeps a Processing.Vertex_Animation with the arrays interpolated at its vertices,
+		so a frame is only a few vectorized operations per model. The displayed models are animated by the animation shader
+		of the renderer, so they are only rebuilt, when other steps are blended.
+		"""
+		if self._step_frame is None:
+			# The loaded file (or load case) without a time series
+			key = ()
+			values = [self.mesh.cell_data[cfg.coloring_name]]
+			offsets = [None]
+			displacements = [_get_displacement(self.mesh.point_data)]
+			fraction = 0.0
+		else:
+			step, next_step, fraction = self._step_frame
+			steps = [step] if next_step is None else [step, next_step]
+			key = self._step_keys
+			values = [current.cell_data[cfg.coloring_name] for current in steps]
+			offsets = self._step_offsets
+			displacements = [_get_displacement(current.point_data) for current in steps]
+		blended = len(values) > 1
+		key = (key, self.smooth_coloring)
+		color_range = self.get_color_range()
+		for pool in (self._cloud_pool, self._surface_pool):
+			for material, buffers in list(pool.buffers.items()):
+				animation = self._animations.get((pool, material))
+				if animation is None or animation.last is not buffers:
+					# New or rebuilt model
+					animation = Processing.Vertex_Animation(self.mesh, buffers)
+					self._animations[(pool, material)] = animation
+				if animation.steps != key:
+					point_values = [None]
+					if self.smooth_coloring and pool is self._surface_pool:
+						point_values = [self._get_point_values(material, current) for current in values]
+					animation.set_steps(key, values[0], values[-1] if blended else None, offsets[0], offsets[-1] if blended else None,
+						displacements[0], displacements[-1] if blended else None, point_values[0], point_values[-1] if blended else None)
+				buffers = animation.animate(fraction, color_range[0], color_range[1], self.warp_scale)
+				# Picking and the threshold use the buffers, the model only gets new weights
+				self._fill_model(pool, material, buffers, animation.get_render_buffers(fraction, color_range[0], color_range[1], self.warp_scale))
+				bvh = self._bvhs.get((pool, material))
+				if bvh is not None and not animation.is_moved():
+					# The geometry of the picking index stays the same. Moved models are refit with the next pick.
+					bvh.buffers = buffers
+
+
+	def _reset_animation(self):
+		"""
+		Put the models back to the geometry of the loaded file, e.g. after a time series.
+		"""
+		for (pool, material), animation in self._animations.items():
+			if pool.buffers.get(material) is animation.last and animation.is_moved():
+				pool.buffers[material] = animation.base
+				self._bvhs.pop((pool, material), None)
+		self._animations.clear()
+		self._step_keys = None
+		self._step_offsets = None
+		self._step_frame = None
+
+
+	def _take_over_arrays(self, cell_data, point_data):
+		"""
+		Copy the arrays of another load case or step into the store. The workers read them from there.
+		"""
+		for name, values in cell_data.items():
+			self._store.replace_array('cell/' + name, values)
+		for name, values in point_data.items():
+			self._store.replace_array('point/' + name, values)
+		self.mesh = self._store.mesh
+		self._hotspot_cache.clear()
+		# The cached models, iso-surfaces and threshold orders have the old values
+		self._result_cache.clear()
+		self._clear_threshold_models()
+		self._close_iso_surfaces()
+		self._statistics = None
+		self._region_statistics = None
+
+
+	def recolor_models(self):
+		"""
+		Color the existing models with the current values of the coloring array without rebuilding the geometry.
+		Every primitive of the models knows its cell, so its new value is read from the cell data.
+		"""
+		color_range = self.get_color_range()
+		values = self.mesh.cell_data[cfg.coloring_name]
+		for pool in (self._cloud_pool, self._surface_pool):
+			for material, buffers in list(pool.buffers.items()):
+				buffers = Processing.recolor_buffers(buffers, values[buffers.cell_ids], color_range[0], color_range[1])
+				self._fill_model(pool, material, buffers)
+				# The geometry of the picking index stays the same
+				bvh = self._bvhs.get((pool, material))
+				if bvh is not None:
+					bvh.buffers = buffers
+		self._update_slice()
+
+
+	def _update_material_visibility(self, material):
+		"""
+		Display the models of the material, if it isn't hidden by the user or removed by the clip.
+		"""
+		visible = material not in self._hidden_materials and material not in self._removed_materials
+		for models in (self.cloud_materials, self.surface_materials):
+			if material in models:
+				models[material].visible(visible)
+		# The cross-section and the iso-surfaces aren't clipped
+		for models in (self._slice_pool.groups, self._iso_pool.groups):
+			if material in models:
+				models[material].visible(material not in self._hidden_materials)
+
+
+	def _estimate_memory(self):
+		"""
+		Estimate the memory of every component of the data (see MemoryGovernor.py) from the data information of ParaView,
+		so the grid doesn't have to be fetched. The grid has the memory size of the reader output. Its connectivity is
+		the rest of it without the points, the arrays, the offsets and the cell types.
+		"""
+		information = self.vtk_data.GetDataInformation()
+		cells = information.GetNumberOfCells()
+		points = information.GetNumberOfPoints()
+		grid = information.GetMemorySize() * 1024
+		arrays = sum(_get_array_bytes(data[name], count) for data, count in ((self.vtk_data.CellData, cells), (self.vtk_data.PointData, points))
+			for name in data.keys())
+		connectivity = max(0, (grid - arrays - points * 3 * 4 - cells * (8 + 1)) // 8)
+		material_cells = None
+		if cfg.material_name in self.vtk_data.CellData.keys():
+			material_cells = self._count_material_cells()
+		return MemoryGovernor.estimate_components(cells, points, connectivity, self.vtk_data.CellData.GetNumberOfArrays(),
+			self.vtk_data.PointData.GetNumberOfArrays(), material_cells, is_server_mode(), grid)
+
+
+	def _count_material_cells(self):
+		"""
+		Returns the number of cells of every material. ParaView counts them with a histogram of the material array,
+		so only the counts are fetched.
+		"""
+		material_range = self.vtk_data.CellData[cfg.material_name].GetRange()
+		histogram = pv.Histogram(Input=self.vtk_data)
+		histogram.SelectInputArray = ['CELLS', cfg.material_name]
+		# One bin per material
+		histogram.BinCount = max(1, int(material_range[1]) - int(material_range[0]) + 1)
+		histogram.UseCustomBinRanges = 1
+		histogram.CustomBinRanges = [int(material_range[0]) - 0.5, int(material_range[1]) + 0.5]
+		table = self._fetch(histogram)
+		pv.Delete(histogram)
+		counts = table.GetColumnByName('bin_values')
+		return [int(counts.GetValue(i)) for i in range(counts.GetNumberOfTuples()) if counts.GetValue(i) > 0]
+
+
+	def _get_build_options(self):
+		"""
+		Returns the Build_Options for the next reload. Models built on demand are only built if their view is displayed.
+		"""
+		options = self.memory_decision.options.copy()
+		# The adaptive quality can only lower the detail, which the memory allows
+		options.cloud_stride = max(options.cloud_stride, self.quality[0])
+		options.surface_level = max(options.surface_level, self.quality[1])
+		if self.memory_decision.on_demand:
+			options.cloud = self.cloud_node.getVisible()
+			options.surface = self.surface_node.getVisible()
+		return options
+
+
+	def _prepare_server_input(self, data):
+		"""
+		Prepare the data on the server: add the original cell ids and distribute the cells over all server processes.
+		"""
+		# Remember the cell ids of the file, so the models can be related to the cells
+		data = pv.GenerateIds(Input=data)
+		self._filters += [data]
+		if hasattr(data, 'CellIdsArrayName'):
+			data.CellIdsArrayName = Processing.ORIGINAL_CELL_IDS
+		else:
+			data.IdsArrayName = Processing.ORIGINAL_CELL_IDS
+		# Readers of legacy files read everything in the first process, so the data is distributed
+		if pv.servermanager.ActiveConnection.GetNumberOfDataPartitions() > 1:
+			redistribute = pv.RedistributeDataSet if hasattr(pv, 'RedistributeDataSet') else pv.D3
+			data = redistribute(Input=data)
+			self._filters += [data]
+		return data
+
+
+	def _process_materials_on_server(self, color_range, options, materials):
+		"""
+		Separate, clip and extract the surfaces of the materials on the pvserver.
+		Only the cell centers and the surfaces are fetched.
+		options is a Processing.Build_Options object.
+		Returns a list of (material, cloud buffers, surface buffers) in material order.
+		"""
+		# The filters of the last models aren't needed anymore
+		for filter in reversed(self._model_filters):
+			pv.Delete(filter)
+		self._model_filters = []
+		fetch_statistics = dict(self.fetch_statistics)
 		
 		# Apply clip filter
-		data = self._apply_clip(self.vtk_data)
+		data = self._apply_clip(self._server_input)
 		
-		# Iterate over every material
-		material_range = self.vtk_data_local.GetCellData().GetArray(cfg.material_name).GetRange()
-		for material in range(int(material_range[0]), int(material_range[1])+1):
+		results = []
+		for material in materials:
 			# Separate the data by material
 			material_data = pv.Threshold(Input=data)
-			self._filters += [material_data]
 			# Settings are generated mostly by ParaView Trace function
 			material_data.Scalars = ['CELLS', cfg.material_name]
 			material_data.ThresholdRange = [material, material]
 			
-			# Generate cloud
-			local = pv.servermanager.Fetch(material_data)
-			self.cloud_materials[material] = self.generate_cloud(local, cfg.coloring_name)
-			self.cloud_materials[material].setParent(self.cloud_node)
+			self._model_filters += [material_data]
+			cloud = None
+			surface = None
 			
-			# Apply ExtractSurface and Triangulate filter
-			extractSurface = pv.ExtractSurface(Input=material_data)
-			self._filters += [extractSurface]
-			# Settings are generated by ParaView Trace function
-			extractSurface.PieceInvariant = 1
-			extractSurface.NonlinearSubdivisionLevel = 1
-			triangulate = pv.Triangulate(Input=extractSurface)
-			self._filters += [triangulate]
+			if options.cloud:
+				# The cloud only needs the centers of the cells
+				centers = pv.CellCenters(Input=material_data)
+				centers.VertexCells = 0
+				self._model_filters += [centers]
+				if options.cloud_stride > 1:
+					# Fetch only every n-th center
+					centers = pv.MaskPoints(Input=centers, OnRatio=options.cloud_stride, MaximumNumberofPoints=2**31-1, GenerateVertices=0)
+					self._model_filters += [centers]
+				cloud = Processing.generate_cloud_buffers_from_centers(
+					self._fetch(centers), cfg.coloring_name, color_range[0], color_range[1], Processing.ORIGINAL_CELL_IDS)
 			
-			# Generate surface
-			local = pv.servermanager.Fetch(triangulate)
-			self.surface_materials[material] = self.generate_surface(local, cfg.coloring_name)
-			self.surface_materials[material].setParent(self.surface_node)
+			if options.surface:
+				# Apply ExtractSurface and Triangulate filter
+				extractSurface = pv.ExtractSurface(Input=material_data)
+				# Settings are generated by ParaView Trace function
+				extractSurface.PieceInvariant = 1
+				extractSurface.NonlinearSubdivisionLevel = 1
+				triangulate = pv.Triangulate(Input=extractSurface)
+				self._model_filters += [extractSurface, triangulate]
+				surface = Processing.generate_surface_buffers_from_polydata(
+					self._fetch(triangulate), cfg.coloring_name, color_range[0], color_range[1], Processing.ORIGINAL_CELL_IDS, options.surface_level)
+			results.append((material, cloud, surface))
+		
+		print("Fetched {0} objects with {1:.1f} MB in {2:.2f} s from the pvserver".format(
+			self.fetch_statistics['fetches'] - fetch_statistics['fetches'],
+			(self.fetch_statistics['bytes'] - fetch_statistics['bytes']) / 1024.0**2,
+			self.fetch_statistics['seconds'] - fetch_statistics['seconds']))
+		return results
 
 
-	def _clean_vizard_models(self):
-		"""
-		Delete model related objects
-		"""
-		for child in self.cloud_node.getChildren():
-			child.remove()
-		for child in self.surface_node.getChildren():
-			child.remove()
-		self.surface_materials.clear()
-		self.cloud_materials.clear()
-		
 	def _apply_clip(self, data):
 		"""
-		Apply the Clip filter to the data.
+		Apply the Clip filters of the clip set to the data on the server (one filter per plane, the box as six planes).
+		Chained filters keep the points kept by every plane, so "or" is clipped at the clip function of the clip set instead
+		(see Clipping.Clip_Set.get_expression()), which the Calculator evaluates at the points.
 		Returns clipped data.
 		"""
 		# Apply clip only if needed
-		if (not self.clip_normal is None) and (not self.clip_origin is None):
+		regions = self.clip_set.get_regions()
+		if self.clip_set.mode == "or" and len(regions) > 1:
+			data = pv.Calculator(Input=data)
+			self._model_filters += [data]
+			data.AttributeType = 'Point Data'
+			data.ResultArrayName = _CLIP_FUNCTION_NAME
+			data.Function = self.clip_set.get_expression()
 			data = pv.Clip(Input=data)
-			self._filters += [data]
-			# Settings are generated mostly by ParaView Trace function
-			data.ClipType = 'Plane'
-			data.Scalars = ['CELLS', cfg.coloring_name]
-			data.Value = 17.925
-			data.ClipType.Origin = self.clip_origin
-			data.ClipType.Normal = self.clip_normal
+			self._model_filters += [data]
+			data.ClipType = 'Scalar'
+			data.Scalars = ['POINTS', _CLIP_FUNCTION_NAME]
+			data.Value = 0.0
+			# Keep the points with a clip function >= 0
+			data.Invert = 0
+			return data
+		for region in regions:
+			for origin, normal in region:
+				data = pv.Clip(Input=data)
+				self._model_filters += [data]
+				# Settings are generated mostly by ParaView Trace function
+				data.ClipType = 'Plane'
+				data.Scalars = ['CELLS', cfg.coloring_name]
+				data.Value = 17.925
+				data.ClipType.Origin = origin
+				data.ClipType.Normal = normal
 		return data
 
 
-	@staticmethod
-	def _get_color(minimum, maximum, value):
-		"""
-		Calculate the color for the models with the given input.
-		minimum: minimum value
-		maximum: maximum value
-		value: value between minimum and maximum
-		"""
-		# example:
-		# _get_color(1, 5, 4)
-		#
-		# min		  middle		  max
-		# blue		  white			  red
-		#  |-------------|-------------|
-		#				 |------|		 <-- percentage of red
-		#        		 	    ^
-		#					  value
-		#
-		# Returns: (1, 0.5, 0.5)
-		minimum = float(minimum)
-		maximum = float(maximum)
-		value = float(value)
-		
-		middle = (minimum + maximum) / 2
-		if value <= middle:
-			# Calculate the color between blue and white
-			percentage = (value - minimum) / (middle - minimum)
-			return (percentage, percentage, 1)
-		else:
-			# Calculate the color between white and red
-			percentage = (value - middle) / (maximum - middle)
-			return (1, 1 - percentage, 1 - percentage)
+	def _fetch(self, proxy):
+		"""
+		Fetch the data of a ParaView filter to the client and measure the traffic.
+		"""
+		start = time.time()
+		local = pv.servermanager.Fetch(proxy)
+		self.fetch_statistics['seconds'] += time.time() - start
+		self.fetch_statistics['fetches'] += 1
+		self.fetch_statistics['bytes'] += local.GetActualMemorySize() * 1024
+		return local
 
 
-	def generate_cloud(self, data, color_array_name):
+	def get_fetch_statistics(self):
 		"""
-		Render the vtk data as a cloud, centered at origin and return the Vizard object.
-		color_array_name defines the name of the CellData array (for example: "equivalent_stress" or "material")
+		Returns the number of fetches, the fetched bytes and the time needed for fetching since the file was loaded.
 		"""
-		# Start creating the model
-		viz.startLayer(viz.POINTS)
-		viz.pointSize(self.cloud_point_size)
-		# Use the range of the complete data set to ensure consitency
-		minimum, maximum = self.vtk_data_local.GetCellData().GetArray(color_array_name).GetRange()
-		
-		# Generate cloud model by iterating over every cell
-		num_of_cells = data.GetNumberOfCells()
-		for i in range(num_of_cells):
-			cell = data.GetCell(i)
-			
-			# Calculate the center of the cell
-			x=0.0; y=0.0; z=0.0
-			num_of_points = cell.GetNumberOfPoints()
-			for j in range(num_of_points):
-				point = cell.GetPoints().GetPoint(j)
-				x += point[0]
-				y += point[1]
-				z += point[2]
-			x /= num_of_points
-			y /= num_of_points
-			z /= num_of_points
-			
-			# Get the value of the cell for color calculation
-			value = data.GetCellData().GetArray(color_array_name).GetValue(i)
-			color = Simulation_Data._get_color(minimum, maximum, value)
-			viz.vertexColor(color[0], color[1], color[2])
-			# Draw the point
-			viz.vertex(x,y,z)
-		
-		# Finish the model
-		model = viz.endLayer()
-		# Set the center of the model to (0, 0, 0)
-		model.setPosition(
-			-(self._original_center[0]),
-			-(self._original_center[1]),
-			-(self._original_center[2]))
+		return dict(self.fetch_statistics)
+
+
+	def generate_cloud(self, buffers):
+		"""
+		Render the cloud buffers (see Processing.generate_cloud_buffers), centered at origin and return the Vizard object.
+		"""
+		# Build the model with all points at once
+		model = self._renderer.build(buffers)
+		self._cloud_pool.prepare(model)
 		# Create group to get a centered model with coordinates (0, 0, 0)
 		group = viz.addGroup()
 		model.setParent(group)
 		return group
 
 
-	def generate_surface(self, data, color_array_name):
+	def generate_surface(self, buffers):
 		"""
-		Render the vtk data as a surface, centered at origin and return the Vizard object.
-		color_array_name defines the name of the CellData array (for example: "equivalent_stress" or "material")
+		Render the surface buffers (see Processing.generate_surface_buffers), centered at origin and return the Vizard object.
 		"""
-		# Start creating the model
-		viz.startLayer(viz.TRIANGLES)
-		# Use the range of the complete data set to ensure consitency
-		minimum, maximum = self.vtk_data_local.GetCellData().GetArray(color_array_name).GetRange()
-		
-		# Generate surface model by iterating over every polygon
-		polys = data.GetPolys()
-		polys.InitTraversal()
-		id_list = vtk.vtkIdList()
-		cell = polys.GetNextCell(id_list)
-		while not cell == 0:
-			# Get the value of the cell for color calculation
-			value = data.GetCellData().GetArray(color_array_name).GetValue(polys.GetTraversalLocation()/4)
-			color = Simulation_Data._get_color(minimum, maximum, value)
-			viz.vertexColor(color[0], color[1], color[2])
-			
-			# Read the points (po) of the polygon
-			po = []
-			for j in range(id_list.GetNumberOfIds()):
-				po.append(data.GetPoints().GetPoint(id_list.GetId(j)))
-			
-			# Calculate the normal vector of the polygon
-			# Normal vector is needed for better lighting
-				# Calculate the coss product of vectors from point 0 to 1 and 0 to 2
-			ab = (po[1][0]-po[0][0], po[1][1]-po[0][1], po[1][2]-po[0][2])
-			ac = (po[2][0]-po[0][0], po[2][1]-po[0][1], po[2][2]-po[0][2])
-			normal = numpy.cross(ab, ac)
-				# Set the magnitude of the normal vector to 1
-			normal = normal/numpy.linalg.norm(normal)
-			# Create the polygon with the normal vector and the points
-			viz.normal(normal[0], normal[1], normal[2])
-			for position in po:
-				viz.vertex(position[0],position[1],position[2])
-			cell = polys.GetNextCell(id_list)
-		
-		# Finish the model
-		model = viz.endLayer()
-		# Enable lighting for the model (Shadows aren't needed)
-		model.enable(viz.LIGHTING)
-		model.disable(viz.SHADOW_CASTING)
-		model.disable(viz.SHADOWS)
-		# Set the center of the model to (0, 0, 0)
-		model.setPosition(
-			-(self._original_center[0]),
-			-(self._original_center[1]),
-			-(self._original_center[2]))
+		# Build the model with all triangles at once
+		model = self._renderer.build(buffers)
+		self._surface_pool.prepare(model)
 		# Create group to get a centered model with coordinates (0, 0, 0)
 		group = viz.addGroup()
 		model.setParent(group)
@@ -280,7 +1100,18 @@ class Simulation_Data:
 		This function cycles through the different view modes.
 		It acts like a shift register where the last bit is the input of the first.
 		110 -> 011 -> 101 -> 110
+		If the models are built on demand, only the cloud or the surface is displayed and the hidden one is released.
+		In the slice mode, the views before the slice mode are displayed again.
 		"""
+		if self.is_slice_mode():
+			self.set_slice_mode(False)
+			return
+		if self.memory_decision.on_demand:
+			show_cloud = not self.cloud_node.getVisible()
+			self.cloud_node.visible(show_cloud)
+			self.surface_node.visible(not show_cloud)
+			self.reload_models()
+			return
 		tmp = self.cloud_node.getVisible()
 		self.cloud_node.visible(self.surface_node.getVisible())
 		self.surface_node.visible(self._cycle_view_mode_buffer)
@@ -300,39 +1131,352 @@ class Simulation_Data:
 		This function also updates the point cloud model.
 		"""
 		self.cloud_point_size = point_size
-		# update the models of the different materials
-		for key in self.cloud_materials.keys():
-			old_model = self.cloud_materials[key].getChildren()[0]
-			# Create new model
-			viz.startLayer(viz.POINTS)
-			viz.pointSize(point_size)
-			# Copy the old model with new point_size
-			for point_id in range(old_model.getVertexCount()):
-				viz.vertexColor(old_model.getVertexColor(point_id))
-				viz.vertex(old_model.getVertex(point_id))
-			model = viz.endLayer()
-			# Replace the old model with the new one
-			model.setParent(self.cloud_materials[key])
-			model.setPosition(old_model.getPosition())
-			model.setScale(old_model.getScale())
-			model.setEuler(old_model.getEuler())
-			old_model.remove()
+		# update the models of the different materials. The point size is a render state, so no rebuild is needed.
+		self._cloud_pool.set_point_size(point_size)
+		for (pool, material), threshold_model in self._threshold_models.items():
+			if pool is self._cloud_pool:
+				for model in threshold_model.get_models():
+					model.pointSize(point_size)
+
+
+	def set_quality(self, cloud_stride, surface_level):
+		"""
+		Set the level of detail of the adaptive quality: only every n-th cell in the cloud and the surface level.
+		The models are rebuilt, if the quality changed.
+		"""
+		if (cloud_stride, surface_level) == self.quality:
+			return
+		self.quality = (cloud_stride, surface_level)
+		self.reload_models()
+
+
+	def set_threshold(self, threshold):
+		"""
+		Display only the cells with a value of the coloring array >= threshold (None displays every cell).
+		The primitives are sorted once per material, so a change only updates the cells between the old and the new threshold.
+		"""
+		self.threshold = threshold
+		for pool in (self._cloud_pool, self._surface_pool, self._slice_pool):
+			for material in list(pool.models.keys()):
+				self._apply_threshold(pool, material)
+
+
+	def change_threshold(self, step):
+		"""
+		Move the threshold by step (fraction of the color range). The threshold is clamped to the color range.
+		"""
+		color_range = self.get_color_range()
+		threshold = color_range[0] if self.threshold is None else self.threshold
+		threshold = min(max(threshold + step * (color_range[1] - color_range[0]), color_range[0]), color_range[1])
+		# The lowest value displays every cell
+		self.set_threshold(None if threshold <= color_range[0] else threshold)
+
+
+	def _apply_threshold(self, pool, material):
+		"""
+		Display the complete model of the material or its threshold model.
+		"""
+		key = (pool, material)
+		if self.threshold is None:
+			pool.update(material)
+			pool.models[material].visible(True)
+			if key in self._threshold_models:
+				self._threshold_models[key].hide()
+			return
+		if key not in self._threshold_models:
+			self._threshold_models[key] = Renderer.Threshold_Model(self._renderer, pool.buffers[material], pool.get_group(material), pool.prepare,
+				self._get_threshold_index(material, pool.buffers[material]))
+			if pool.animations.get(material) is not None:
+				self._threshold_models[key].set_buffers(pool.buffers[material], pool.animations[material])
+		pool.models[material].visible(False)
+		self._threshold_models[key].set_threshold(self.threshold)
+
+
+	def _get_threshold_index(self, material, buffers):
+		"""
+		Returns the Processing.Threshold_Index of the buffers of the material.
+		The cells of every material are sorted once per coloring array. The cloud, the surface and the cross-section
+		take their order from the ranks of their cells, so the values aren't sorted for every model.
+		"""
+		if self.mesh is None or buffers.cell_ids is None:
+			# In server mode the cell data isn't available on the client
+			return None
+		values = self.mesh.cell_data[cfg.coloring_name]
+		if self._cell_ranks is None:
+			self._cell_ranks = numpy.empty(self.mesh.get_number_of_cells(), dtype=numpy.int32)
+		if self._ranked_materials.get(material) != cfg.coloring_name:
+			Processing.rank_cells(values, self._store.get_material_cells(material), self._cell_ranks)
+			self._ranked_materials[material] = cfg.coloring_name
+		return Processing.Threshold_Index.from_cell_ranks(buffers.cell_ids, values, self._cell_ranks)
+
+
+	def _clear_threshold_models(self):
+		"""
+		Remove the threshold models and the ranks of the cells, e.g. if the values changed.
+		"""
+		for key in list(self._threshold_models.keys()):
+			self._threshold_models.pop(key).remove()
+		self._ranked_materials.clear()
+
+
+	def pick(self, origin, direction):
+		"""
+		Returns the Picking.Pick_Result of the first displayed surface triangle (or cloud point, if only the cloud is displayed,
+		or cross-section triangle in the slice mode) hit by the ray or None. origin and direction are in the coordinates of the data (see data_node).
+		"""
+		if self.is_slice_mode():
+			pool = self._slice_pool
+		elif self.surface_node.getVisible():
+			pool = self._surface_pool
+		elif self.cloud_node.getVisible():
+			pool = self._cloud_pool
+		else:
+			return None
+		origin = numpy.asarray(origin, dtype=numpy.float64)
+		direction = numpy.asarray(direction, dtype=numpy.float64)
+		candidates = []
+		for material in pool.buffers.keys():
+			if material in self._hidden_materials or (material in self._removed_materials and pool is not self._slice_pool):
+				continue
+			key = (pool, material)
+			if key not in self._bvhs:
+				self._bvhs[key] = Picking.BVH(pool.buffers[material], cfg.pick_point_radius * self._diagonal)
+			elif self._bvhs[key].buffers is not pool.buffers[material]:
+				# The model was moved (see _animate_models()), but the tree stays the same
+				self._bvhs[key].refit(pool.buffers[material])
+			distance = self._bvhs[key].get_entry_distance(origin, direction)
+			if distance < numpy.inf:
+				candidates.append((distance, material))
+		# Test the nearest materials first. Materials behind a hit are skipped.
+		result = None
+		for distance, material in sorted(candidates):
+			if result is not None and distance > result.distance:
+				break
+			hit = self._bvhs[(pool, material)].intersect(origin, direction, self.threshold,
+				result.distance if result is not None else numpy.inf)
+			if hit is not None:
+				hit.material = material
+				result = hit
+		return result
+
+
+	def get_hotspots(self):
+		"""
+		Returns the regions with the highest values of cfg.hotspot_name (see Hotspots.py) as a list of Hotspot objects
+		in the coordinates of the data. Only cells kept by the clip are used. The result is cached for every clip state.
+		"""
+		clip_set = self.clip_set
+		key = (cfg.hotspot_name, clip_set.get_key())
+		if key in self._hotspot_cache:
+			return self._hotspot_cache[key]
+		radius = cfg.hotspot_cluster_radius * self._diagonal
+		if self.mesh is not None:
+			mesh = self.mesh
+			accept = None
+			if not clip_set.is_empty():
+				# Cells with a center kept by the clip
+				accept = lambda cells: clip_set.evaluate(mesh.get_cell_centers(cells)) >= 0
+			hotspots = Hotspots.find_hotspots(mesh.cell_data[cfg.hotspot_name], mesh.get_cell_centers, cfg.hotspot_cells, radius,
+				mesh.get_original_cell_ids(), mesh.cell_data.get(cfg.material_name), accept, cfg.hotspot_max)
+		else:
+			# In server mode only the cloud models are local (already clipped, but maybe only every n-th cell and colored by cfg.coloring_name)
+			hotspots = self._get_hotspots_from_clouds(radius)
+		self._hotspot_cache[key] = hotspots
+		return hotspots
+
+
+	def _get_hotspots_from_clouds(self, radius):
+		"""
+		Find the hotspots in the geometry buffers of the clouds.
+		"""
+		materials = sorted(self._cloud_pool.buffers.keys())
+		if not materials:
+			return []
+		buffers = [self._cloud_pool.buffers[material] for material in materials]
+		positions = numpy.concatenate([b.positions for b in buffers])
+		return Hotspots.find_hotspots(
+			numpy.concatenate([b.values for b in buffers]), lambda cells: positions[cells], cfg.hotspot_cells, radius,
+			numpy.concatenate([b.cell_ids for b in buffers]),
+			numpy.concatenate([numpy.full(len(b.values), material) for b, material in zip(buffers, materials)]),
+			None, cfg.hotspot_max)
 
 
 	def toggle_material(self, number):
 		"""
 		Toggle the visibilty of the different materials.
 		"""
-		if number in self.cloud_materials.keys():
-			self.cloud_materials[number].visible(not self.cloud_materials[number].getVisible())
-			self.surface_materials[number].visible(not self.surface_materials[number].getVisible())
+		if number in self._hidden_materials:
+			self._hidden_materials.remove(number)
+		elif number in self._get_materials():
+			self._hidden_materials.add(number)
+		self._update_material_visibility(number)
+		self._update_slice()
 
 
 	def get_material_range(self):
 		"""
 		Returns the range of different materials.
 		"""
-		return self.vtk_data_local.GetCellData().GetArray(cfg.material_name).GetRange()
+		return self.vtk_data.CellData[cfg.material_name].GetRange()
+
+
+	def get_color_range(self):
+		"""
+		Returns the range of the coloring array of the complete data set (or of the displayed steps of a time series).
+		With the color clamp (see set_color_clamp()) it is the range between the percentiles cfg.color_percentiles.
+		"""
+		if self._color_range is not None:
+			return self._color_range
+		if self.clamp_colors and self.get_statistics() is not None:
+			statistics = self.get_statistics()[None]
+			return (statistics.get_percentile(cfg.color_percentiles[0]), statistics.get_percentile(cfg.color_percentiles[1]))
+		return self.vtk_data.CellData[cfg.coloring_name].GetRange()
+
+
+	def set_color_clamp(self, clamp):
+		"""
+		Clamp the color range to the percentiles cfg.color_percentiles of all cells, so a few outliers don't wash out the colors.
+		Values outside of the range get the color of its nearest end. The growing range of a time series isn't clamped.
+		Not supported in server mode.
+		"""
+		if clamp == self.clamp_colors or self.mesh is None:
+			return
+		self.clamp_colors = clamp
+		# The iso-surfaces are colored with the color range, too
+		self._close_iso_surfaces()
+		self.recolor_models()
+		if self._is_animated():
+			self._animate_models()
+		print("Color range {0:.4g} to {1:.4g}".format(*self.get_color_range()))
+
+
+	def get_statistics(self):
+		"""
+		Returns material -> Statistics.Material_Statistics of the coloring array and None -> the statistics of all cells.
+		They are calculated once for the values of the loaded file (or load case or step). None in server mode.
+		"""
+		if self._statistics is None and self.mesh is not None:
+			materials = dict((material, self._store.get_material_cells(material)) for material in self._get_materials())
+			self._statistics = Statistics.compute_statistics(self.mesh.cell_data[cfg.coloring_name], materials)
+		return self._statistics
+
+
+	def get_region_statistics(self):
+		"""
+		Returns the Statistics.Region_Statistics of the displayed cells: the cells of the materials, which aren't hidden,
+		whose center is kept by the clip and whose value is >= the threshold. Only the cells, which changed since the last call,
+		are added or removed (see _update_region()). The volumes are the ones of the loaded file. None in server mode.
+		"""
+		if self.mesh is None:
+			return None
+		if self._region_statistics is None:
+			if self._cell_volumes is None:
+				self._cell_volumes = Processing.get_cell_volumes(self.mesh)
+			self._region_statistics = Statistics.Region_Statistics(self.mesh.cell_data[cfg.coloring_name], self._cell_volumes)
+			self._region_key = None
+		key = (frozenset(self._hidden_materials), self.clip_set.get_key(), self.threshold)
+		if self._region_key is None:
+			self._region_statistics.set_mask(self._get_region_mask())
+		elif key != self._region_key:
+			self._update_region(self._region_key, key)
+		self._region_key = key
+		return self._region_statistics
+
+
+	def _get_region_mask(self):
+		"""
+		Returns the mask of the displayed cells (see get_region_statistics()).
+		"""
+		mask = numpy.zeros(self.mesh.get_number_of_cells(), dtype=bool)
+		for material in self._get_materials():
+			if material not in self._hidden_materials:
+				self._update_cell_clip(material)
+				mask[self._store.get_material_cells(material)] = True
+		if self._cell_clip is not None:
+			mask &= self._cell_clip
+		if self.threshold is not None:
+			mask &= self.mesh.cell_data[cfg.coloring_name] >= self.threshold
+		return mask
+
+
+	def _update_region(self, old_key, key):
+		"""
+		Change the region statistics from the region of old_key to the one of key (see get_region_statistics())
+		with only the cells, which changed: the cells, whose clip flag flipped, the cells of the shown and hidden materials
+		and the cells between the old and the new threshold.
+		"""
+		old_hidden, old_clip, old_threshold = old_key
+		hidden, clip, threshold = key
+		statistics = self._region_statistics
+		values = self.mesh.cell_data[cfg.coloring_name]
+		above = lambda cells: cells if old_threshold is None else cells[values[cells] >= old_threshold]
+		materials = self._get_materials()
+		for material in materials:
+			if material in old_hidden or material in hidden:
+				continue
+			changed = self._update_cell_clip(material)
+			if len(changed):
+				kept = self._cell_clip[changed]
+				statistics.add(above(changed[kept]))
+				statistics.remove(changed[~kept])
+		for material in old_hidden ^ hidden:
+			if material not in materials:
+				continue
+			cells = self._store.get_material_cells(material)
+			if material in hidden:
+				statistics.remove(cells)
+			else:
+				self._update_cell_clip(material)
+				statistics.add(above(cells if self._cell_clip is None else cells[self._cell_clip[cells]]))
+		if threshold == old_threshold:
+			return
+		if threshold is not None and (old_threshold is None or threshold > old_threshold):
+			statistics.remove(statistics.get_cells_between(old_threshold, threshold))
+			return
+		cells = statistics.get_cells_between(threshold, old_threshold)
+		if self._cell_clip is not None:
+			cells = cells[self._cell_clip[cells]]
+		if hidden:
+			cells = cells[~numpy.isin(self.mesh.cell_data[cfg.material_name][cells], list(hidden))]
+		statistics.add(cells)
+
+
+	def _update_cell_clip(self, material):
+		"""
+		Update the clip flags of the cells of the material in self._cell_clip (True: the clip keeps the center of the cell)
+		to the current clip set and return the cells, whose flag flipped.
+		Materials, whose bounding box is completely kept or removed, get the same flag for every cell.
+		The centers are only evaluated for the materials, whose box the clip crosses.
+		"""
+		key = self.clip_set.get_key()
+		old_key, old_state = self._cell_clip_states.get(material, (Clipping.Clip_Set().get_key(), "kept"))
+		if old_key == key:
+			return numpy.zeros(0, dtype=numpy.int64)
+		cells = self._store.get_material_cells(material)
+		state = self._classify_material(self.clip_set, material)
+		if state == "intersected":
+			state = self.clip_set.evaluate(self.mesh.get_cell_centers(cells)) >= 0
+		self._cell_clip_states[material] = (key, state)
+		if isinstance(old_state, str) and isinstance(state, str):
+			changed = cells if old_state != state else cells[:0]
+		else:
+			get_flags = lambda state: numpy.full(len(cells), state == "kept") if isinstance(state, str) else state
+			changed = cells[get_flags(old_state) != get_flags(state)]
+		if len(changed):
+			if self._cell_clip is None:
+				self._cell_clip = numpy.ones(self.mesh.get_number_of_cells(), dtype=bool)
+			self._cell_clip[changed] = ~self._cell_clip[changed]
+		return changed
+
+
+	def get_displayed_statistics(self):
+		"""
+		Returns the combined Statistics.Material_Statistics of the materials, which aren't hidden (None if there are none).
+		"""
+		statistics = self.get_statistics()
+		if statistics is None:
+			return None
+		return Statistics.combine([statistics[material] for material in self._get_materials() if material not in self._hidden_materials])
 
 
 	def get_probe_value(self, position):
@@ -341,23 +1485,50 @@ class Simulation_Data:
 		"""
 		# Apply ProbeLocation filter with configruation found by ParaView Trace function
 		probeLocation = pv.ProbeLocation(Input=self.vtk_data, ProbeType='Fixed Radius Point Source')
-		self._filters += [probeLocation]
 		probeLocation.ProbeType.Center = position
 		
-		local = pv.servermanager.Fetch(probeLocation)
+		local = self._fetch(probeLocation)
+		# The filter is deleted at once, because the stressindicator probes every frame
+		pv.Delete(probeLocation)
 		return local.GetPointData().GetScalars(cfg.coloring_name).GetValue(0)
 
 
+	def _release_store(self):
+		"""
+		Release the shared memory of the data. The caches keep views of its arrays (e.g. the incidence matrices,
+		the animations, the tetrahedra and the statistics), which mustn't be used after the segments are unmapped,
+		so they are dropped first and the running extraction of the iso-surfaces is waited for.
+		"""
+		self._close_iso_surfaces(True)
+		self._cell_to_point.clear()
+		self._animations.clear()
+		self._tetrahedra.clear()
+		self._statistics = None
+		self._region_statistics = None
+		self._region_key = None
+		self._threshold_models.clear()
+		self._cell_ranks = None
+		self._ranked_materials.clear()
+		self._bvhs.clear()
+		self._hotspot_cache.clear()
+		self._result_cache.clear()
+		self.mesh = None
+		if self._store is not None:
+			self._store.close()
+			self._store = None
+
+
 	def remove(self):
 		"""
 		Reset ParaView and Vizard stuff to default.
 		"""
 		self.origin_node.remove()
-		for filter in reversed(self._filters):
+		self._release_store()
+		for filter in reversed(self._model_filters + self._filters):
 			pv.Delete(filter)
 		pv.servermanager.ProxyManager().UnRegisterProxies()
 		pv.Disconnect()
-		pv.Connect()
+		connect()
 
 
 
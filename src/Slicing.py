@@ -0,0 +1,207 @@
+﻿"""
+Copyright 2018 Andreas Wundlechner
+
+GNU Lesser General Public License Usage
+This file has to be used under the terms of the GNU Lesser
+General Public License version 3 or later as published by the Free Software
+Foundation and appearing in the file LICENSE included in the
+packaging of this file. Please review the following information to
+ensure the GNU Lesser General Public License version 3 requirements
+will be met: https://www.gnu.org/licenses/lgpl-3.0.html.
+"""
+
+"""
+This file contains the cross-sections and iso-surfaces of the volume cells.
+The cells are divided into tetrahedrons (see Processing.get_tetrahedra()) and cut by marching tetrahedrons:
+Every tetrahedron is classified by the signs of a function at its four points and the cut is interpolated linearly on its edges.
+All tetrahedrons are handled at once with NumPy, so a cut through a whole material needs only a few array operations.
+This file doesn't depend on Vizard.
+"""
+
+import collections
+from concurrent.futures import ThreadPoolExecutor
+import numpy
+import config as cfg
+import Processing
+
+
+def _build_cases():
+	"""
+	Returns the triangles of the 16 cases (bit i: point i is above the iso value) as (16, 2, 3, 2) array.
+	Every triangle has three edges given by their two points. Unused triangles are -1.
+	"""
+	cases = numpy.full((16, 2, 3, 2), -1, dtype=numpy.int64)
+	for case in range(1, 15):
+		above = [i for i in range(4) if case & (1 << i)]
+		below = [i for i in range(4) if not case & (1 << i)]
+		if len(above) == 2:
+			# Quad, which is divided into two triangles
+			a, b = above
+			c, d = below
+			cases[case, 0] = [(a, c), (a, d), (b, d)]
+			cases[case, 1] = [(a, c), (b, d), (b, c)]
+		else:
+			single = above[0] if len(above) == 1 else below[0]
+			cases[case, 0] = [(single, other) for other in range(4) if other != single]
+	return cases
+
+_CASES = _build_cases()
+
+
+def contour_tetrahedra(points, tetrahedra, values, isovalue=0.0):
+	"""
+	Returns the surface, where the point values are equal to the iso value, as (t, 3, 3) triangle coordinates
+	and the index of the tetrahedron for every triangle.
+	The triangles face in the direction of growing values.
+	"""
+	# Classify the points first. The four bytes of a tetrahedron are read as one integer, which is 0 or 0x01010101,
+	# if the tetrahedron isn't cut, so only the cut tetrahedrons are gathered completely.
+	point_above = (values > isovalue).view(numpy.uint8)
+	packed = point_above[tetrahedra].view(numpy.uint32).ravel()
+	cut = numpy.flatnonzero((packed != 0) & (packed != 0x01010101))
+	triangles = _CASES[point_above[tetrahedra[cut]].dot([1, 2, 4, 8])]
+	used = triangles[:, :, 0, 0] >= 0
+	owners = cut[numpy.nonzero(used)[0]]
+	edges = triangles[used]
+	corners = tetrahedra[owners]
+	shifted = values[corners] - isovalue
+	corners = points[corners]
+	# Linear interpolation on the edges. The first point of every edge is above, the second one isn't, so they are different.
+	rows = numpy.arange(len(owners))[:, numpy.newaxis]
+	start = shifted[rows, edges[:, :, 0]]
+	end = shifted[rows, edges[:, :, 1]]
+	first = corners[rows, edges[:, :, 0]]
+	positions = first + (start / (start - end))[:, :, numpy.newaxis] * (corners[rows, edges[:, :, 1]] - first)
+	# The direction from the points below to the points above
+	above = shifted > 0
+	counts = above.sum(axis=1, keepdims=True)
+	direction = numpy.einsum('ij,ijk->ik', numpy.where(above, 1.0 / counts, -1.0 / (4 - counts)), corners)
+	normals = numpy.cross(positions[:, 1] - positions[:, 0], positions[:, 2] - positions[:, 0])
+	flip = (normals * direction).sum(axis=1) < 0
+	positions[flip] = positions[flip][:, [0, 2, 1]]
+	return positions, owners
+
+
+
+class Tetrahedra:
+	"""
+	The tetrahedrons of a set of cells (e.g. a material), which can be cut by planes and iso-surfaces.
+	The division into tetrahedrons and the points of the cells are prepared once, so a new plane (e.g. while it is dragged)
+	only needs the distances of the points to the plane, which are one matrix product, and contour_tetrahedra().
+	"""
+	def __init__(self, mesh, cell_ids):
+		tetrahedra, self.cells = Processing.get_tetrahedra(mesh, cell_ids)
+		# Only the points of the cells are used. The tetrahedrons get indices into these points.
+		self.point_ids, inverse = numpy.unique(tetrahedra, return_inverse=True)
+		self.tetrahedra = inverse.reshape(-1, 4)
+		self.points = mesh.points[self.point_ids].astype(numpy.float64)
+		self._original_cell_ids = mesh.get_original_cell_ids()[self.cells]
+
+
+	def get_distances(self, origin, normal):
+		"""
+		Returns the signed distance of every point to the plane (positive in the direction of the normal).
+		"""
+		normal = numpy.asarray(normal, dtype=numpy.float64)
+		normal = normal / numpy.linalg.norm(normal)
+		return self.points.dot(normal) - numpy.dot(origin, normal)
+
+
+	def slice(self, origin, normal, values, minimum, maximum):
+		"""
+		Returns the cross-section with the plane as surface buffers (see Processing.Geometry_Buffers).
+		Every triangle gets the color of its cell. values: one value per cell of the mesh, minimum and maximum are the color range.
+		"""
+		positions, owners = contour_tetrahedra(self.points, self.tetrahedra, self.get_distances(origin, normal))
+		return _section_buffers(positions, numpy.asarray(values)[self.cells[owners]], minimum, maximum, self._original_cell_ids[owners])
+
+
+	def contour(self, point_values, isovalue, minimum, maximum):
+		"""
+		Returns the iso-surface of the values (one per point of the mesh) as surface buffers in the color of the iso value.
+		The values are interpolated linearly in the tetrahedrons.
+		"""
+		positions, owners = contour_tetrahedra(self.points, self.tetrahedra, numpy.asarray(point_values)[self.point_ids], isovalue)
+		return _section_buffers(positions, numpy.full(len(owners), float(isovalue)), minimum, maximum, self._original_cell_ids[owners])
+
+
+
+class Iso_Surfaces:
+	"""
+	Extracts the iso-surfaces of several materials in a background thread and keeps the surfaces of the last iso values.
+	The iso values are rounded to levels, so sweeping back and forth reuses the extracted surfaces.
+	tetrahedra: material -> Tetrahedra, point_values: material -> values at the points of the mesh (e.g. averaged cell values)
+	minimum and maximum are the color range, which is divided into the levels.
+	"""
+	def __init__(self, tetrahedra, point_values, minimum, maximum, levels=None, capacity=None):
+		self._tetrahedra = tetrahedra
+		self._point_values = point_values
+		self.minimum = minimum
+		self.maximum = maximum
+		self.levels = max(1, cfg.iso_surface_levels if levels is None else levels)
+		self.capacity = max(1, cfg.iso_surface_cache_size if capacity is None else capacity)
+		self._executor = ThreadPoolExecutor(max_workers=1)
+		# level -> future of material -> buffers, the last requested level at the end
+		self._futures = collections.OrderedDict()
+
+
+	def get_level(self, fraction):
+		"""
+		Returns the nearest level of a fraction of the color range.
+		"""
+		return min(max(int(round(fraction * self.levels)), 0), self.levels)
+
+
+	def get_isovalue(self, level):
+		return self.minimum + (self.maximum - self.minimum) * level / float(self.levels)
+
+
+	def request(self, level):
+		"""
+		Extract the iso-surfaces of the level in the background, if they aren't cached.
+		"""
+		if level in self._futures:
+			self._futures.move_to_end(level)
+			return
+		self._futures[level] = self._executor.submit(self._extract, self.get_isovalue(level))
+		while len(self._futures) > self.capacity:
+			# Extractions, which didn't start yet, aren't needed anymore
+			self._futures.popitem(last=False)[1].cancel()
+
+
+	def _extract(self, isovalue):
+		return dict((material, tetrahedra.contour(self._point_values[material], isovalue, self.minimum, self.maximum))
+			for material, tetrahedra in self._tetrahedra.items())
+
+
+	def get(self, level):
+		"""
+		Returns material -> surface buffers of the level, if they are extracted, otherwise None.
+		Errors of the extraction are raised here.
+		"""
+		future = self._futures.get(level)
+		if future is None or not future.done():
+			return None
+		return future.result()
+
+
+	def close(self, wait=False):
+		"""
+		Stop the extraction. wait: wait for the running extraction, e.g. before the arrays of the tetrahedra are released.
+		"""
+		for future in self._futures.values():
+			future.cancel()
+		self._executor.shutdown(wait=wait)
+		self._futures.clear()
+
+
+
+def _section_buffers(positions, values, minimum, maximum, cell_ids):
+	"""
+	Create the surface buffers of (t, 3, 3) triangle coordinates with one value per triangle.
+	"""
+	vertices = positions.reshape(-1, 3).astype(numpy.float32)
+	normals = numpy.repeat(Processing.calculate_normals(vertices.reshape(-1, 3, 3)), 3, axis=0)
+	colors = numpy.repeat(Processing.get_colors(minimum, maximum, values), 3, axis=0)
+	indices = numpy.arange(len(vertices)).reshape(-1, 3)
+	return Processing.Geometry_Buffers("triangles", vertices, colors, normals, indices, cell_ids, None, values)
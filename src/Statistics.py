@@ -0,0 +1,223 @@
+﻿"""
+Copyright 2018 Andreas Wundlechner
+
+GNU Lesser General Public License Usage
+This file has to be used under the terms of the GNU Lesser
+General Public License version 3 or later as published by the Free Software
+Foundation and appearing in the file LICENSE included in the
+packaging of this file. Please review the following information to
+ensure the GNU Lesser General Public License version 3 requirements
+will be met: https://www.gnu.org/licenses/lgpl-3.0.html.
+"""
+
+"""
+This file contains the statistics of the coloring array per material: histogram, percentiles, mean and maximum.
+They are calculated for all materials at once with one sort per material and a few bincounts and kept until the values change,
+e.g. for clamping the color range to percentiles and for the histogram panel.
+The Region_Statistics of the displayed cells (e.g. after a clip) are updated by adding and subtracting the changed cells.
+This file doesn't depend on Vizard.
+"""
+
+import numpy
+import config as cfg
+
+
+class Material_Statistics:
+	"""
+	Statistics of the values of a material (or of several materials, see combine()).
+	edges: bin edges of the histogram, which are the same for every material, so the histograms can be compared and added
+	histogram: number of values per bin
+	quantiles: values at the percentiles 0, 100/n, ..., 100 (None for combined statistics)
+	"""
+	def __init__(self, count, minimum, maximum, mean, edges, histogram, quantiles=None):
+		self.count = count
+		self.minimum = minimum
+		self.maximum = maximum
+		self.mean = mean
+		self.edges = edges
+		self.histogram = histogram
+		self.quantiles = quantiles
+
+
+	def get_percentile(self, percentile):
+		"""
+		Returns the value at the percentile (0 to 100), interpolated between the stored quantiles.
+		"""
+		return float(numpy.interp(percentile, numpy.linspace(0, 100, len(self.quantiles)), self.quantiles))
+
+
+	def describe(self):
+		text = "{0} cells, mean {1:.4g}, max {2:.4g}".format(self.count, self.mean, self.maximum)
+		if self.quantiles is not None:
+			text += ", 99 % {0:.4g}".format(self.get_percentile(99))
+		return text
+
+
+
+def compute_statistics(values, materials, bins=None, quantiles=None):
+	"""
+	Returns material -> Material_Statistics and None -> Material_Statistics of all cells.
+	values: one value per cell, materials: material -> cell ids
+	The histograms have bins bins over the range of all cells. quantiles is the number of steps between the stored percentiles.
+	"""
+	bins = cfg.statistics_bins if bins is None else bins
+	quantiles = cfg.statistics_quantiles if quantiles is None else quantiles
+	keys = sorted(materials.keys())
+	groups = [numpy.asarray(values)[numpy.asarray(materials[key], dtype=numpy.int64)] for key in keys]
+	keys.append(None)
+	groups.append(numpy.concatenate(groups) if groups else numpy.zeros(0))
+	counts = numpy.array([len(group) for group in groups])
+	starts = numpy.concatenate([[0], numpy.cumsum(counts)[:-1]])
+	group_ids = numpy.repeat(numpy.arange(len(groups)), counts)
+	# Every group is a sorted slice
+	data = numpy.concatenate([numpy.sort(group.astype(numpy.float64)) for group in groups])
+	filled = numpy.maximum(counts, 1)
+	# Quantiles of every group with linear interpolation between the sorted values
+	positions = (filled - 1)[:, numpy.newaxis] * numpy.linspace(0, 1, quantiles + 1)
+	lower = numpy.floor(positions).astype(numpy.int64)
+	upper = numpy.minimum(lower + 1, filled[:, numpy.newaxis] - 1)
+	weights = positions - lower
+	padded = numpy.concatenate([data, [numpy.nan]])
+	index = lambda offsets: numpy.where(counts[:, numpy.newaxis] > 0, starts[:, numpy.newaxis] + offsets, len(data))
+	group_quantiles = padded[index(lower)] * (1 - weights) + padded[index(upper)] * weights
+	means = numpy.bincount(group_ids, weights=data, minlength=len(groups)) / filled
+	# One histogram per group with the same edges
+	if len(data):
+		edges = numpy.linspace(data.min(), data.max(), bins + 1)
+	else:
+		edges = numpy.linspace(0, 1, bins + 1)
+	width = edges[-1] - edges[0]
+	bin_ids = numpy.zeros(len(data), dtype=numpy.int64) if width == 0 else numpy.minimum(((data - edges[0]) / width * bins).astype(numpy.int64), bins - 1)
+	histograms = numpy.bincount(group_ids * bins + bin_ids, minlength=len(groups) * bins).reshape(len(groups), bins)
+	return dict((key, Material_Statistics(int(counts[i]), group_quantiles[i, 0], group_quantiles[i, -1], means[i], edges, histograms[i], group_quantiles[i]))
+		for i, key in enumerate(keys))
+
+
+def combine(statistics):
+	"""
+	Returns the Material_Statistics of several materials with the same histogram edges (without percentiles).
+	"""
+	statistics = [current for current in statistics if current.count > 0]
+	if not statistics:
+		return None
+	count = sum(current.count for current in statistics)
+	return Material_Statistics(count, min(current.minimum for current in statistics), max(current.maximum for current in statistics),
+		sum(current.mean * current.count for current in statistics) / count, statistics[0].edges,
+		numpy.sum([current.histogram for current in statistics], axis=0))
+
+
+
+class Region_Statistics:
+	"""
+	Count, volume, maximum, mean and volume weighted mean of the values of a region of cells (e.g. the displayed cells).
+	The region is changed by adding and removing cells (see add() and remove()), which only adds and subtracts their sums.
+	The maximum is found in the cells sorted by value once: it only moves down this order, while cells are removed.
+	The same order gives the cells between two values (see get_cells_between()), e.g. for a new threshold.
+	values and volumes: one per cell (see Processing.get_cell_volumes())
+	"""
+	def __init__(self, values, volumes):
+		self.values = numpy.asarray(values, dtype=numpy.float64)
+		self.volumes = numpy.asarray(volumes, dtype=numpy.float64)
+		self._weighted = self.values * self.volumes
+		self.mask = numpy.zeros(len(self.values), dtype=bool)
+		self.count = 0
+		self.volume = 0.0
+		self._sum = 0.0
+		self._weighted_sum = 0.0
+		# Cells sorted by descending value, the negative values in that order (ascending for searchsorted()),
+		# the position of every cell in that order and the position of the maximum of the region
+		self._order = numpy.argsort(-self.values, kind='stable')
+		self._sorted = -self.values[self._order]
+		self._rank = numpy.empty(len(self.values), dtype=numpy.int64)
+		self._rank[self._order] = numpy.arange(len(self.values))
+		self._top = len(self.values)
+		# ... for measuring the incremental updates
+		self.statistics = {'updates': 0, 'changed_cells': 0}
+
+
+	def set_mask(self, mask):
+		"""
+		Change the region to the cells, where mask is True. This compares every cell, add() and remove() only the given ones.
+		"""
+		mask = numpy.asarray(mask, dtype=bool)
+		self.remove(numpy.flatnonzero(self.mask & ~mask))
+		self.add(numpy.flatnonzero(mask & ~self.mask))
+
+
+	def add(self, cells):
+		"""
+		Add the cells to the region. Cells, which are already in the region, are skipped.
+		"""
+		cells = numpy.asarray(cells, dtype=numpy.int64)
+		cells = numpy.unique(cells[~self.mask[cells]])
+		self._change(cells, 1)
+		if len(cells):
+			self._top = min(self._top, int(self._rank[cells].min()))
+
+
+	def remove(self, cells):
+		"""
+		Remove the cells from the region. Cells, which aren't in the region, are skipped.
+		"""
+		cells = numpy.asarray(cells, dtype=numpy.int64)
+		cells = numpy.unique(cells[self.mask[cells]])
+		self._change(cells, -1)
+		# The maximum moves down the order to the next cell of the region
+		chunk = 4096
+		while self._top < len(self._order) and not self.mask[self._order[self._top]]:
+			remaining = self.mask[self._order[self._top:self._top + chunk]]
+			self._top += int(numpy.argmax(remaining)) if remaining.any() else len(remaining)
+			chunk *= 2
+
+
+	def _change(self, cells, sign):
+		"""
+		Add (sign 1) or subtract (sign -1) the sums of the cells.
+		"""
+		self.count += sign * len(cells)
+		self.volume += sign * self.volumes[cells].sum()
+		self._sum += sign * self.values[cells].sum()
+		self._weighted_sum += sign * self._weighted[cells].sum()
+		if self.count == 0:
+			# No rounding errors of the additions remain
+			self.volume = self._sum = self._weighted_sum = 0.0
+		self.mask[cells] = sign > 0
+		self.statistics['updates'] += 1
+		self.statistics['changed_cells'] += len(cells)
+
+
+	def get_cells_between(self, low, high):
+		"""
+		Returns the cells with low <= value < high (None: no bound), found in the sorted order without comparing every cell.
+		"""
+		start = 0 if high is None else numpy.searchsorted(self._sorted, -high, side='right')
+		end = len(self._sorted) if low is None else numpy.searchsorted(self._sorted, -low, side='right')
+		return self._order[start:end]
+
+
+	def get_maximum(self):
+		"""
+		Returns the maximum value and its cell (None, None for an empty region).
+		"""
+		if self._top >= len(self._order):
+			return None, None
+		cell = int(self._order[self._top])
+		return float(self.values[cell]), cell
+
+
+	def get_mean(self):
+		return self._sum / self.count if self.count else None
+
+
+	def get_weighted_mean(self):
+		"""
+		Returns the mean weighted by the volumes of the cells.
+		"""
+		return self._weighted_sum / self.volume if self.volume > 0 else None
+
+
+	def describe(self):
+		if self.count == 0:
+			return "Empty region"
+		return "{0} cells, volume {1:.4g}, max {2:.4g}, mean {3:.4g}, volume weighted mean {4:.4g}".format(
+			self.count, self.volume, self.get_maximum()[0], self.get_mean(), self.get_weighted_mean())
@@ -0,0 +1,261 @@
+﻿"""
+Copyright 2018 Andreas Wundlechner
+
+GNU Lesser General Public License Usage
+This file has to be used under the terms of the GNU Lesser
+General Public License version 3 or later as published by the Free Software
+Foundation and appearing in the file LICENSE included in the
+packaging of this file. Please review the following information to
+ensure the GNU Lesser General Public License version 3 requirements
+will be met: https://www.gnu.org/licenses/lgpl-3.0.html.
+"""
+
+"""
+This file contains the playback of time series (numbered files like result_001.vtk, result_002.vtk, ...).
+The steps of a series have the same cells, so only their arrays are loaded (see Simulation_Data.apply_step()).
+The Prefetcher loads the steps around the displayed one in background threads into a ring buffer with a fixed number of slots.
+The Playback advances the time with the target step rate and waits, if the prefetching falls behind.
+Between two steps the values (and moved points) can be blended linearly, so coarse series play smoothly.
+This file doesn't depend on Vizard.
+"""
+
+import os
+import re
+import time as time_module
+from concurrent.futures import ThreadPoolExecutor
+import config as cfg
+import Processing
+
+
+# Number at the end of the file name (before the extension)
+_NUMBER = re.compile(r'^(.*?)(\d+)(\.[^.]+)$')
+
+
+def find_sequence(filename):
+	"""
+	Returns the sorted list of the files of the series, which contains filename.
+	Files of a series only differ in the number at the end of the name. A file without a number is a series with one step.
+	"""
+	directory, name = os.path.split(os.path.abspath(filename))
+	match = _NUMBER.match(name)
+	if match is None:
+		return [os.path.abspath(filename)]
+	prefix, number, extension = match.groups()
+	steps = []
+	for other in os.listdir(directory):
+		other_match = _NUMBER.match(other)
+		if other_match is not None and other_match.group(1) == prefix and other_match.group(3).lower() == extension.lower():
+			steps.append((int(other_match.group(2)), os.path.join(directory, other)))
+	return [path for number, path in sorted(steps)]
+
+
+
+class Step_Data:
+	"""
+	Arrays of one step of a series.
+	points: (n, 3) coordinates of the points
+	cell_data/point_data: dicts with the name and the array of the data
+	"""
+	def __init__(self, index, filename, points, cell_data, point_data):
+		self.index = index
+		self.filename = filename
+		self.points = points
+		self.cell_data = cell_data
+		self.point_data = point_data
+
+
+	def get_number_of_cells(self):
+		for values in self.cell_data.values():
+			return len(values)
+		return 0
+
+
+
+def load_step(index, filename):
+	"""
+	Read the arrays of a step without ParaView (so it can run in a background thread).
+	"""
+	mesh = Processing.Mesh.from_vtk(Processing.read_file(filename))
+	return Step_Data(index, filename, mesh.points, mesh.cell_data, mesh.point_data)
+
+
+
+class Prefetcher:
+	"""
+	Ring buffer with the steps around the displayed step, which are loaded in background threads.
+	Step i is kept in slot i % capacity. The window of requested steps is never longer than the capacity,
+	so loading a new step replaces the step, which is furthest away from the displayed one.
+	"""
+	def __init__(self, files, capacity=None, workers=None, load=load_step):
+		self.files = files
+		self.capacity = max(2, cfg.time_series_buffer if capacity is None else capacity)
+		self._load = load
+		self._executor = ThreadPoolExecutor(max_workers=cfg.time_series_workers if workers is None else workers)
+		# slot -> (step, future)
+		self._slots = [None] * self.capacity
+
+
+	def request(self, center, direction=1):
+		"""
+		Load the steps around center: one step against the direction and the rest of the buffer in the direction.
+		"""
+		behind = 1
+		ahead = self.capacity - 1 - behind
+		steps = [center] + [center + direction * i for i in range(1, ahead + 1)] + [center - direction * i for i in range(1, behind + 1)]
+		for step in steps:
+			if 0 <= step < len(self.files):
+				self._submit(step)
+
+
+	def _submit(self, step):
+		"""
+		Load the step into its slot, if it isn't there already.
+		"""
+		slot = step % self.capacity
+		if self._slots[slot] is not None:
+			if self._slots[slot][0] == step:
+				return
+			# Steps, which didn't start yet, aren't needed anymore
+			self._slots[slot][1].cancel()
+		self._slots[slot] = (step, self._executor.submit(self._load, step, self.files[step]))
+
+
+	def get(self, step):
+		"""
+		Returns the Step_Data of the step, if it is loaded, otherwise None.
+		Errors of the loading are raised here.
+		"""
+		entry = self._slots[step % self.capacity]
+		if entry is None or entry[0] != step or not entry[1].done():
+			return None
+		return entry[1].result()
+
+
+	def get_loaded_steps(self):
+		"""
+		Returns the sorted list of the loaded steps.
+		"""
+		return sorted(step for step, future in filter(None, self._slots) if future.done() and not future.cancelled())
+
+
+	def close(self):
+		for entry in filter(None, self._slots):
+			entry[1].cancel()
+		self._executor.shutdown(wait=False)
+		self._slots = [None] * self.capacity
+
+
+
+class Playback:
+	"""
+	Clock of the playback. Call update() every frame with the elapsed time.
+	The time advances with the rate (steps per second) while playing. With interpolation the time between two steps
+	is displayed as a blend of both (see Simulation_Data.apply_step()), otherwise the step before the time.
+	If the needed steps aren't loaded yet, the time waits for them (stall), so no step is skipped.
+	Stalls are counted in statistics and reported by update().
+	"""
+	def __init__(self, prefetcher, step, rate=None, interpolate=None):
+		self.prefetcher = prefetcher
+		self.rate = cfg.time_series_rate if rate is None else rate
+		self.interpolate = cfg.time_series_interpolation if interpolate is None else interpolate
+		self.playing = False
+		# Wanted and displayed time in steps
+		self.time = float(step)
+		self.shown = float(step)
+		self._direction = 1
+		self._stall_start = None
+		self.statistics = {'frames': 0, 'stalls': 0, 'stall_seconds': 0.0, 'max_stall_seconds': 0.0}
+		self.prefetcher.request(step, self._direction)
+
+
+	def get_step_count(self):
+		return len(self.prefetcher.files)
+
+
+	def toggle_play(self):
+		"""
+		Play or pause. Playing at the last step starts from the beginning.
+		"""
+		self.playing = not self.playing
+		self._direction = 1
+		if self.playing and self.time >= self.get_step_count() - 1:
+			self.time = 0.0
+		self.prefetcher.request(int(self.time), self._direction)
+
+
+	def scrub(self, steps):
+		"""
+		Move the time by steps (may be a fraction, e.g. from the trackpad). Pauses the playback.
+		"""
+		self.playing = False
+		self._direction = 1 if steps > 0 else -1
+		self.time = min(max(self.time + steps, 0.0), self.get_step_count() - 1.0)
+		self.prefetcher.request(int(self.time), self._direction)
+
+
+	def _get_display_time(self, time):
+		return time if self.interpolate else float(int(time))
+
+
+	def _get_frame(self, time):
+		"""
+		Returns (step before, step after or None, fraction) of the time or None, if the steps aren't loaded yet.
+		"""
+		step = int(time)
+		fraction = time - step
+		before = self.prefetcher.get(step)
+		if before is None:
+			return None
+		if fraction < 1e-6:
+			return before, None, 0.0
+		after = self.prefetcher.get(step + 1)
+		if after is None:
+			return None
+		return before, after, fraction
+
+
+	def update(self, elapsed):
+		"""
+		Advance the playback by elapsed seconds.
+		Returns (frame, message): frame is (Step_Data before, Step_Data after or None, fraction) of the time,
+		which should be displayed now, or None if nothing changed. message reports a stall or is None.
+		"""
+		if self.playing:
+			time = self.time + elapsed * self.rate
+			if time >= self.get_step_count() - 1:
+				time = self.get_step_count() - 1.0
+				self.playing = False
+			self.prefetcher.request(int(time), self._direction)
+			if self._get_frame(self._get_display_time(time)) is None:
+				# The prefetching is behind the playback, so the time waits
+				if self._stall_start is None:
+					self._stall_start = time_module.time()
+				self.playing = True
+				return None, None
+			self.time = time
+		display_time = self._get_display_time(self.time)
+		if display_time == self.shown:
+			return None, None
+		frame = self._get_frame(display_time)
+		if frame is None:
+			# Wait for the scrubbed steps
+			return None, None
+		message = None
+		if self._stall_start is not None:
+			stall = time_module.time() - self._stall_start
+			self._stall_start = None
+			self.statistics['stalls'] += 1
+			self.statistics['stall_seconds'] += stall
+			self.statistics['max_stall_seconds'] = max(self.statistics['max_stall_seconds'], stall)
+			message = "Prefetching is behind: waited {0:.0f} ms for step {1} (rate {2} steps/s, {3} stalls so far)".format(
+				stall * 1000, int(display_time) + 1, self.rate, self.statistics['stalls'])
+		self.shown = display_time
+		self.statistics['frames'] += 1
+		return frame, message
+
+
+	def describe(self):
+		"""
+		Returns a readable state of the playback.
+		"""
+		return "Step {0:.1f}/{1} ({2})".format(self.shown + 1, self.get_step_count(), "playing" if self.playing else "paused")
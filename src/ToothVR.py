@@ -15,6 +15,7 @@ import viz
 import vizinput
 import vizshape
 import vizconnect
+import vizact
 import steamvr
 
 # Start control config file to initialize HMDs, trackers, controller and more.
@@ -29,6 +30,14 @@ import Simulation_Data
 from GrabAndZoom import GrabAndZoom
 import Controls
 import HelpFunctions
+import Catalog
+import FileChooser
+import QualityGovernor
+import TimeSeries
+import Processing
+
+# Width and height of the bars of the histogram panel in meters
+_HISTOGRAM_SIZE = (.2, .1)
 
 
 class ToothVR(viz.EventClass):
@@ -45,24 +54,50 @@ class ToothVR(viz.EventClass):
 		# ... for stressindicator function
 		self._stressindicator_text = None
 		self._stressindicator = None
+		# ... for the pointer, which picks the cell hit by a ray from the right controller
+		self._pointer = None
+		self._pointer_beam = None
+		self._pointer_marker = None
+		self._pointer_text = None
 		# ... for the clipping function
 		self._clip_plane_present = False
 		self._clip_plane = None
 		# ... for the environment
 		self._room = None
 		self._ground = None
+		# ... for the file selection in VR
+		self._file_chooser = None
+		# ... for the adaptive quality
+		self._quality_governor = None
+		# ... for visiting the hotspots
+		self._hotspots = None
+		self._hotspot_index = -1
+		# ... for the playback of time series
+		self._playback = None
+		# ... for the histogram panel: the panel, its bars and text and the displayed statistics
+		self._histogram = None
+		self._histogram_bars = None
+		self._histogram_text = None
+		self._histogram_key = None
 		
 		# Setup the different parts
 		r_tracker = vizconnect.getRawTracker('r_hand_tracker')
 		l_tracker = vizconnect.getRawTracker('l_hand_tracker')
 		self._grab_and_zoom = GrabAndZoom([r_tracker, l_tracker])
 		self._setup_controls()
-		# Stressindicator would be useless without a tracked controller
+		if cfg.use_file_chooser:
+			self._file_chooser = FileChooser.File_Chooser(self.load_file)
+		# Stressindicator and pointer would be useless without a tracked controller
 		if cfg.control_scheme == "steamvr":
 			self._setup_stressindicator()
+			self._setup_pointer()
 		self._setup_clip_plane()
+		self._setup_histogram()
 		self._setup_environment()
 		self._setup_vizard_configuration()
+		if cfg.adaptive_quality:
+			self._quality_governor = QualityGovernor.Quality_Governor()
+		self.callback(viz.UPDATE_EVENT, self._on_update)
 		
 		
 	def _setup_controls(self):
@@ -73,11 +108,24 @@ class ToothVR(viz.EventClass):
 		self.callback(Controls.CONTROL_NEW_FILE, self.select_file)
 		self.callback(Controls.CONTROL_CLIP, self.clip_button_press)
 		self.callback(Controls.CONTROL_TOGGLE_ENVIRONMENT, self.switch_environment)
-		self.callback(Controls.CONTROL_CLOUD_INCREASE, lambda : self._simulation_data.set_cloud_point_size(self._simulation_data.get_cloud_point_size()+1))
-		self.callback(Controls.CONTROL_CLOUD_DECREASE, lambda : self._simulation_data.set_cloud_point_size(self._simulation_data.get_cloud_point_size()-1))
+		self.callback(Controls.CONTROL_CLOUD_INCREASE, lambda : self.change_cloud_point_size(1))
+		self.callback(Controls.CONTROL_CLOUD_DECREASE, lambda : self.change_cloud_point_size(-1))
 		self.callback(Controls.CONTROL_TOGGLE_STRESSINDICATOR, self.toggle_stressindicator)
 		self.callback(Controls.CONTROL_HAND_GRAB, self._grab_and_zoom.grab)
 		self.callback(Controls.CONTROL_HAND_RELEASE, self._grab_and_zoom.ungrab)
+		self.callback(Controls.CONTROL_NEXT_HOTSPOT, self.next_hotspot)
+		self.callback(Controls.CONTROL_PLAY_PAUSE, self.toggle_play)
+		self.callback(Controls.CONTROL_SCRUB, self.scrub)
+		self.callback(Controls.CONTROL_CLIP_BOX, self.toggle_clip_box)
+		self.callback(Controls.CONTROL_CLIP_MODE, self.toggle_clip_mode)
+		self.callback(Controls.CONTROL_CLIP_CLEAR, self.clear_clip)
+		self.callback(Controls.CONTROL_CLIP_UNDO, self.undo_clip)
+		self.callback(Controls.CONTROL_CLIP_REDO, self.redo_clip)
+		self.callback(Controls.CONTROL_SLICE, self.toggle_slice)
+		self.callback(Controls.CONTROL_ISO_MODE, self.toggle_iso_mode)
+		self.callback(Controls.CONTROL_ISO, self.change_iso_value)
+		self.callback(Controls.CONTROL_COLOR_CLAMP, self.toggle_color_clamp)
+		self.callback(Controls.CONTROL_TOGGLE_HISTOGRAM, self.toggle_histogram)
 		
 		
 		
@@ -105,6 +153,33 @@ class ToothVR(viz.EventClass):
 		self._stressindicator.visible(False)
 
 
+	def _setup_pointer(self):
+		"""
+		Setup all objects for the pointer: a beam from the right controller and a marker with a text at the hit point.
+		"""
+		# Group, which follows the right controller. The beam points in its z direction.
+		self._pointer = viz.addGroup()
+		viz.link(vizconnect.getRawTracker('r_hand_tracker'), self._pointer)
+		viz.startLayer(viz.LINES)
+		viz.vertexColor(viz.YELLOW)
+		viz.vertex(0,0,0)
+		viz.vertex(0,0,1)
+		self._pointer_beam = viz.endLayer()
+		self._pointer_beam.setParent(self._pointer)
+		self._pointer_beam.disable(viz.LIGHTING)
+		# Marker with the picked value
+		self._pointer_marker = vizshape.addSphere(radius=0.005, color=viz.YELLOW)
+		self._pointer_text = viz.addText3D('', parent=self._pointer_marker)
+		self._pointer_text.alignment(viz.ALIGN_LEFT_BOTTOM)
+		self._pointer_text.color(viz.YELLOW)
+		self._pointer_text.setScale([.03,.03,.03])
+		self._pointer_text.setPosition([.01,.01,0])
+		self._pointer_text.billboard(viz.BILLBOARD_VIEW)
+		# Hide the objects until the pointer gets used
+		self._pointer.visible(False)
+		self._pointer_marker.visible(False)
+
+
 	def _setup_clip_plane(self):
 		"""
 		Create a plane with a sissors logo, a grid and a grey back.
@@ -125,6 +200,27 @@ class ToothVR(viz.EventClass):
 		self._clip_plane.visible(False)
 
 
+	def _setup_histogram(self):
+		"""
+		Create the histogram panel: bars of the coloring array of the displayed materials and a text with their statistics.
+		The panel follows the left controller (or stands next to the model without SteamVR).
+		"""
+		self._histogram = viz.addGroup()
+		panel_parent = viz.addGroup()
+		self._histogram.setParent(panel_parent)
+		if cfg.control_scheme == "steamvr":
+			self._histogram.setPosition([-.1,.02,.05], viz.ABS_PARENT)
+			viz.link(vizconnect.getRawTracker('l_hand_tracker'), panel_parent)
+		else:
+			self._histogram.setPosition([-.8,1,0])
+		self._histogram_text = viz.addText3D('', parent=self._histogram)
+		self._histogram_text.alignment(viz.ALIGN_LEFT_BOTTOM)
+		self._histogram_text.setScale([.01,.01,.01])
+		self._histogram_text.setPosition([0,_HISTOGRAM_SIZE[1]+.01,0])
+		# Hide the panel until it gets used
+		self._histogram.visible(False)
+
+
 	def _setup_environment(self):
 		"""
 		Setup all objects to create the environments. Environments can be switched with the R key on the keyboard.
@@ -205,42 +301,179 @@ class ToothVR(viz.EventClass):
 		
 	def select_file(self):
 		"""
-		Select a file. If one is already loaded, it gets replaced.
+		Select a file. If one is already loaded, it gets replaced (see load_file()).
+		The file chooser in VR is displayed. If it is already displayed, the file dialog is opened instead.
 		"""
-		# Delete old data if available
-		if self._simulation_data:
-			self._simulation_data.remove()
+		if self._file_chooser is not None and not self._file_chooser.is_visible():
+			self._file_chooser.show()
+			return
 		# Find the new file
 		file = vizinput.fileOpen(title = "Please choose your file containing the simulation data.", filter=[('VTK Files','*.vtk')], directory=cfg.standard_directory)
-		# If no file is selected close the application
 		if file == '':
-			viz.quit()
+			# If no file is selected close the application (the file chooser stays open otherwise)
+			if self._file_chooser is None:
+				viz.quit()
 			return
-		# Load data
-		self._simulation_data = Simulation_Data.Simulation_Data(file)
+		# Warn if the file is too big
+		entry = self._file_chooser.catalog.get_entry(file) if self._file_chooser is not None else Catalog.read_header(file)
+		if not Catalog.fits_in_memory(entry):
+			message = "The file needs about {0}, but only {1} are available. Open it anyway?".format(
+				Catalog.format_bytes(entry['estimated_memory']), Catalog.format_bytes(Catalog.get_available_memory()))
+			if not vizinput.ask(message):
+				return
+		self.load_file(file)
+
+
+	def load_file(self, file):
+		"""
+		Load the file and display it.
+		Another load case of the loaded model only replaces the values (see Simulation_Data.switch_load_case()).
+		"""
+		if self._file_chooser is not None:
+			self._file_chooser.hide()
+		if self._simulation_data:
+			entry = self._file_chooser.catalog.get_entry(file) if self._file_chooser is not None else {}
+			if self._simulation_data.switch_load_case(file, entry.get('cells'), entry.get('points')):
+				print("Switched the load case to {0}".format(file))
+				self._setup_time_series(file)
+				return
+			# Delete old data
+			self._simulation_data.remove()
+			self._simulation_data = None
+		# Load data with the current quality
+		quality = None
+		if self._quality_governor is not None:
+			settings = self._quality_governor.get_settings()
+			quality = (settings['cloud_stride'], settings['surface_level'])
+		self._simulation_data = Simulation_Data.Simulation_Data(file, quality)
+		if self._quality_governor is not None:
+			self._quality_governor.reset()
 		# Update Controls for new data
 		self._grab_and_zoom.set_item(self._simulation_data.origin_node)
 		Controls.set_material_range(self._simulation_data.get_material_range())
 		self.callback(Controls.CONTROL_CYCLE_VIEW_MODE, self._simulation_data.cycle_view_mode)
 		self.callback(Controls.CONTROL_MATERIAL, self._simulation_data.toggle_material)
+		self.callback(Controls.CONTROL_THRESHOLD, self._simulation_data.change_threshold)
+		self.callback(Controls.CONTROL_WARP, self._simulation_data.change_warp_scale)
+		if self._simulation_data.has_displacement():
+			print("The deformation can be exaggerated with the displacement array {0}".format(cfg.displacement_name))
+		statistics = self._simulation_data.get_statistics()
+		if statistics is not None:
+			for material in sorted(key for key in statistics.keys() if key is not None):
+				print("Material {0}: {1}".format(material, statistics[material].describe()))
+		self._setup_time_series(file)
 		# Place model in a nice position
 		self._simulation_data.origin_node.setPosition(0,1,0)
 		self._simulation_data.origin_node.setScale(.1,.1,.1)
 		self._simulation_data.origin_node.setEuler(0,0,-90)
 
 
+	def _setup_time_series(self, file):
+		"""
+		Prepare the playback, if the file is a step of a time series (see TimeSeries.py).
+		"""
+		if self._playback is not None:
+			self._playback.prefetcher.close()
+			self._playback = None
+		files = TimeSeries.find_sequence(file)
+		if len(files) < 2:
+			return
+		self._playback = TimeSeries.Playback(TimeSeries.Prefetcher(files), files.index(os.path.abspath(file)))
+		print("Time series with {0} steps. {1}".format(len(files), self._playback.describe()))
+
+
+	def toggle_play(self):
+		"""
+		Play or pause the time series.
+		"""
+		if self._playback is None:
+			return
+		self._playback.toggle_play()
+		print(self._playback.describe())
+
+
+	def scrub(self, steps):
+		"""
+		Go steps (may be a fraction) forward or back in the time series.
+		"""
+		if self._playback is None:
+			return
+		self._playback.scrub(steps)
+
+
+	def update_time_series(self):
+		"""
+		Advance the playback and display the new time, as soon as its steps are loaded.
+		"""
+		frame, message = self._playback.update(viz.getFrameElapsed())
+		if message is not None:
+			print(message)
+		if frame is None:
+			return
+		step, next_step, fraction = frame
+		if not self._simulation_data.apply_step(step, next_step, fraction):
+			print("{0} doesn't fit to the loaded file".format(step.filename if next_step is None else step.filename + " or " + next_step.filename))
+
+
+	def change_cloud_point_size(self, step):
+		"""
+		Change the point size of the clouds. Selects the previous/next file, while the file chooser is displayed.
+		"""
+		if self._file_chooser is not None and self._file_chooser.is_visible():
+			self._file_chooser.move_selection(-step)
+			return
+		if self._simulation_data is None:
+			return
+		self._simulation_data.set_cloud_point_size(self._simulation_data.get_cloud_point_size()+step)
+
+
 	def toggle_stressindicator(self):
 		"""
-		Activate or deactivate the stressindicator function.
-		Due to performance issues, it should be deactivated most of the time.
+		Cycle through the measuring tools: stressindicator, pointer and none.
+		Due to performance issues (a ParaView probe every frame), the stressindicator should be deactivated most of the time.
+		The pointer uses the picking of the displayed models (see Simulation_Data.pick()) and can stay activated.
 		"""
-		# Toggle visibility and functionality in update loop
+		# Toggle visibility and functionality in update loop (see _on_update())
 		if self._stressindicator.getVisible():
 			self._stressindicator.visible(False)
-			self.callback(viz.UPDATE_EVENT, None)
+			self._pointer.visible(True)
+		elif self._pointer.getVisible():
+			self._pointer.visible(False)
+			self._pointer_marker.visible(False)
 		else:
 			self._stressindicator.visible(True)
-			self.callback(viz.UPDATE_EVENT, self.update_stressindicator)
+
+
+	def _on_update(self, e=None):
+		"""
+		Called every frame.
+		"""
+		if self._stressindicator is not None and self._stressindicator.getVisible() and self._simulation_data is not None:
+			self.update_stressindicator()
+		if self._pointer is not None and self._pointer.getVisible() and self._simulation_data is not None:
+			self.update_pointer()
+		if self._playback is not None and self._simulation_data is not None:
+			self.update_time_series()
+		if self._quality_governor is not None:
+			self.update_quality()
+		if self._clip_plane.getVisible() and self._simulation_data is not None and self._simulation_data.is_slice_mode():
+			self.update_slice()
+		if self._simulation_data is not None and self._simulation_data.is_iso_mode():
+			self._simulation_data.update_iso_surfaces()
+		if self._histogram.getVisible() and self._simulation_data is not None:
+			self.update_histogram()
+
+
+	def update_quality(self):
+		"""
+		Measure the frame time and apply the decisions of the quality governor.
+		"""
+		settings = self._quality_governor.update(viz.getFrameElapsed())
+		if settings is None:
+			return
+		print(self._quality_governor.describe_decision())
+		if self._simulation_data is not None:
+			self._simulation_data.set_quality(settings['cloud_stride'], settings['surface_level'])
 
 
 	def update_stressindicator(self, e=None):
@@ -254,7 +487,7 @@ class ToothVR(viz.EventClass):
 		# Create a node3d object for the get_local_position() method
 		tmp = viz.addGroup()
 		tmp.setPosition(indicator_position)
-		position = HelpFunctions.get_local_position(self._simulation_data.cloud_materials[1].getChildren()[0], tmp)
+		position = HelpFunctions.get_local_position(self._simulation_data.data_node, tmp)
 		tmp.remove()
 		
 		# Read the equivalent_stress from ParaView
@@ -264,18 +497,55 @@ class ToothVR(viz.EventClass):
 		self._stressindicator_text.message(str(stress))
 
 
+	def update_pointer(self):
+		"""
+		Pick the cell hit by the pointer and display its value.
+		"""
+		# Convert the ray of the pointer to the coordinate system of the data.
+		# Create node3d objects for the get_local_position() method
+		matrix = self._pointer.getMatrix(viz.ABS_GLOBAL)
+		start = matrix.getPosition()
+		end = [p + f for p, f in zip(start, matrix.getForward())]
+		points = []
+		for position in (start, end):
+			tmp = viz.addGroup()
+			tmp.setPosition(position)
+			points.append(HelpFunctions.get_local_position(self._simulation_data.data_node, tmp))
+			tmp.remove()
+		direction = [e - s for s, e in zip(points[0], points[1])]
+		
+		result = self._simulation_data.pick(points[0], direction)
+		if result is None:
+			self._pointer_marker.visible(False)
+			self._pointer_beam.setScale([1,1,1])
+			return
+		# The direction has the length of one meter in the world, so the distance is in meters
+		self._pointer_beam.setScale([1,1,result.distance])
+		self._pointer_marker.visible(True)
+		self._pointer_marker.setPosition(HelpFunctions.get_global_position(self._simulation_data.data_node, result.position), viz.ABS_GLOBAL)
+		self._pointer_text.message("{0:.4g}\nMaterial {1}, cell {2}".format(result.value, result.material, result.cell_id))
+
+
 	def clip_button_press(self):
 		"""
 		Display the clipping plane with the first call and clip the object with the second call.
+		Every clip adds a plane to the clip set (see Simulation_Data.add_clip_plane()).
+		In the slice mode the second call only hides the plane and the cross-section stays where the plane was.
 		"""
+		# The clip button opens the selected file, while the file chooser is displayed
+		if self._file_chooser is not None and self._file_chooser.is_visible():
+			self._file_chooser.confirm()
+			return
+		if self._simulation_data is None:
+			return
 		if self._clip_plane.getVisible():
 			# Second call to fulfill the clip
 			self._clip_plane.visible(False)
-			# Update clipping information
-			self._simulation_data.clip_normal = HelpFunctions.get_local_normal(self._simulation_data.cloud_materials[1].getChildren()[0], self._clip_plane)
-			self._simulation_data.clip_origin = HelpFunctions.get_local_position(self._simulation_data.cloud_materials[1].getChildren()[0], self._clip_plane)
-			# Apply clip by reloading the models
-			self._simulation_data.reload_models()
+			if not self._simulation_data.is_slice_mode():
+				# Add the plane to the clip set and apply it by reloading the models
+				self._simulation_data.add_clip_plane(
+					HelpFunctions.get_local_position(self._simulation_data.data_node, self._clip_plane),
+					HelpFunctions.get_local_normal(self._simulation_data.data_node, self._clip_plane))
 			# Update the controls to grab the object again
 			self._grab_and_zoom.set_item(self._simulation_data.origin_node)
 		else:
@@ -287,6 +557,188 @@ class ToothVR(viz.EventClass):
 			self._grab_and_zoom.set_item(self._clip_plane)
 			
 			
+	def toggle_slice(self):
+		"""
+		Switch between the models and their cross-section. While the clipping plane is displayed, the cross-section follows it.
+		"""
+		if self._simulation_data is None:
+			return
+		if self._simulation_data.mesh is None:
+			print("The slice mode isn't supported with a pvserver")
+			return
+		self._simulation_data.set_slice_mode(not self._simulation_data.is_slice_mode())
+		if self._simulation_data.is_slice_mode() and self._clip_plane.getVisible():
+			self.update_slice()
+
+
+	def update_slice(self):
+		"""
+		Move the cross-section to the clipping plane.
+		"""
+		self._simulation_data.set_slice_plane(
+			HelpFunctions.get_local_position(self._simulation_data.data_node, self._clip_plane),
+			HelpFunctions.get_local_normal(self._simulation_data.data_node, self._clip_plane))
+
+
+	def toggle_iso_mode(self):
+		"""
+		Show or hide the iso-surfaces inside the materials.
+		"""
+		if self._simulation_data is None:
+			return
+		if self._simulation_data.mesh is None:
+			print("The iso-surfaces aren't supported with a pvserver")
+			return
+		self._simulation_data.set_iso_mode(not self._simulation_data.is_iso_mode())
+
+
+	def change_iso_value(self, step):
+		"""
+		Change the iso value of the iso-surfaces by step as a fraction of the color range.
+		"""
+		if self._simulation_data is not None:
+			self._simulation_data.change_iso_value(step)
+
+
+	def toggle_color_clamp(self):
+		"""
+		Clamp the color range to the percentiles cfg.color_percentiles or use the complete range again.
+		"""
+		if self._simulation_data is not None:
+			self._simulation_data.set_color_clamp(not self._simulation_data.clamp_colors)
+
+
+	def toggle_histogram(self):
+		"""
+		Show or hide the histogram panel.
+		"""
+		self._histogram.visible(not self._histogram.getVisible())
+
+
+	def update_histogram(self):
+		"""
+		Display the histogram of the coloring array of the displayed materials and the statistics of the displayed cells
+		(see Simulation_Data.get_region_statistics()). The precalculated statistics (see Simulation_Data.get_statistics())
+		are only drawn again, if they or the color range changed.
+		"""
+		statistics = self._simulation_data.get_displayed_statistics()
+		color_range = self._simulation_data.get_color_range()
+		region = self._simulation_data.get_region_statistics()
+		key = None if statistics is None else (statistics.count, statistics.mean, tuple(statistics.histogram), tuple(color_range), region.describe())
+		if key == self._histogram_key:
+			return
+		self._histogram_key = key
+		if self._histogram_bars is not None:
+			self._histogram_bars.remove()
+			self._histogram_bars = None
+		if statistics is None:
+			self._histogram_text.message("No statistics")
+			return
+		# One bar per bin in the color of its center
+		edges = statistics.edges
+		colors = Processing.get_colors(color_range[0], color_range[1], (edges[:-1] + edges[1:]) / 2).tolist()
+		width = _HISTOGRAM_SIZE[0] / len(statistics.histogram)
+		heights = statistics.histogram * (_HISTOGRAM_SIZE[1] / max(statistics.histogram.max(), 1))
+		viz.startLayer(viz.QUADS)
+		for i, height in enumerate(heights.tolist()):
+			viz.vertexColor(colors[i][0], colors[i][1], colors[i][2])
+			viz.vertex(i*width, 0, 0)
+			viz.vertex((i+1)*width, 0, 0)
+			viz.vertex((i+1)*width, height, 0)
+			viz.vertex(i*width, height, 0)
+		self._histogram_bars = viz.endLayer()
+		self._histogram_bars.setParent(self._histogram)
+		self._histogram_bars.disable(viz.LIGHTING)
+		all_cells = self._simulation_data.get_statistics()[None]
+		self._histogram_text.message("{0}\n{1:.4g} to {2:.4g}, 1 %: {3:.4g}, 99 %: {4:.4g}\nColors {5:.4g} to {6:.4g}\nDisplayed: {7}".format(
+			statistics.describe(), edges[0], edges[-1], all_cells.get_percentile(1), all_cells.get_percentile(99), color_range[0], color_range[1],
+			region.describe()))
+
+
+	def toggle_clip_box(self):
+		"""
+		Add a clip box or remove it. The box is placed and oriented like the clipping plane, if it is displayed,
+		otherwise it is placed at the center of the data.
+		"""
+		if self._simulation_data is None:
+			return
+		if self._simulation_data.clip_set.box is not None:
+			self._simulation_data.set_clip_box(None)
+			return
+		center = None
+		axes = None
+		if self._clip_plane.getVisible():
+			center = HelpFunctions.get_local_position(self._simulation_data.data_node, self._clip_plane)
+			axes = HelpFunctions.get_local_axes(self._simulation_data.data_node, self._clip_plane)
+		self._simulation_data.set_clip_box(self._simulation_data.get_clip_box(center, axes))
+
+
+	def toggle_clip_mode(self):
+		"""
+		Switch between the intersection and the union of the clip planes and the box.
+		"""
+		if self._simulation_data is not None:
+			self._simulation_data.toggle_clip_mode()
+
+
+	def clear_clip(self):
+		"""
+		Remove every clip plane and the box.
+		"""
+		if self._simulation_data is not None:
+			self._simulation_data.clear_clip()
+
+
+	def undo_clip(self):
+		"""
+		Go back to the previous clip.
+		"""
+		if self._simulation_data is not None and not self._simulation_data.undo_clip():
+			print("Nothing to undo")
+
+
+	def redo_clip(self):
+		"""
+		Apply the last undone clip again.
+		"""
+		if self._simulation_data is not None and not self._simulation_data.redo_clip():
+			print("Nothing to redo")
+
+
+	def next_hotspot(self):
+		"""
+		Move the next hotspot (see Simulation_Data.get_hotspots()) in front of the user and zoom on it.
+		"""
+		if self._simulation_data is None:
+			return
+		hotspots = self._simulation_data.get_hotspots()
+		if not hotspots:
+			print("No hotspots found")
+			return
+		# A new file or clip has new hotspots, which start with the highest one
+		if hotspots is not self._hotspots:
+			self._hotspots = hotspots
+			self._hotspot_index = -1
+		self._hotspot_index = (self._hotspot_index + 1) % len(hotspots)
+		hotspot = hotspots[self._hotspot_index]
+		print("Hotspot {0}/{1}: {2}".format(self._hotspot_index + 1, len(hotspots), hotspot))
+		
+		node = self._simulation_data.origin_node
+		node.clearActions()
+		# The hotspot gets cfg.hotspot_view_size big (the cluster or at least the clustering radius)
+		scale = node.getScale()[0]
+		new_scale = cfg.hotspot_view_size / (2 * max(hotspot.extent, hotspot.radius))
+		# Move the hotspot in front of the user
+		view_matrix = viz.MainView.getMatrix()
+		target = [p + cfg.hotspot_view_distance * f for p, f in zip(view_matrix.getPosition(), view_matrix.getForward())]
+		position = node.getPosition()
+		hotspot_position = HelpFunctions.get_global_position(self._simulation_data.data_node, hotspot.center)
+		new_position = [t - (h - p) * new_scale / scale for t, h, p in zip(target, hotspot_position, position)]
+		node.runAction(vizact.parallel(
+			vizact.moveTo(new_position, time=cfg.hotspot_animation_time),
+			vizact.sizeTo([new_scale]*3, time=cfg.hotspot_animation_time)))
+
+
 	def switch_environment(self):
 		"""
 		Switch the environment.
@@ -13,7 +13,8 @@ will be met: https://www.gnu.org/licenses/lgpl-3.0.html.
 # Directory, that opens when opening a new file.
 standard_directory = 'C:\\Programmierzeug\\Testdaten\\'
 # Directory to the python files of ParaView. Is ParaView installed in the standard directory, this should already work.
-path_to_paraview_libs = 'C:\\Program Files\\ParaView 5.4.1-Qt5-OpenGL2-Windows-64bit\\bin\\Lib\\site-packages\\'
+# ToothVR needs Python 3.8 or newer, so the ParaView build has to match the Python version of Vizard (Vizard 7 uses Python 3.8).
+path_to_paraview_libs = 'C:\\Program Files\\ParaView 5.9.1-Windows-Python3.8-msvc2017-64bit\\bin\\Lib\\site-packages\\'
 # Defines if the programm is controlled with a controller and keyboard, or with a SteamVR headset.
 # Automatic detection of SteamVR by the lines of code below
 control_scheme = 'controller'
@@ -23,6 +24,80 @@ multi_sample_level = 4
 coloring_name = "equivalent_stress"
 # Defines the name of the material array in the data. This is used to seperate the different parts. "material" should be fine.
 material_name = "material"
+# Build the models with a few bulk calls (binary PLY files) instead of one call per vertex.
+# Set to False, if the PLY reader of Vizard isn't available.
+bulk_geometry_upload = True
+# Directory of the temporary PLY files of the bulk calls. A RAM disk avoids the disk I/O of every build. None uses the temp directory.
+geometry_directory = None
+# Number of processes for processing the materials in parallel. 0 uses every core, 1 disables the process pool.
+worker_processes = 0
+# Address ("host:port") of a pvserver, which does the reading, clipping and surface extraction.
+# Start it for example with: mpiexec -n 16 pvserver --server-port=11111
+# The file paths have to be valid on the server. None uses the built-in ParaView session and the local process pool.
+paraview_server = None
+# Python executable for the worker processes. None finds the python executable next to the running one.
+worker_executable = None
+# Choose the files in VR from a list of the files in standard_directory. False opens the file dialog instead.
+# The list is cached in the file .toothvr_catalog.json in the directory.
+use_file_chooser = True
+# Memory budget in bytes for a loaded file. If the estimated memory is bigger, the models are built on demand or with less detail.
+# None uses 80 % of the available memory.
+memory_budget = None
+# Adapt the number of cloud points and the level of detail of the surfaces to hold the frame rate.
+# The multisample level (multi_sample_level) stays fixed, because Vizard applies it only when the window is created.
+adaptive_quality = True
+# Frame rate of the headset in Hz
+target_frame_rate = 90
+# Lowest quality, which is used by the adaptive quality: every n-th cell in the cloud and the coarsest surface level
+quality_max_cloud_stride = 8
+quality_max_surface_level = 3
+# Number of clip sets (planes and box), whose evaluation at the points is cached
+clip_cache_size = 8
+# Half edge length of a new clip box (fraction of the data size)
+clip_box_size = 0.15
+# Number of clip sets, which can be undone, and the memory in bytes for the cached models of earlier clip sets (makes undo and redo instant)
+clip_history_size = 50
+clip_result_cache_memory = 256 * 1024 * 1024
+# Color the surfaces smoothly with the cell values averaged onto the points instead of one color per triangle
+smooth_coloring = False
+# Iso-surfaces: number of iso values over the color range (sweeping snaps to them) and number of iso values, whose surfaces are cached
+iso_surface_levels = 50
+iso_surface_cache_size = 20
+# Opacity of the surface of the materials, while the iso-surfaces are displayed
+iso_surface_alpha = 0.3
+# Statistics of the coloring array per material (see Statistics.py): number of histogram bins and steps between the stored percentiles
+statistics_bins = 32
+statistics_quantiles = 200
+# Percentiles, which the color range is clamped to, so outliers don't wash out the colors (switched with the key p)
+color_percentiles = (1.0, 99.0)
+clamp_color_range = False
+# Number of points or triangles per model part of the stress threshold. A threshold change rebuilds at most one part.
+threshold_chunk_size = 20000
+# Hotspots: the cells with the highest values of this array are clustered into regions, which can be visited one after another
+hotspot_name = "equivalent_stress"
+# Number of cells with the highest values, which are clustered
+hotspot_cells = 1000
+# Cells closer than this fraction of the data size to the peak of a hotspot belong to that hotspot
+hotspot_cluster_radius = 0.05
+# Maximum number of hotspots
+hotspot_max = 10
+# Size in meters, which a hotspot gets when it is visited, and the duration of the animation in seconds
+hotspot_view_size = 0.3
+hotspot_animation_time = 1.0
+# Distance in meters in front of the user, where a visited hotspot is placed
+hotspot_view_distance = 0.6
+# Radius of the cloud points for picking with the pointer (fraction of the data size)
+pick_point_radius = 0.005
+# Time series (numbered files like result_001.vtk): steps per second of the playback,
+# number of steps kept in memory around the displayed one and number of threads, which load them in the background
+time_series_rate = 10
+time_series_buffer = 8
+time_series_workers = 2
+# Blend the values and the moved points linearly between two steps, so the playback and the scrubbing are smooth
+time_series_interpolation = True
+# Point array with the displacement vectors for warping the models and the maximum exaggeration of the displacement
+displacement_name = "displacement"
+warp_scale_max = 100.0
 
 # Check if steamvr is running to change controll scheme
 import psutil
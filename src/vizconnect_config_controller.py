@@ -325,6 +325,32 @@ def initEvents(initFlag=vizconnect.INIT_INDEPENDENT, initList=None):
 		if initFlag&vizconnect.INIT_WRAPPERS:
 			vizconnect.addEvent(rawEvent[_name], _name, make='Vizconnect', model='Custom')
 
+	#VC: initialize a new event
+	_name = 'CONTROL_NEXT_HOTSPOT'
+	if vizconnect.isPendingInit('event', _name, initFlag, initList):
+		#VC: init the raw object
+		if initFlag&vizconnect.INIT_RAW:
+			#VC: create the raw object
+			from vizconnect.util import events
+			rawEvent[_name] = events.CustomEvent(viz.getEventID(_name))
+	
+		#VC: init the mappings for the raw object
+		if initFlag&vizconnect.INIT_MAPPINGS:
+			#VC: per frame mappings
+			if initFlag&vizconnect.INIT_MAPPINGS_PER_FRAME:
+				#VC: get the raw input dict so we have access to signals
+				import vizact
+				rawInput = vizconnect.getConfiguration().getRawDict('input')
+				#VC: set the update function which checks for input signals
+				def update(event):
+					if rawInput['keyboard'].isButtonDown(35):# make=Generic, model=Keyboard, name=keyboard, signal=Key H
+						event.sendOnce(e=viz.Event(mag=1))
+				rawEvent[_name].setUpdateFunction(update)
+	
+		#VC: init the wrapper (DO NOT EDIT)
+		if initFlag&vizconnect.INIT_WRAPPERS:
+			vizconnect.addEvent(rawEvent[_name], _name, make='Vizconnect', model='Custom')
+
 	#VC: initialize a new event
 	_name = 'CONTROL_CYCLE_VIEW_MODE'
 	if vizconnect.isPendingInit('event', _name, initFlag, initList):
@@ -410,6 +410,7 @@ def initEvents(initFlag=vizconnect.INIT_INDEPENDENT, initList=None):
 				#VC: set the update function which checks for input signals
 				def update(event):
 					if rawInput['l_hand_input'].getTrackpad()[1] > 0.01 and\
+						abs(rawInput['l_hand_input'].getTrackpad()[1]) >= abs(rawInput['l_hand_input'].getTrackpad()[0]) and\
 						rawInput['l_hand_input'].isButtonDown(3):# make=HTC, model=Vive Controller, name=l_hand_input, signal=Trackpad Top (along with) make=HTC, model=Vive Controller, name=l_hand_input, signal=Button Trackpad
 						event.sendOnce(e=viz.Event(mag=abs(rawInput['l_hand_input'].getTrackpad()[1]) * 1))
 				rawEvent[_name].setUpdateFunction(update)
@@ -437,6 +438,7 @@ def initEvents(initFlag=vizconnect.INIT_INDEPENDENT, initList=None):
 				#VC: set the update function which checks for input signals
 				def update(event):
 					if rawInput['l_hand_input'].getTrackpad()[1] < -0.01 and\
+						abs(rawInput['l_hand_input'].getTrackpad()[1]) >= abs(rawInput['l_hand_input'].getTrackpad()[0]) and\
 						rawInput['l_hand_input'].isButtonDown(3):# make=HTC, model=Vive Controller, name=l_hand_input, signal=Trackpad Bottom (along with) make=HTC, model=Vive Controller, name=l_hand_input, signal=Button Trackpad
 						event.sendOnce(e=viz.Event(mag=abs(rawInput['l_hand_input'].getTrackpad()[1]) * 1))
 				rawEvent[_name].setUpdateFunction(update)
@@ -497,6 +499,35 @@ def initEvents(initFlag=vizconnect.INIT_INDEPENDENT, initList=None):
 		if initFlag&vizconnect.INIT_WRAPPERS:
 			vizconnect.addEvent(rawEvent[_name], _name, make='Vizconnect', model='Custom')
 
+	#VC: initialize a new event
+	_name = 'CONTROL_NEXT_HOTSPOT'
+	if vizconnect.isPendingInit('event', _name, initFlag, initList):
+		#VC: init the raw object
+		if initFlag&vizconnect.INIT_RAW:
+			#VC: create the raw object
+			from vizconnect.util import events
+			rawEvent[_name] = events.CustomEvent(viz.getEventID(_name))
+	
+		#VC: init the mappings for the raw object
+		if initFlag&vizconnect.INIT_MAPPINGS:
+			#VC: per frame mappings
+			if initFlag&vizconnect.INIT_MAPPINGS_PER_FRAME:
+				#VC: get the raw input dict so we have access to signals
+				import vizact
+				rawInput = vizconnect.getConfiguration().getRawDict('input')
+				#VC: set the update function which checks for input signals
+				def update(event):
+					if abs(rawInput['l_hand_input'].getTrackpad()[0]) > abs(rawInput['l_hand_input'].getTrackpad()[1]) and\
+						rawInput['l_hand_input'].isButtonDown(3):# make=HTC, model=Vive Controller, name=l_hand_input, signal=Trackpad Left/Right (along with) make=HTC, model=Vive Controller, name=l_hand_input, signal=Button Trackpad
+						event.sendOnce(e=viz.Event(mag=1))
+					if rawInput['keyboard'].isButtonDown(35):# make=Generic, model=Keyboard, name=keyboard, signal=Key H
+						event.sendOnce(e=viz.Event(mag=1))
+				rawEvent[_name].setUpdateFunction(update)
+	
+		#VC: init the wrapper (DO NOT EDIT)
+		if initFlag&vizconnect.INIT_WRAPPERS:
+			vizconnect.addEvent(rawEvent[_name], _name, make='Vizconnect', model='Custom')
+
 	#VC: initialize a new event
 	_name = 'CONTROL_LEFT_HAND_GRAB'
 	if vizconnect.isPendingInit('event', _name, initFlag, initList):
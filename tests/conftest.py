@@ -0,0 +1,62 @@
+﻿"""
+Copyright 2018 Andreas Wundlechner
+
+GNU Lesser General Public License Usage
+This file has to be used under the terms of the GNU Lesser
+General Public License version 3 or later as published by the Free Software
+Foundation and appearing in the file LICENSE included in the
+packaging of this file. Please review the following information to
+ensure the GNU Lesser General Public License version 3 requirements
+will be met: https://www.gnu.org/licenses/lgpl-3.0.html.
+"""
+
+"""
+Headless tests of the processing without Vizard and ParaView. Run them with "python -m pytest" in the directory of the repository.
+This file puts src on the path and provides a small grid of tetrahedra.
+"""
+
+import os
+import sys
+import itertools
+import numpy
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'src'))
+
+import Processing
+
+
+VTK_TETRA = 10
+
+
+def make_cube_mesh(divisions=4, materials=3, seed=0):
+	"""
+	Returns a Processing.Mesh of the unit cube divided into divisions^3 hexahedrons of 6 tetrahedrons each.
+	The cells get random values ("equivalent_stress") and the materials are layers along x.
+	"""
+	steps = numpy.linspace(0.0, 1.0, divisions + 1)
+	points = numpy.array([[x, y, z] for x in steps for y in steps for z in steps], dtype=numpy.float32)
+	index = lambda i, j, k: (i * (divisions + 1) + j) * (divisions + 1) + k
+	tetrahedra = []
+	for i, j, k in itertools.product(range(divisions), repeat=3):
+		corner = numpy.array([i, j, k])
+		# Every path along the edges from the first to the opposite corner is a tetrahedron
+		for axes in itertools.permutations(range(3)):
+			path = [corner.copy()]
+			for axis in axes:
+				path.append(path[-1] + numpy.eye(3, dtype=int)[axis])
+			tetrahedra.append([index(*position) for position in path])
+	connectivity = numpy.array(tetrahedra, dtype=numpy.int64).ravel()
+	cells = len(tetrahedra)
+	offsets = numpy.arange(cells + 1, dtype=numpy.int64) * 4
+	centers = points[connectivity].reshape(-1, 4, 3).mean(axis=1)
+	random = numpy.random.RandomState(seed)
+	cell_data = {
+		'equivalent_stress': random.uniform(0.0, 100.0, cells),
+		'material': numpy.minimum((centers[:, 0] * materials).astype(numpy.int32), materials - 1) + 1}
+	return Processing.Mesh(points, connectivity, offsets, numpy.full(cells, VTK_TETRA, dtype=numpy.uint8), cell_data)
+
+
+@pytest.fixture
+def cube_mesh():
+	return make_cube_mesh()
@@ -0,0 +1,76 @@
+﻿"""
+Copyright 2018 Andreas Wundlechner
+
+GNU Lesser General Public License Usage
+This file has to be used under the terms of the GNU Lesser
+General Public License version 3 or later as published by the Free Software
+Foundation and appearing in the file LICENSE included in the
+packaging of this file. Please review the following information to
+ensure the GNU Lesser General Public License version 3 requirements
+will be met: https://www.gnu.org/licenses/lgpl-3.0.html.
+"""
+
+"""
+Tests of the clip set of Clipping.py.
+"""
+
+import numpy
+import Clipping
+
+
+PLANES = [((0.5, 0.0, 0.0), (1.0, 0.0, 0.0)), ((0.0, 0.5, 0.0), (0.0, -1.0, 0.0))]
+BOX = ((0.5, 0.5, 0.5), ((1, 0, 0), (0, 1, 0), (0, 0, 1)), (0.2, 0.2, 0.2))
+
+
+def get_points(count=2000, seed=0):
+	return numpy.random.RandomState(seed).uniform(-0.5, 1.5, (count, 3))
+
+
+def test_modes():
+	points = get_points()
+	first = points[:, 0] >= 0.5
+	second = points[:, 1] <= 0.5
+	inside = (numpy.abs(points - 0.5) <= 0.2).all(axis=1)
+	both = Clipping.Clip_Set(PLANES, mode="and").evaluate(points) >= 0
+	either = Clipping.Clip_Set(PLANES, mode="or").evaluate(points) >= 0
+	assert numpy.array_equal(both, first & second)
+	assert numpy.array_equal(either, first | second)
+	assert numpy.array_equal(Clipping.Clip_Set(box=BOX).evaluate(points) >= 0, inside)
+	assert numpy.array_equal(Clipping.Clip_Set(PLANES[:1], BOX, "or").evaluate(points) >= 0, first | inside)
+	assert numpy.array_equal(Clipping.Clip_Set(PLANES[:1], BOX, "and").evaluate(points) >= 0, first & inside)
+	assert (Clipping.Clip_Set().evaluate(points) >= 0).all()
+
+
+def test_classify_bounds():
+	random = numpy.random.RandomState(1)
+	for mode in Clipping.MODES:
+		clip_set = Clipping.Clip_Set(PLANES, BOX, mode)
+		for _ in range(50):
+			lower = random.uniform(-0.5, 1.0, 3)
+			upper = lower + random.uniform(0.01, 0.5, 3)
+			bounds = (lower[0], upper[0], lower[1], upper[1], lower[2], upper[2])
+			kept = clip_set.evaluate(random.uniform(lower, upper, (500, 3))) >= 0
+			position = clip_set.classify_bounds(bounds)
+			# The classification is conservative: only boxes with certainly kept or removed points are classified
+			if position == "kept":
+				assert kept.all()
+			elif position == "removed":
+				assert not kept.any()
+	assert Clipping.Clip_Set(PLANES, mode="and").classify_bounds((0.6, 0.9, 0.0, 0.4, 0, 1)) == "kept"
+	assert Clipping.Clip_Set(PLANES, mode="or").classify_bounds((0.0, 0.4, 0.6, 0.9, 0, 1)) == "removed"
+
+
+def test_expression():
+	points = get_points(50)
+	for mode in Clipping.MODES:
+		clip_set = Clipping.Clip_Set(PLANES, BOX, mode)
+		expression = clip_set.get_expression()
+		values = [eval(expression, {'min': min, 'max': max, 'coordsX': x, 'coordsY': y, 'coordsZ': z}) for x, y, z in points]
+		assert numpy.allclose(values, clip_set.evaluate(points))
+
+
+def test_history_keys():
+	clip_set = Clipping.Clip_Set(PLANES)
+	assert clip_set == Clipping.Clip_Set(PLANES)
+	assert clip_set != clip_set.with_mode("or")
+	assert len(set([clip_set, Clipping.Clip_Set(PLANES), clip_set.with_box(BOX)])) == 2
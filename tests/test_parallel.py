@@ -0,0 +1,93 @@
+﻿"""
+Copyright 2018 Andreas Wundlechner
+
+GNU Lesser General Public License Usage
+This file has to be used under the terms of the GNU Lesser
+General Public License version 3 or later as published by the Free Software
+Foundation and appearing in the file LICENSE included in the
+packaging of this file. Please review the following information to
+ensure the GNU Lesser General Public License version 3 requirements
+will be met: https://www.gnu.org/licenses/lgpl-3.0.html.
+"""
+
+"""
+Tests of the shared memory store and the worker processes of Parallel.py.
+"""
+
+import numpy
+import pytest
+import config as cfg
+import Processing
+import Parallel
+
+
+def assert_same_buffers(first, second):
+	for name in ('positions', 'colors', 'normals', 'indices', 'cell_ids', 'point_ids', 'values'):
+		a = getattr(first, name)
+		b = getattr(second, name)
+		assert (a is None) == (b is None), name
+		if a is not None:
+			assert numpy.array_equal(a, b), name
+
+
+def make_store(mesh):
+	store = Parallel.Dataset_Store(mesh)
+	store.set_partition(Processing.partition_materials(store.mesh, 'material'))
+	return store
+
+
+def test_store_round_trip(cube_mesh):
+	store = make_store(cube_mesh)
+	try:
+		attached = Parallel.Dataset_Store.attach_mesh(store.descriptor)
+		for name in ('points', 'connectivity', 'offsets', 'cell_types'):
+			assert numpy.array_equal(getattr(attached, name), getattr(cube_mesh, name))
+		for name, values in cube_mesh.cell_data.items():
+			assert numpy.array_equal(attached.cell_data[name], values)
+		# Arrays of the same shape are replaced in place, so the attached mesh sees the new values
+		store.replace_array('cell/equivalent_stress', cube_mesh.cell_data['equivalent_stress'] * 2)
+		assert numpy.array_equal(attached.cell_data['equivalent_stress'], cube_mesh.cell_data['equivalent_stress'] * 2)
+		for material, cells in Processing.partition_materials(cube_mesh, 'material').items():
+			assert numpy.array_equal(store.get_material_cells(material), cells)
+	finally:
+		store.close()
+
+
+def test_store_release(cube_mesh):
+	mesh = Processing.Mesh(cube_mesh.points.copy(), cube_mesh.connectivity.copy(), cube_mesh.offsets.copy(),
+		cube_mesh.cell_types.copy(), dict(cube_mesh.cell_data))
+	released = []
+	store = Parallel.Dataset_Store(mesh, released.append)
+	try:
+		# Every array is removed from the source, after it was copied
+		assert sorted(released) == sorted(['points', 'connectivity', 'offsets', 'cell_types', 'cell/equivalent_stress', 'cell/material'])
+		assert mesh.points is None and not mesh.cell_data
+		assert numpy.array_equal(store.mesh.connectivity, cube_mesh.connectivity)
+	finally:
+		store.close()
+
+
+@pytest.fixture
+def worker_processes():
+	processes = cfg.worker_processes
+	cfg.worker_processes = 2
+	yield
+	Parallel.close_pool()
+	cfg.worker_processes = processes
+
+
+def test_pool_matches_main_process(cube_mesh, worker_processes):
+	store = make_store(cube_mesh)
+	try:
+		color_range = (0.0, 100.0)
+		in_pool = Parallel.process_materials(store, 'equivalent_stress', color_range)
+		cfg.worker_processes = 1
+		in_main = Parallel.process_materials(store, 'equivalent_stress', color_range)
+		assert [material for material, cloud, surface in in_pool] == [1, 2, 3]
+		for (material, cloud, surface), (_, main_cloud, main_surface) in zip(in_pool, in_main):
+			assert_same_buffers(cloud, main_cloud)
+			assert_same_buffers(surface, main_surface)
+		# Every cell is in one cloud
+		assert sorted(numpy.concatenate([cloud.cell_ids for material, cloud, surface in in_pool])) == list(range(cube_mesh.get_number_of_cells()))
+	finally:
+		store.close()
@@ -0,0 +1,90 @@
+﻿"""
+Copyright 2018 Andreas Wundlechner
+
+GNU Lesser General Public License Usage
+This file has to be used under the terms of the GNU Lesser
+General Public License version 3 or later as published by the Free Software
+Foundation and appearing in the file LICENSE included in the
+packaging of this file. Please review the following information to
+ensure the GNU Lesser General Public License version 3 requirements
+will be met: https://www.gnu.org/licenses/lgpl-3.0.html.
+"""
+
+"""
+Tests of the picking of Picking.py against a brute force intersection of every primitive.
+"""
+
+import numpy
+import Processing
+import Picking
+
+
+def intersect_brute_force(triangles, origin, direction):
+	"""
+	Returns the distance and the index of the first triangle hit by the ray (None, None if there is none).
+	"""
+	edge1 = triangles[:, 1] - triangles[:, 0]
+	edge2 = triangles[:, 2] - triangles[:, 0]
+	p = numpy.cross(direction, edge2)
+	determinant = (edge1 * p).sum(axis=1)
+	with numpy.errstate(divide='ignore', invalid='ignore'):
+		inverse = 1.0 / determinant
+		t = origin - triangles[:, 0]
+		u = (t * p).sum(axis=1) * inverse
+		q = numpy.cross(t, edge1)
+		v = (q * direction).sum(axis=1) * inverse
+		distance = (q * edge2).sum(axis=1) * inverse
+	hit = (numpy.abs(determinant) > 1e-12) & (u >= 0) & (v >= 0) & (u + v <= 1) & (distance >= 0)
+	if not hit.any():
+		return None, None
+	index = numpy.flatnonzero(hit)[numpy.argmin(distance[hit])]
+	return distance[index], index
+
+
+def make_triangles(count, seed):
+	random = numpy.random.RandomState(seed)
+	corners = random.uniform(-1, 1, (count, 1, 3)) + random.uniform(-0.1, 0.1, (count, 3, 3))
+	positions = corners.reshape(-1, 3).astype(numpy.float32)
+	values = random.uniform(0, 1, count)
+	normals = numpy.repeat(Processing.calculate_normals(positions.reshape(-1, 3, 3)), 3, axis=0)
+	return Processing.Geometry_Buffers("triangles", positions, numpy.ones((len(positions), 3), dtype=numpy.float32), normals,
+		numpy.arange(len(positions)).reshape(-1, 3), numpy.arange(count), numpy.arange(len(positions)), values)
+
+
+def test_bvh_matches_brute_force():
+	buffers = make_triangles(2000, 1)
+	bvh = Picking.BVH(buffers, leaf_size=16)
+	triangles = buffers.positions[buffers.indices].astype(numpy.float64)
+	random = numpy.random.RandomState(2)
+	hits = 0
+	for _ in range(200):
+		origin = random.uniform(-2, 2, 3)
+		direction = random.uniform(-1, 1, 3) - origin * 0.5
+		distance, index = intersect_brute_force(triangles, origin, direction)
+		result = bvh.intersect(origin, direction)
+		if index is None:
+			assert result is None
+			continue
+		hits += 1
+		assert result is not None
+		assert abs(result.distance - distance) < 1e-5
+		assert result.cell_id == buffers.cell_ids[index] or abs(result.distance - distance) < 1e-9
+	assert hits > 20
+
+
+def test_bvh_threshold():
+	buffers = make_triangles(500, 3)
+	bvh = Picking.BVH(buffers)
+	triangles = buffers.positions[buffers.indices].astype(numpy.float64)
+	kept = buffers.values >= 0.5
+	random = numpy.random.RandomState(4)
+	for _ in range(100):
+		origin = random.uniform(-2, 2, 3)
+		direction = -origin + random.uniform(-0.5, 0.5, 3)
+		distance, index = intersect_brute_force(triangles[kept], origin, direction)
+		result = bvh.intersect(origin, direction, threshold=0.5)
+		if index is None:
+			assert result is None
+		else:
+			assert abs(result.distance - distance) < 1e-5
+			assert result.value >= 0.5
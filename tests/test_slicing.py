@@ -0,0 +1,45 @@
+﻿"""
+Copyright 2018 Andreas Wundlechner
+
+GNU Lesser General Public License Usage
+This file has to be used under the terms of the GNU Lesser
+General Public License version 3 or later as published by the Free Software
+Foundation and appearing in the file LICENSE included in the
+packaging of this file. Please review the following information to
+ensure the GNU Lesser General Public License version 3 requirements
+will be met: https://www.gnu.org/licenses/lgpl-3.0.html.
+"""
+
+"""
+Tests of the cross-sections of Slicing.py.
+"""
+
+import numpy
+import Slicing
+
+
+def get_area(buffers):
+	triangles = buffers.positions[buffers.indices].astype(numpy.float64)
+	return 0.5 * numpy.linalg.norm(numpy.cross(triangles[:, 1] - triangles[:, 0], triangles[:, 2] - triangles[:, 0]), axis=1).sum()
+
+
+def test_slice_area(cube_mesh):
+	values = cube_mesh.cell_data['equivalent_stress']
+	tetrahedra = Slicing.Tetrahedra(cube_mesh, numpy.arange(cube_mesh.get_number_of_cells()))
+	# Parallel to a face: the unit square
+	assert abs(get_area(tetrahedra.slice((0.3, 0.4, 0.37), (0, 0, 1), values, 0, 100)) - 1.0) < 1e-5
+	# Diagonal through the center: a rectangle of 1 times sqrt(2)
+	assert abs(get_area(tetrahedra.slice((0.5, 0.5, 0.5), (1, 1, 0), values, 0, 100)) - numpy.sqrt(2)) < 1e-5
+	# Outside of the cube
+	assert len(tetrahedra.slice((0, 0, 2), (0, 0, 1), values, 0, 100).indices) == 0
+
+
+def test_slice_cells(cube_mesh):
+	values = cube_mesh.cell_data['equivalent_stress']
+	tetrahedra = Slicing.Tetrahedra(cube_mesh, numpy.arange(cube_mesh.get_number_of_cells()))
+	buffers = tetrahedra.slice((0.5, 0.5, 0.61), (0, 0, 1), values, 0, 100)
+	# Every triangle belongs to a cell, which contains its center
+	centers = buffers.positions[buffers.indices].mean(axis=1)
+	points = cube_mesh.points[cube_mesh.connectivity].reshape(-1, 4, 3)[buffers.cell_ids]
+	assert (centers >= points.min(axis=1) - 1e-6).all() and (centers <= points.max(axis=1) + 1e-6).all()
+	assert numpy.array_equal(buffers.values, values[buffers.cell_ids])
@@ -0,0 +1,77 @@
+﻿"""
+Copyright 2018 Andreas Wundlechner
+
+GNU Lesser General Public License Usage
+This file has to be used under the terms of the GNU Lesser
+General Public License version 3 or later as published by the Free Software
+Foundation and appearing in the file LICENSE included in the
+packaging of this file. Please review the following information to
+ensure the GNU Lesser General Public License version 3 requirements
+will be met: https://www.gnu.org/licenses/lgpl-3.0.html.
+"""
+
+"""
+Tests of the incremental region statistics of Statistics.py against a complete calculation.
+"""
+
+import numpy
+import Statistics
+
+
+def check(statistics, values, volumes, mask):
+	assert numpy.array_equal(statistics.mask, mask)
+	assert statistics.count == mask.sum()
+	if not mask.any():
+		assert statistics.get_maximum() == (None, None)
+		assert statistics.get_mean() is None
+		return
+	assert numpy.isclose(statistics.volume, volumes[mask].sum())
+	assert numpy.isclose(statistics.get_mean(), values[mask].mean())
+	assert numpy.isclose(statistics.get_weighted_mean(), (values[mask] * volumes[mask]).sum() / volumes[mask].sum())
+	maximum, cell = statistics.get_maximum()
+	assert maximum == values[mask].max() and mask[cell] and values[cell] == maximum
+
+
+def test_add_and_remove():
+	random = numpy.random.RandomState(0)
+	values = random.uniform(0, 100, 5000)
+	volumes = random.uniform(0.5, 2, 5000)
+	statistics = Statistics.Region_Statistics(values, volumes)
+	mask = numpy.zeros(len(values), dtype=bool)
+	check(statistics, values, volumes, mask)
+	for step in range(40):
+		cells = random.choice(len(values), random.randint(1, 2000))
+		if step % 3 == 2:
+			statistics.remove(cells)
+			mask[cells] = False
+		else:
+			statistics.add(cells)
+			mask[cells] = True
+		check(statistics, values, volumes, mask)
+	statistics.remove(numpy.arange(len(values)))
+	check(statistics, values, volumes, numpy.zeros(len(values), dtype=bool))
+
+
+def test_set_mask():
+	random = numpy.random.RandomState(1)
+	values = random.uniform(0, 100, 3000)
+	volumes = random.uniform(0.5, 2, 3000)
+	statistics = Statistics.Region_Statistics(values, volumes)
+	for _ in range(10):
+		mask = random.uniform(0, 1, len(values)) < random.uniform(0, 1)
+		statistics.set_mask(mask)
+		check(statistics, values, volumes, mask)
+
+
+def test_cells_between():
+	values = numpy.random.RandomState(2).uniform(0, 100, 2000)
+	values[::5] = 50.0
+	statistics = Statistics.Region_Statistics(values, numpy.ones(len(values)))
+	for low, high in ((None, 50.0), (50.0, None), (20.0, 50.0), (50.0, 50.0), (None, None), (10.0, 90.0)):
+		cells = statistics.get_cells_between(low, high)
+		expected = numpy.ones(len(values), dtype=bool)
+		if low is not None:
+			expected &= values >= low
+		if high is not None:
+			expected &= values < high
+		assert numpy.array_equal(numpy.sort(cells), numpy.flatnonzero(expected))
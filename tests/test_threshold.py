@@ -0,0 +1,50 @@
+﻿"""
+Copyright 2018 Andreas Wundlechner
+
+GNU Lesser General Public License Usage
+This file has to be used under the terms of the GNU Lesser
+General Public License version 3 or later as published by the Free Software
+Foundation and appearing in the file LICENSE included in the
+packaging of this file. Please review the following information to
+ensure the GNU Lesser General Public License version 3 requirements
+will be met: https://www.gnu.org/licenses/lgpl-3.0.html.
+"""
+
+"""
+Tests of the threshold order of Processing.py.
+"""
+
+import numpy
+import Processing
+
+
+def test_threshold_index_matches_mask():
+	values = numpy.random.RandomState(0).uniform(0, 10, 1000)
+	# Equal values, too
+	values[::7] = 5.0
+	index = Processing.Threshold_Index(values)
+	for threshold in (-1.0, 0.0, 2.5, 5.0, 9.99, 11.0):
+		displayed = index.order[index.get_start(threshold):]
+		assert numpy.array_equal(numpy.sort(displayed), numpy.flatnonzero(values >= threshold))
+
+
+def test_changed_primitives():
+	values = numpy.random.RandomState(1).uniform(0, 10, 500)
+	index = Processing.Threshold_Index(values)
+	changed = index.get_changed(3.0, 6.0)
+	assert numpy.array_equal(numpy.sort(changed), numpy.flatnonzero((values >= 3.0) != (values >= 6.0)))
+
+
+def test_index_from_cell_ranks(cube_mesh):
+	values = cube_mesh.cell_data['equivalent_stress']
+	partition = Processing.partition_materials(cube_mesh, 'material')
+	ranks = numpy.empty(cube_mesh.get_number_of_cells(), dtype=numpy.int32)
+	for cells in partition.values():
+		Processing.rank_cells(values, cells, ranks)
+	# Primitives of the cells of one material, some cells several times (e.g. the triangles of a surface)
+	cell_ids = numpy.repeat(partition[2], 2)
+	index = Processing.Threshold_Index.from_cell_ranks(cell_ids, values, ranks)
+	assert (numpy.diff(index.sorted_values) >= 0).all()
+	for threshold in (0.0, 33.0, 50.0, 99.0):
+		displayed = index.order[index.get_start(threshold):]
+		assert numpy.array_equal(numpy.sort(displayed), numpy.flatnonzero(values[cell_ids] >= threshold))